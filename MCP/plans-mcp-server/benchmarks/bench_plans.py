@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Plans Benchmark Suite
+
+Generates a deterministic synthetic corpus of plans and measures latency
+percentiles (p50/p95/p99) and throughput of the Plans operations, both
+cold (a freshly opened store, empty in-process caches) and warm.
+
+    python benchmarks/bench_plans.py --plans 10000 --output results.json
+
+Operations are timed through PlanManager by default, or through the MCP tool
+handlers in server.py with ``--via server`` (requires the mcp package). The
+same ``--seed`` always produces the same corpus and the same query mix, so
+result files from two releases can be compared directly.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from plan_manager import PlanManager  # noqa: E402
+
+OPERATIONS = ("save_plan", "list_plans", "get_plan", "search_plans", "get_plans_index")
+
+# Written into the corpus directory so it can be reused by later runs
+CORPUS_MARKER = "bench_corpus.json"
+
+# Corpus vocabulary. Words are drawn with Zipf-like weights, so a few terms
+# are very common and most are rare, as in real plans.
+_VOCABULARY = (
+    "api database schema migration endpoint react component state hook "
+    "python service worker queue cache index search token auth session "
+    "deploy pipeline docker kubernetes config logging metrics latency "
+    "throughput memory storage file upload download parser validator "
+    "test fixture mock integration unit coverage refactor module package "
+    "dependency version release rollback monitor alert dashboard report "
+    "user account profile permission role admin settings feature flag "
+    "payment invoice order cart checkout product catalog inventory "
+    "notification email webhook event stream batch job scheduler cron "
+    "frontend backend server client request response error retry timeout"
+).split()
+
+_SECTIONS = ("Overview", "Goals", "Implementation Steps", "Risks", "Testing", "Rollout")
+
+_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+class CorpusGenerator:
+    """Deterministic generator of plan documents."""
+
+    def __init__(self, seed: int = 0, projects: int = 100):
+        self.seed = seed
+        self.projects = [f"project-{i:04d}" for i in range(projects)]
+        self._weights = [1.0 / (rank + 1) for rank in range(len(_VOCABULARY))]
+
+    def _sentence(self, rng: random.Random, words: int) -> str:
+        return " ".join(rng.choices(_VOCABULARY, self._weights, k=words)).capitalize() + "."
+
+    def plan(self, i: int) -> Dict:
+        """Return the i-th plan: its project, timestamp and markdown body."""
+        rng = random.Random(self.seed * 1_000_003 + i)
+        project = self.projects[rng.randrange(len(self.projects))]
+        topic = " ".join(rng.sample(_VOCABULARY, 2)).title()
+        lines = [f"# {topic} Plan", ""]
+        for section in rng.sample(_SECTIONS, rng.randint(2, len(_SECTIONS))):
+            lines.append(f"## {section}")
+            for _ in range(rng.randint(1, 4)):
+                lines.append(f"- {self._sentence(rng, rng.randint(6, 18))}")
+            lines.append("")
+        return {
+            "project": project,
+            # One plan per second keeps filenames unique and ordering stable
+            "timestamp": _EPOCH + timedelta(seconds=i),
+            "content": "\n".join(lines),
+        }
+
+    def plans(self, count: int):
+        for i in range(count):
+            yield self.plan(i)
+
+    def queries(self, count: int) -> List[Dict]:
+        """Return a reproducible mix of search_plans arguments."""
+        rng = random.Random(self.seed ^ 0x5EED)
+        common, rare = _VOCABULARY[:10], _VOCABULARY[-30:]
+        queries = []
+        for i in range(count):
+            kind = i % 4
+            if kind == 0:
+                queries.append({"query": rng.choice(common), "match": "phrase"})
+            elif kind == 1:
+                queries.append({"query": rng.choice(rare), "match": "phrase"})
+            elif kind == 2:
+                queries.append({"query": " ".join(rng.sample(common, 2)), "match": "all"})
+            else:
+                queries.append({"query": " ".join(rng.sample(rare, 3)), "match": "any"})
+        return queries
+
+
+def generate_corpus(plans_dir: Path, generator: CorpusGenerator, count: int):
+    """
+    Write ``count`` plans straight to disk, in the layout PlanManager uses.
+
+    Bypassing save_plan keeps generation of large corpora fast; the catalog
+    and search index are then built when the store is first opened.
+    """
+    projects_dir = plans_dir / "projects"
+    projects_dir.mkdir(parents=True, exist_ok=True)
+    for plan in generator.plans(count):
+        project_dir = projects_dir / plan["project"]
+        project_dir.mkdir(exist_ok=True)
+        stamp = plan["timestamp"]
+        path = project_dir / f"{stamp.strftime('%Y-%m-%d_%H%M%S')}_plan.md"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(
+                "---\n"
+                f"project_name: \"{plan['project']}\"\n"
+                f"date: \"{stamp.strftime('%Y-%m-%d')}\"\n"
+                "status: \"validated\"\n"
+                "tags: []\n"
+                "version: \"1.0\"\n"
+                "auto_generated: true\n"
+                "---\n\n"
+            )
+            f.write(plan["content"])
+        mtime = stamp.timestamp()
+        os.utime(path, (mtime, mtime))
+
+
+def prepare_corpus(plans_dir: Path, generator: CorpusGenerator, count: int) -> bool:
+    """Generate the corpus unless ``plans_dir`` already holds the same one."""
+    marker = plans_dir / CORPUS_MARKER
+    spec = {"plans": count, "projects": len(generator.projects), "seed": generator.seed}
+    if marker.exists() and json.loads(marker.read_text()) == spec:
+        return False
+    if plans_dir.exists():
+        shutil.rmtree(plans_dir)
+    generate_corpus(plans_dir, generator, count)
+    marker.write_text(json.dumps(spec))
+    return True
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Return nearest-rank percentiles (in ms) and throughput of ``samples``."""
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def percentile(p: float) -> float:
+        return ordered[min(n - 1, max(0, int(round(p / 100 * n)) - 1))] * 1000
+
+    total = sum(ordered)
+    return {
+        "n": n,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "mean_ms": total / n * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "throughput_ops_s": n / total if total else float("inf"),
+    }
+
+
+class ManagerTarget:
+    """Runs operations directly against PlanManager."""
+
+    def __init__(self, plans_dir: Path):
+        self.plans_dir = plans_dir
+        self.manager: Optional[PlanManager] = None
+
+    def open(self):
+        self.manager = PlanManager(self.plans_dir)
+
+    def close(self):
+        self.manager = None
+
+    def call(self, operation: str, args: Dict):
+        manager = self.manager
+        if operation == "save_plan":
+            return manager.save_plan_as_md(args["plan_content"], args["project_name"])
+        if operation == "list_plans":
+            return manager.list_plans(args.get("project_filter"), limit=args.get("limit"))
+        if operation == "get_plan":
+            return manager.get_plan_content(args["project_name"])
+        if operation == "search_plans":
+            return manager.search_plans(
+                args["query"], match=args["match"], limit=args["limit"], snippets=True
+            )
+        if operation == "get_plans_index":
+            return manager.render_index()
+        raise ValueError(f"Unknown operation: {operation}")
+
+
+class ServerTarget:
+    """Runs operations through the MCP tool handlers in server.py."""
+
+    def __init__(self, plans_dir: Path):
+        import server
+
+        self.server = server
+        self.plans_dir = plans_dir
+        self.loop = asyncio.new_event_loop()
+
+    def open(self):
+        self.server.plan_manager = PlanManager(
+            self.plans_dir, defer_index=self.server.INDEX_DEBOUNCE_MS > 0
+        )
+
+    def close(self):
+        self.loop.run_until_complete(self.server.index_writer.flush())
+        self.server.plan_manager = None
+
+    def call(self, operation: str, args: Dict):
+        result = self.loop.run_until_complete(self.server.handle_call_tool(operation, args))
+        if result[0].text.startswith(f"Error executing {operation}"):
+            raise RuntimeError(result[0].text)
+        return result
+
+
+def _time(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def operation_args(generator: CorpusGenerator, count: int, samples: int) -> Dict[str, List[Dict]]:
+    """Build the per-sample arguments of every operation."""
+    rng = random.Random(generator.seed + 1)
+    projects = generator.projects
+    saves = [
+        {
+            "plan_content": generator.plan(count + i)["content"],
+            "project_name": rng.choice(projects),
+        }
+        for i in range(samples)
+    ]
+    return {
+        "save_plan": saves,
+        "list_plans": [
+            {"project_filter": rng.choice(projects) if i % 2 else None, "limit": 100}
+            for i in range(samples)
+        ],
+        "get_plan": [{"project_name": rng.choice(projects)} for _ in range(samples)],
+        "search_plans": [dict(q, limit=20) for q in generator.queries(samples)],
+        "get_plans_index": [{} for _ in range(samples)],
+    }
+
+
+def run(target, operations: List[str], args: Dict[str, List[Dict]],
+        cold_samples: int, warmup: int) -> Dict:
+    """Time each operation cold and warm; returns the per-operation summaries."""
+    results: Dict[str, Dict] = {}
+    open_times = []
+
+    # Cold: every sample gets a freshly opened store, so in-process caches,
+    # database connections and the loaded search index start empty
+    cold: Dict[str, List[float]] = {op: [] for op in operations}
+    for i in range(cold_samples):
+        open_times.append(_time(target.open))
+        for op in operations:
+            op_args = args[op][i % len(args[op])]
+            cold[op].append(_time(lambda: target.call(op, op_args)))
+        target.close()
+
+    # Warm: one long-lived store, primed before measuring
+    target.open()
+    try:
+        for op in operations:
+            for op_args in args[op][:warmup]:
+                if op != "save_plan":
+                    target.call(op, op_args)
+            samples = [_time(lambda: target.call(op, op_args)) for op_args in args[op]]
+            results[op] = {"cold": summarize(cold[op]), "warm": summarize(samples)}
+    finally:
+        target.close()
+
+    results["open"] = {"cold": summarize(open_times)}
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--plans", type=int, default=1000,
+                        help="Number of plans in the corpus (100 to 1000000)")
+    parser.add_argument("--projects", type=int, default=100, help="Number of projects")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus and query seed")
+    parser.add_argument("--samples", type=int, default=200,
+                        help="Warm samples per operation")
+    parser.add_argument("--cold-samples", type=int, default=5,
+                        help="Cold samples per operation (one store open each)")
+    parser.add_argument("--warmup", type=int, default=20,
+                        help="Unmeasured warm-up calls per operation")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--via", choices=("manager", "server"), default="manager",
+                        help="Call PlanManager directly or go through the MCP tool handlers")
+    parser.add_argument("--corpus",
+                        help="Directory to keep the generated corpus in and reuse across runs "
+                             "(default: a temporary directory); each run works on a scratch "
+                             "copy, so the corpus itself never changes")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    options = parser.parse_args(argv)
+
+    if not 100 <= options.plans <= 1_000_000:
+        parser.error("--plans must be between 100 and 1000000")
+
+    generator = CorpusGenerator(options.seed, options.projects)
+    tmp_dir = tempfile.mkdtemp(prefix="plans-bench-")
+    plans_dir = Path(tmp_dir) / "Plans"
+
+    try:
+        start = time.perf_counter()
+        if options.corpus:
+            corpus_dir = Path(options.corpus).expanduser().resolve()
+            generated = prepare_corpus(corpus_dir, generator, options.plans)
+            # Saves and built indexes go to the copy; the next run then
+            # measures the same corpus this one did
+            shutil.copytree(corpus_dir, plans_dir)
+        else:
+            generated = prepare_corpus(plans_dir, generator, options.plans)
+        generate_s = time.perf_counter() - start
+
+        # First open builds the catalog from the plan files
+        start = time.perf_counter()
+        manager = PlanManager(plans_dir)
+        first_open_s = time.perf_counter() - start
+
+        # The search index is built on first use
+        start = time.perf_counter()
+        manager.search_index
+        index_build_s = time.perf_counter() - start
+        manager = None
+
+        target = ServerTarget(plans_dir) if options.via == "server" else ManagerTarget(plans_dir)
+        args = operation_args(generator, options.plans, options.samples)
+        results = run(target, options.operations, args, options.cold_samples, options.warmup)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "via": options.via,
+            "plans": options.plans,
+            "projects": options.projects,
+            "seed": options.seed,
+            "samples": options.samples,
+            "cold_samples": options.cold_samples,
+        },
+        "setup": {
+            "corpus_generated": generated,
+            "generate_s": generate_s,
+            "first_open_s": first_open_s,
+            "index_build_s": index_build_s,
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        Path(options.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Plans Startup Benchmark
+
+Measures how long a freshly spawned server takes to become useful. This is
+the cost every new Claude session pays. Each run starts a new process
+against a synthetic corpus (see bench_plans.py) and records:
+
+    initialize   time from spawn to the response to MCP ``initialize``
+    first_call   time from spawn to the result of the first tool call
+
+    python benchmarks/bench_startup.py --plans 10000 --runs 10 --output startup.json
+
+``--via manager`` skips the MCP layer (and the mcp dependency). The child
+process then imports PlanManager, opens the store and runs one search. It
+reports the same two timings: ``initialize`` once the store is open, and
+``first_call`` once the search has answered.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bench_plans import CorpusGenerator, PlanManager, prepare_corpus, summarize
+
+SERVER = Path(__file__).resolve().parent.parent / "src" / "server.py"
+
+PROTOCOL_VERSION = "2024-11-05"
+
+# Child program for --via manager; prints its timings as JSON
+_MANAGER_PROBE = """
+import json, sys, time
+start = float(sys.argv[1])
+sys.path.insert(0, sys.argv[2])
+from plan_manager import PlanManager
+manager = PlanManager(sys.argv[3])
+opened = time.time()
+manager.search_plans(sys.argv[4], limit=20, snippets=True)
+print(json.dumps({"initialize": opened - start, "first_call": time.time() - start}))
+"""
+
+
+def _rpc(proc: subprocess.Popen, message: Dict):
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def _await_response(proc: subprocess.Popen, request_id: int) -> Dict:
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError("server exited before responding")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            if "error" in message:
+                raise RuntimeError(f"server error: {message['error']}")
+            return message
+
+
+def run_server_once(home: Path, query: str) -> Dict[str, float]:
+    """Spawn the server, perform the handshake and one search_plans call."""
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home))
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(SERVER)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, env=env,
+    )
+    try:
+        _rpc(proc, {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": "bench_startup", "version": "1.0"},
+            },
+        })
+        _await_response(proc, 1)
+        initialized = time.perf_counter()
+
+        _rpc(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _rpc(proc, {
+            "jsonrpc": "2.0", "id": 2, "method": "tools/call",
+            "params": {"name": "search_plans", "arguments": {"query": query}},
+        })
+        _await_response(proc, 2)
+        answered = time.perf_counter()
+    finally:
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    return {"initialize": initialized - start, "first_call": answered - start}
+
+
+def run_manager_once(plans_dir: Path, query: str) -> Dict[str, float]:
+    """Spawn a bare Python process that opens the store and searches once."""
+    src = str(SERVER.parent)
+    output = subprocess.run(
+        [sys.executable, "-c", _MANAGER_PROBE, repr(time.time()), src, str(plans_dir), query],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure plans-mcp-server time-to-first-response")
+    parser.add_argument("--plans", type=int, default=1000, help="Number of plans in the corpus")
+    parser.add_argument("--projects", type=int, default=100, help="Number of projects")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus seed")
+    parser.add_argument("--runs", type=int, default=10, help="Number of process starts")
+    parser.add_argument("--query", default="database", help="Query of the first search_plans call")
+    parser.add_argument("--via", choices=("server", "manager"), default="server",
+                        help="Spawn the MCP server, or only open PlanManager in a bare process")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    options = parser.parse_args(argv)
+
+    home = Path(tempfile.mkdtemp(prefix="plans-startup-"))
+    plans_dir = home / ".claude" / "Plans"
+    try:
+        prepare_corpus(plans_dir, CorpusGenerator(options.seed, options.projects), options.plans)
+        # Build the catalog and search index once, as an existing install would have
+        PlanManager(plans_dir).warm_up()
+
+        samples: Dict[str, List[float]] = {"initialize": [], "first_call": []}
+        for _ in range(options.runs):
+            if options.via == "server":
+                timings = run_server_once(home, options.query)
+            else:
+                timings = run_manager_once(plans_dir, options.query)
+            for name, seconds in timings.items():
+                samples[name].append(seconds)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "via": options.via,
+            "plans": options.plans,
+            "projects": options.projects,
+            "seed": options.seed,
+            "runs": options.runs,
+        },
+        "results": {name: summarize(values) for name, values in samples.items()},
+    }
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        Path(options.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Plans Catalog
+
+An embedded SQLite catalog of saved plans. It records each plan's project,
+filename, frontmatter date and status, tags, size and mtime, so saves,
+listings, counts and most-recent lookups are indexed queries instead of
+directory walks.
+Plans kept in the object store (see object_store) also record the hash of
+their body, and archived plans the pack that holds them (see pack_store).
+
+Frontmatter tags are also kept in a tag-to-plan posting table. Tag filters
+are then index lookups and never touch plan bodies.
+
+Listings can be narrowed by project, status and a since/until time range.
+Secondary B-tree indexes keyed by (project, mtime), (status, mtime) and
+(project, status, mtime) turn each filter combination into one range scan
+that already runs in listing order, so only matching rows are read.
+
+Aggregate statistics (plans and bytes in total and per project, status and
+month, plans per tag) are kept in a ``plan_stats`` table. Triggers on the
+plan and tag tables adjust a handful of its rows whenever a plan is written
+or deleted. Every write path therefore keeps them current in O(1), and
+reading them never scans the plans.
+
+Each project also keeps a head pointer and an ordered version history,
+updated in the same transaction as the plan row. "Latest plan" is then a
+primary-key lookup, and "N most recent versions" is a bounded range scan.
+
+The database runs in WAL mode, so readers never block the writer, and it is
+safe to share between processes. Each thread gets its own connection.
+"""
+
+import base64
+import binascii
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    project  TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    date     TEXT,
+    status   TEXT,
+    tags     TEXT NOT NULL DEFAULT '[]',
+    size     INTEGER NOT NULL,
+    mtime    REAL NOT NULL,
+    blob     TEXT,
+    pack     TEXT,
+    PRIMARY KEY (project, filename)
+);
+DROP INDEX IF EXISTS plans_by_mtime;
+DROP INDEX IF EXISTS plans_by_project_mtime;
+CREATE INDEX IF NOT EXISTS plans_by_recency ON plans (mtime, project, filename);
+CREATE INDEX IF NOT EXISTS plans_by_project_recency ON plans (project, mtime, filename);
+CREATE INDEX IF NOT EXISTS plans_by_status_recency ON plans (status, mtime, project, filename);
+CREATE INDEX IF NOT EXISTS plans_by_project_status_recency ON plans (project, status, mtime, filename);
+CREATE TABLE IF NOT EXISTS plan_versions (
+    project  TEXT NOT NULL,
+    version  INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    PRIMARY KEY (project, version)
+);
+CREATE TABLE IF NOT EXISTS project_heads (
+    project  TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    version  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plan_tags (
+    tag      TEXT NOT NULL,
+    project  TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    PRIMARY KEY (tag, project, filename)
+);
+CREATE INDEX IF NOT EXISTS plan_tags_by_plan ON plan_tags (project, filename);
+CREATE TABLE IF NOT EXISTS plan_stats (
+    dimension TEXT NOT NULL,
+    key       TEXT NOT NULL,
+    plans     INTEGER NOT NULL,
+    bytes     INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key)
+);
+CREATE TRIGGER IF NOT EXISTS plan_stats_insert AFTER INSERT ON plans BEGIN
+    INSERT INTO plan_stats VALUES
+        ('total', '', 1, NEW.size),
+        ('project', NEW.project, 1, NEW.size),
+        ('status', COALESCE(NEW.status, ''), 1, NEW.size),
+        ('month', strftime('%Y-%m', NEW.mtime, 'unixepoch'), 1, NEW.size)
+    ON CONFLICT (dimension, key) DO UPDATE
+        SET plans = plans + excluded.plans, bytes = bytes + excluded.bytes;
+END;
+CREATE TRIGGER IF NOT EXISTS plan_stats_delete AFTER DELETE ON plans BEGIN
+    UPDATE plan_stats SET plans = plans - 1, bytes = bytes - OLD.size
+    WHERE (dimension = 'total' AND key = '')
+       OR (dimension = 'project' AND key = OLD.project)
+       OR (dimension = 'status' AND key = COALESCE(OLD.status, ''))
+       OR (dimension = 'month' AND key = strftime('%Y-%m', OLD.mtime, 'unixepoch'));
+    DELETE FROM plan_stats WHERE plans = 0
+      AND ((dimension = 'project' AND key = OLD.project)
+        OR (dimension = 'status' AND key = COALESCE(OLD.status, ''))
+        OR (dimension = 'month' AND key = strftime('%Y-%m', OLD.mtime, 'unixepoch')));
+END;
+CREATE TRIGGER IF NOT EXISTS plan_stats_tag_insert AFTER INSERT ON plan_tags BEGIN
+    INSERT INTO plan_stats VALUES ('tag', NEW.tag, 1, 0)
+    ON CONFLICT (dimension, key) DO UPDATE SET plans = plans + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS plan_stats_tag_delete AFTER DELETE ON plan_tags BEGIN
+    UPDATE plan_stats SET plans = plans - 1 WHERE dimension = 'tag' AND key = OLD.tag;
+    DELETE FROM plan_stats WHERE dimension = 'tag' AND key = OLD.tag AND plans = 0;
+END;
+"""
+
+# Bumped whenever a schema change needs existing catalogs to be rebuilt
+SCHEMA_VERSION = 6
+
+# Tables dropped before an outdated catalog is recreated and rebuilt
+_TABLES = ("plans", "plan_versions", "project_heads", "plan_tags", "plan_stats")
+
+_COLUMNS = ("project", "filename", "date", "status", "tags", "size", "mtime", "blob", "pack")
+
+
+def encode_cursor(key: Tuple) -> str:
+    """Encode a sort key as an opaque, URL-safe pagination cursor."""
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(",", ":")).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> Tuple:
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Args:
+        cursor: The opaque cursor string
+        types: Expected type of each component of the sort key
+
+    Raises:
+        ValueError: If the cursor is malformed or of the wrong shape
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error):
+        key = None
+    if (not isinstance(key, list) or len(key) != len(types)
+            or not all(isinstance(value, t) for value, t in zip(key, types))):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return tuple(key)
+
+
+class PlanCatalog:
+    """SQLite-backed catalog of plan records."""
+
+    def __init__(self, db_path: Path):
+        """Open (or create) the catalog database at ``db_path``."""
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        created = not self.db_path.exists()
+        conn = self._connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        # True when the caller should repopulate the catalog from disk
+        self.needs_rebuild = created or version < SCHEMA_VERSION
+        with conn:
+            if not created and version < SCHEMA_VERSION:
+                for table in _TABLES:
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # BEGIN IMMEDIATE takes the write lock up front, so concurrent
+            # writers in other processes queue instead of failing mid-transaction
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level="IMMEDIATE")
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_row(record: Dict) -> tuple:
+        return (
+            record["project"],
+            record["filename"],
+            record.get("date"),
+            # Stored lowercased so status filters are case-insensitive index lookups
+            record["status"].lower() if record.get("status") else None,
+            json.dumps(record.get("tags", [])),
+            record["size"],
+            record["mtime"],
+            record.get("blob"),
+            record.get("pack"),
+        )
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict:
+        record = dict(zip(_COLUMNS, row))
+        record["tags"] = json.loads(record["tags"])
+        return record
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def upsert(self, record: Dict):
+        """Insert or replace a single plan record."""
+        self.upsert_many([record])
+
+    def upsert_many(self, records: Iterable[Dict]):
+        """Insert or replace several plan records in one transaction."""
+        with self._connection() as conn:
+            for record in records:
+                self._write_plan(conn, record)
+
+    @classmethod
+    def _write_plan(cls, conn: sqlite3.Connection, record: Dict):
+        """Upsert a plan row and its tag postings."""
+        # Delete and insert rather than INSERT OR REPLACE, whose implicit
+        # delete does not fire the plan_stats triggers
+        conn.execute(
+            "DELETE FROM plans WHERE project = ? AND filename = ?",
+            (record["project"], record["filename"]),
+        )
+        conn.execute(
+            "INSERT INTO plans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            cls._to_row(record),
+        )
+        conn.execute(
+            "DELETE FROM plan_tags WHERE project = ? AND filename = ?",
+            (record["project"], record["filename"]),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO plan_tags VALUES (?, ?, ?)",
+            [(tag.lower(), record["project"], record["filename"])
+             for tag in record.get("tags", [])],
+        )
+
+    def record_saves(self, records: List[Dict]) -> List[int]:
+        """
+        Upsert saved plans and append them to their projects' version history.
+
+        Plan rows, version rows and head pointers are written in a single
+        transaction, so readers never see a head that points past the history.
+
+        Returns:
+            The version number assigned to each record, in order
+        """
+        versions = []
+        with self._connection() as conn:
+            for record in records:
+                self._write_plan(conn, record)
+                versions.append(self._advance_head(
+                    conn, record["project"], record["filename"], record["mtime"]
+                ))
+        return versions
+
+    @staticmethod
+    def _advance_head(conn: sqlite3.Connection, project: str, filename: str,
+                      saved_at: float) -> int:
+        # The head may have fallen back to an older version after a removal
+        row = conn.execute(
+            "SELECT MAX(version) FROM plan_versions WHERE project = ?", (project,)
+        ).fetchone()
+        version = row[0] + 1 if row[0] is not None else 1
+        conn.execute(
+            "INSERT INTO plan_versions VALUES (?, ?, ?, ?)",
+            (project, version, filename, saved_at),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO project_heads VALUES (?, ?, ?)",
+            (project, filename, version),
+        )
+        return version
+
+    def set_pack(self, plans: Iterable[Tuple[str, str]], pack: str):
+        """Record that the (project, filename) pairs in ``plans`` are archived in ``pack``."""
+        with self._connection() as conn:
+            conn.executemany(
+                "UPDATE plans SET pack = ? WHERE project = ? AND filename = ?",
+                [(pack, project, filename) for project, filename in plans],
+            )
+
+    def record_changes(self, records: List[Dict]) -> List[Dict]:
+        """
+        Upsert plans whose files changed outside this process.
+
+        Records matching the catalog's size and mtime are skipped, so saves
+        that were already recorded are not recorded twice. A plan new to the
+        catalog is appended to its project's version history; an edited one
+        keeps its place and any object or pack reference.
+
+        Returns:
+            The records actually written
+        """
+        written = []
+        with self._connection() as conn:
+            for record in records:
+                row = conn.execute(
+                    "SELECT size, mtime, blob, pack FROM plans WHERE project = ? AND filename = ?",
+                    (record["project"], record["filename"]),
+                ).fetchone()
+                if row is not None and row["size"] == record["size"] and row["mtime"] == record["mtime"]:
+                    continue
+                if row is not None:
+                    record = dict(record, blob=row["blob"], pack=row["pack"])
+                self._write_plan(conn, record)
+                versioned = conn.execute(
+                    "SELECT 1 FROM plan_versions WHERE project = ? AND filename = ? LIMIT 1",
+                    (record["project"], record["filename"]),
+                ).fetchone()
+                if not versioned:
+                    self._advance_head(conn, record["project"], record["filename"], record["mtime"])
+                written.append(record)
+        return written
+
+    def remove(self, project: str, filename: str):
+        """Delete a plan record."""
+        self.remove_many([(project, filename)])
+
+    def remove_many(self, plans: Iterable[Tuple[str, str]]):
+        """
+        Delete plan records in one transaction.
+
+        A project head pointing at a removed plan falls back to the newest
+        remaining version; version history rows are kept.
+        """
+        with self._connection() as conn:
+            for project, filename in plans:
+                conn.execute(
+                    "DELETE FROM plans WHERE project = ? AND filename = ?",
+                    (project, filename),
+                )
+                conn.execute(
+                    "DELETE FROM plan_tags WHERE project = ? AND filename = ?",
+                    (project, filename),
+                )
+                head = conn.execute(
+                    "SELECT 1 FROM project_heads WHERE project = ? AND filename = ?",
+                    (project, filename),
+                ).fetchone()
+                if head is None:
+                    continue
+                previous = conn.execute(
+                    "SELECT plan_versions.filename, plan_versions.version FROM plan_versions"
+                    " JOIN plans USING (project, filename)"
+                    " WHERE plan_versions.project = ? ORDER BY plan_versions.version DESC LIMIT 1",
+                    (project,),
+                ).fetchone()
+                if previous is None:
+                    conn.execute("DELETE FROM project_heads WHERE project = ?", (project,))
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO project_heads VALUES (?, ?, ?)",
+                        (project, previous[0], previous[1]),
+                    )
+
+    def replace_all(self, records: Iterable[Dict]):
+        """
+        Replace the catalog contents with ``records`` atomically.
+
+        Version histories are rebuilt from the records' mtimes, oldest first.
+        """
+        records = sorted(records, key=lambda record: record["mtime"])
+        with self._connection() as conn:
+            conn.execute("DELETE FROM plans")
+            conn.execute("DELETE FROM plan_tags")
+            conn.execute("DELETE FROM plan_versions")
+            conn.execute("DELETE FROM project_heads")
+            # Discard any drift along with the rows the counters described
+            conn.execute("DELETE FROM plan_stats")
+            for record in records:
+                self._write_plan(conn, record)
+                self._advance_head(
+                    conn, record["project"], record["filename"], record["mtime"]
+                )
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def count(self) -> int:
+        """Return the total number of plans."""
+        row = self._connection().execute(
+            "SELECT plans FROM plan_stats WHERE dimension = 'total'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def projects(self) -> List[str]:
+        """Return the sorted names of all projects with at least one plan."""
+        rows = self._connection().execute(
+            "SELECT key FROM plan_stats WHERE dimension = 'project' ORDER BY key"
+        )
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict:
+        """
+        Return the aggregate counters kept by the plan_stats triggers.
+
+        Returns:
+            A dict with total 'plans' and 'bytes', plus 'projects',
+            'statuses' and 'months' (UTC, "YYYY-MM") mapping each key to its
+            {'plans', 'bytes'}, and 'tags' mapping each tag to its plan count.
+            Plans without a status are counted under "".
+        """
+        result = {'plans': 0, 'bytes': 0, 'projects': {}, 'statuses': {}, 'months': {}, 'tags': {}}
+        groups = {'project': 'projects', 'status': 'statuses', 'month': 'months'}
+        rows = self._connection().execute(
+            "SELECT dimension, key, plans, bytes FROM plan_stats ORDER BY dimension, key"
+        )
+        for dimension, key, plans, size in rows:
+            if dimension == 'total':
+                result['plans'], result['bytes'] = plans, size
+            elif dimension == 'tag':
+                result['tags'][key] = plans
+            else:
+                result[groups[dimension]][key] = {'plans': plans, 'bytes': size}
+        return result
+
+    def get(self, project: str, filename: str) -> Optional[Dict]:
+        """Return the record for one plan, if catalogued."""
+        row = self._connection().execute(
+            "SELECT * FROM plans WHERE project = ? AND filename = ?",
+            (project, filename),
+        ).fetchone()
+        return self._from_row(row) if row else None
+
+    def list(self, project: Optional[str] = None,
+             tags: Optional[List[str]] = None,
+             status: Optional[str] = None,
+             since: Optional[float] = None,
+             until: Optional[float] = None) -> List[Dict]:
+        """
+        Return plan records, most recently modified first.
+
+        Args:
+            project: Only return plans of this project
+            tags: Only return plans carrying at least one of these tags
+            status: Only return plans with this frontmatter status
+            since: Only return plans modified at or after this timestamp
+            until: Only return plans modified before this timestamp
+        """
+        return list(self.iter_plans(project, tags, status=status, since=since, until=until))
+
+    def iter_plans(self, project: Optional[str] = None,
+                   tags: Optional[List[str]] = None,
+                   after: Optional[Tuple[float, str, str]] = None,
+                   limit: Optional[int] = None,
+                   status: Optional[str] = None,
+                   since: Optional[float] = None,
+                   until: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Lazily yield plan records in a stable, most-recent-first order.
+
+        Records are ordered by (mtime, project, filename) descending; see
+        sort_key(). Passing the key of the last record seen as ``after``
+        resumes from the next one, via an index range scan. The filters are
+        those of list().
+        """
+        where, params = self._filters(project, tags, status, since, until)
+        if after is not None:
+            where.append("(mtime, project, filename) < (?, ?, ?)")
+            params.extend(after)
+        sql = "SELECT * FROM plans"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY mtime DESC, project DESC, filename DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for row in self._connection().execute(sql, params):
+            yield self._from_row(row)
+
+    def matching(self, project: Optional[str] = None,
+                 tags: Optional[List[str]] = None,
+                 status: Optional[str] = None,
+                 since: Optional[float] = None,
+                 until: Optional[float] = None) -> Set[Tuple[str, str]]:
+        """Return the (project, filename) pairs of plans passing list()'s filters."""
+        where, params = self._filters(project, tags, status, since, until)
+        sql = "SELECT project, filename FROM plans"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return {(row[0], row[1]) for row in self._connection().execute(sql, params)}
+
+    @staticmethod
+    def _filters(project: Optional[str], tags: Optional[List[str]],
+                 status: Optional[str], since: Optional[float],
+                 until: Optional[float]) -> Tuple[List[str], List]:
+        """Build the WHERE terms and parameters for list()'s filters."""
+        where = []
+        params: List = []
+        if project is not None:
+            where.append("project = ?")
+            params.append(project)
+        if status is not None:
+            where.append("status = ?")
+            params.append(status.lower())
+        if since is not None:
+            where.append("mtime >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("mtime < ?")
+            params.append(until)
+        if tags:
+            where.append(
+                "(project, filename) IN (SELECT project, filename FROM plan_tags"
+                f" WHERE tag IN ({', '.join('?' for _ in tags)}))"
+            )
+            params.extend(tag.lower() for tag in tags)
+        return where, params
+
+    @staticmethod
+    def sort_key(record: Dict) -> Tuple[float, str, str]:
+        """Return the key iter_plans() orders records by."""
+        return (record["mtime"], record["project"], record["filename"])
+
+    def tagged(self, tags: Iterable[str]) -> Set[Tuple[str, str]]:
+        """Return the (project, filename) pairs carrying any of ``tags``."""
+        tags = [tag.lower() for tag in tags]
+        if not tags:
+            return set()
+        rows = self._connection().execute(
+            "SELECT project, filename FROM plan_tags"
+            f" WHERE tag IN ({', '.join('?' for _ in tags)})",
+            tags,
+        )
+        return {(row[0], row[1]) for row in rows}
+
+    def most_recent(self, limit: int = 10) -> List[Dict]:
+        """Return the ``limit`` most recently modified plans."""
+        return list(self.iter_plans(limit=limit))
+
+    def latest(self, project: str) -> Optional[Dict]:
+        """Return the plan a project's head pointer refers to."""
+        row = self._connection().execute(
+            "SELECT plans.* FROM project_heads"
+            " JOIN plans USING (project, filename)"
+            " WHERE project_heads.project = ?",
+            (project,),
+        ).fetchone()
+        return self._from_row(row) if row else None
+
+    def history(self, project: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Return a project's saved versions, newest first.
+
+        Each entry has ``version``, ``filename`` and ``saved_at``. The same
+        filename appears more than once if it was overwritten by later saves.
+        """
+        rows = self._connection().execute(
+            "SELECT version, filename, saved_at FROM plan_versions"
+            " WHERE project = ? ORDER BY version DESC LIMIT ?",
+            (project, -1 if limit is None else limit),
+        )
+        return [dict(row) for row in rows]
+
+    def get_version(self, project: str, version: int) -> Optional[Dict]:
+        """Return one entry of a project's version history, as history() does."""
+        row = self._connection().execute(
+            "SELECT version, filename, saved_at FROM plan_versions"
+            " WHERE project = ? AND version = ?",
+            (project, version),
+        ).fetchone()
+        return dict(row) if row else None
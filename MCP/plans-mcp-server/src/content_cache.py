@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Plans Content Cache
+
+A bounded LRU cache of plan file contents. Entries are keyed by path and
+validated against the file's (st_mtime_ns, st_size), so a hit costs a single
+stat() and an edited file is never served stale.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    from .metrics import record_read
+except ImportError:
+    # For standalone execution
+    from metrics import record_read
+
+# Default memory budget for cached plan contents
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ContentCache:
+    """LRU cache of file contents with a byte budget."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Create an empty cache holding at most ``max_bytes`` of content."""
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> Tuple[int, int]:
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def read(self, path: Path) -> Optional[str]:
+        """
+        Return the content of ``path``, from cache when still valid.
+
+        Returns:
+            The file content, or None if the file does not exist
+        """
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except FileNotFoundError:
+            self.invalidate(path)
+            return None
+
+        signature = self._signature(stat)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        try:
+            f = open(key, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            # Unlinked since the stat() (archived, pruned, migrated or deleted)
+            self.invalidate(path)
+            return None
+        with f:
+            # Sign what was actually opened, in case the file was replaced meanwhile
+            stat = os.fstat(f.fileno())
+            content = f.read()
+        record_read(stat.st_size)
+        self.put(path, content, stat)
+        return content
+
+    def put(self, path: Path, content: str, stat: Optional[os.stat_result] = None):
+        """Store freshly written or read content for ``path``."""
+        if stat is None:
+            stat = os.stat(path)
+        key = str(path)
+        size = stat.st_size
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (self._signature(stat), content, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, path: Path):
+        """Forget any cached content for ``path``."""
+        with self._lock:
+            self._discard(str(path))
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
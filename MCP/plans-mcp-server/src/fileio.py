@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Plans File I/O Helpers
+
+Crash-safe atomic writes and inter-process file locks. Several server
+processes can share one Plans directory without losing updates.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    from .metrics import record_write
+except ImportError:
+    # For standalone execution
+    from metrics import record_write
+
+
+def atomic_write(path: Union[str, Path], content: Union[str, bytes]):
+    """
+    Replace ``path`` with ``content`` atomically.
+
+    The data is written to a temporary file in the same directory, flushed to
+    disk and renamed over the target. Readers therefore see either the old or
+    the new file, never a partial one, even after a crash.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if isinstance(content, bytes):
+            f = open(tmp_path, 'wb')
+        else:
+            f = open(tmp_path, 'w', encoding='utf-8')
+        with f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+            record_write(os.fstat(f.fileno()).st_size)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def claim_file(path: Union[str, Path]) -> bool:
+    """Create ``path`` exclusively; return False if it already exists."""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a lock file, usable as a context manager.
+
+    The lock is held per open file, so it excludes other threads as well as
+    other processes. A thread that already holds the lock may re-enter it.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def __enter__(self) -> "FileLock":
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._local.depth = depth + 1
+            return self
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.05)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._local.fd = fd
+        self._local.depth = 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        fd = self._local.fd
+        self._local.fd = None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Plans Index Snapshot
+
+A binary snapshot format for the search index that a new process can map
+into memory and use immediately. Loading parses only a small header and the
+per-document metadata. The term dictionary is decoded on the first query
+that needs it, and each term's postings are decoded when that term is
+first looked up.
+
+Layout (integers little-endian):
+
+    magic (8 bytes) | header length (u32) | header (JSON)
+    docs       JSON object: doc id -> metadata, with "terms_at" pointing
+               into doc_terms
+    terms      JSON array of all terms, sorted
+    offsets    u64 per term, plus one, into postings
+    doc_terms  each document's term list, as JSON arrays
+    postings   each term's postings, as JSON [[doc_id, [positions]], ...]
+
+The header records the offset of every section, relative to the end of the
+header, and its length.
+"""
+
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .fileio import atomic_write
+except ImportError:
+    # For standalone execution
+    from fileio import atomic_write
+
+MAGIC = b"PLNSNAP\x00"
+FORMAT_VERSION = 2
+
+_HEADER_LENGTH = struct.Struct("<I")
+_OFFSET = struct.Struct("<Q")
+_OFFSET_PAIR = struct.Struct("<QQ")
+
+Postings = Dict[int, List[int]]
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def encode_postings(postings: Postings) -> bytes:
+    """Serialize one term's postings for the postings section."""
+    return _dumps([[doc_id, positions] for doc_id, positions in postings.items()])
+
+
+class MappedSnapshot:
+    """Read-only view of a snapshot file, decoded lazily."""
+
+    def __init__(self, path: Path):
+        """Map ``path`` and parse its header."""
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if os.name == "nt" or not size:
+                # Windows cannot replace a file that is mapped; read it instead
+                self._buf = f.read()
+            else:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a search index snapshot: {self.path}")
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._buf, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(self._buf[start:start + header_length])
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {self.path}")
+
+        self.generation: int = header["generation"]
+        self.next_id: int = header["next_id"]
+        self.total_length: int = header["total_length"]
+        data_start = start + header_length
+        self._sections: Dict[str, Tuple[int, int]] = {
+            name: (data_start + header[name][0], header[name][1])
+            for name in ("docs", "terms", "offsets", "doc_terms", "postings")
+        }
+        # Bytes parsed eagerly when loading: header and document metadata
+        self.eager_size = data_start + self._sections["docs"][1]
+        self._terms: Optional[List[str]] = None
+
+    def _section(self, name: str) -> bytes:
+        offset, length = self._sections[name]
+        return self._buf[offset:offset + length]
+
+    def docs(self) -> Dict[int, Dict]:
+        """Decode the per-document metadata."""
+        return {int(doc_id): doc for doc_id, doc in json.loads(self._section("docs")).items()}
+
+    def terms(self) -> List[str]:
+        """Return every term in the snapshot, sorted; decoded on first use."""
+        if self._terms is None:
+            self._terms = json.loads(self._section("terms"))
+        return self._terms
+
+    def find(self, term: str) -> int:
+        """Return the index of ``term`` in terms(), or -1."""
+        terms = self.terms()
+        i = bisect_left(terms, term)
+        return i if i < len(terms) and terms[i] == term else -1
+
+    def raw_postings(self, i: int) -> bytes:
+        """Return the encoded postings of the i-th term."""
+        start, end = _OFFSET_PAIR.unpack_from(self._buf, self._sections["offsets"][0] + i * _OFFSET.size)
+        base = self._sections["postings"][0]
+        return self._buf[base + start:base + end]
+
+    def postings(self, i: int) -> Postings:
+        """Decode the postings of the i-th term."""
+        return {doc_id: positions for doc_id, positions in json.loads(self.raw_postings(i))}
+
+    def raw_doc_terms(self, span: List[int]) -> bytes:
+        """Return the encoded term list a document's ``terms_at`` points to."""
+        base = self._sections["doc_terms"][0]
+        return self._buf[base + span[0]:base + span[0] + span[1]]
+
+    def doc_terms(self, span: List[int]) -> List[str]:
+        """Decode the term list a document's ``terms_at`` points to."""
+        return json.loads(self.raw_doc_terms(span))
+
+
+class PostingsMap:
+    """
+    Term -> postings mapping layered over an optional snapshot.
+
+    Postings read from the snapshot are decoded on first access and kept in
+    an overlay, which also holds every change made since the snapshot was
+    loaded. Behaves like the dict it replaces for the operations the index
+    uses; like a dict, it must not be changed while being iterated.
+    """
+
+    def __init__(self, base: Optional[MappedSnapshot] = None):
+        self.base = base
+        self._overlay: Dict[str, Postings] = {}
+        self._deleted = set()
+
+    def _load(self, term: str) -> Optional[Postings]:
+        if self.base is None or term in self._deleted:
+            return None
+        i = self.base.find(term)
+        if i < 0:
+            return None
+        postings = self._overlay[term] = self.base.postings(i)
+        return postings
+
+    def get(self, term: str, default=None):
+        postings = self._overlay.get(term)
+        if postings is None:
+            postings = self._load(term)
+        return default if postings is None else postings
+
+    def __getitem__(self, term: str) -> Postings:
+        postings = self.get(term)
+        if postings is None:
+            raise KeyError(term)
+        return postings
+
+    def __contains__(self, term: str) -> bool:
+        if term in self._overlay:
+            return True
+        return self.base is not None and term not in self._deleted and self.base.find(term) >= 0
+
+    def __setitem__(self, term: str, postings: Postings):
+        self._overlay[term] = postings
+        self._deleted.discard(term)
+
+    def __delitem__(self, term: str):
+        in_overlay = self._overlay.pop(term, None) is not None
+        in_base = term not in self._deleted and self.base is not None and self.base.find(term) >= 0
+        if not in_overlay and not in_base:
+            raise KeyError(term)
+        if in_base:
+            self._deleted.add(term)
+
+    def setdefault(self, term: str, default: Postings) -> Postings:
+        postings = self.get(term)
+        if postings is None:
+            self[term] = postings = default
+        return postings
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._overlay
+        if self.base is not None:
+            overlay, deleted = self._overlay, self._deleted
+            for term in self.base.terms():
+                if term not in overlay and term not in deleted:
+                    yield term
+
+    def raw(self, term: str) -> bytes:
+        """Return the encoded postings of ``term``, reusing snapshot bytes when unchanged."""
+        postings = self._overlay.get(term)
+        if postings is not None:
+            return encode_postings(postings)
+        return self.base.raw_postings(self.base.find(term))
+
+
+def write_snapshot(path: Path, generation: int, next_id: int, total_length: int,
+                   docs: Dict[int, Dict], postings: PostingsMap):
+    """
+    Atomically write a snapshot of ``docs`` and ``postings`` to ``path``.
+
+    Documents carry either their ``terms`` list or, when they came from the
+    snapshot ``postings`` is layered on, a ``terms_at`` span into it.
+    """
+    doc_terms = bytearray()
+    doc_meta = {}
+    for doc_id, doc in docs.items():
+        if "terms" in doc:
+            raw = _dumps(doc["terms"])
+        else:
+            raw = postings.base.raw_doc_terms(doc["terms_at"])
+        meta = {key: value for key, value in doc.items() if key not in ("terms", "terms_at")}
+        meta["terms_at"] = [len(doc_terms), len(raw)]
+        doc_terms += raw
+        doc_meta[str(doc_id)] = meta
+
+    terms = sorted(postings)
+    blob = bytearray()
+    offsets = []
+    for term in terms:
+        offsets.append(len(blob))
+        blob += postings.raw(term)
+    offsets.append(len(blob))
+
+    sections = [
+        ("docs", _dumps(doc_meta)),
+        ("terms", _dumps(terms)),
+        ("offsets", struct.pack(f"<{len(offsets)}Q", *offsets)),
+        ("doc_terms", bytes(doc_terms)),
+        ("postings", bytes(blob)),
+    ]
+    header = {
+        "version": FORMAT_VERSION,
+        "generation": generation,
+        "next_id": next_id,
+        "total_length": total_length,
+    }
+    offset = 0
+    for name, data in sections:
+        header[name] = [offset, len(data)]
+        offset += len(data)
+    encoded = _dumps(header)
+
+    content = bytearray(MAGIC)
+    content += _HEADER_LENGTH.pack(len(encoded))
+    content += encoded
+    for _, data in sections:
+        content += data
+    atomic_write(path, bytes(content))
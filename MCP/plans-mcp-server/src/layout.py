@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Plans Directory Layout
+
+Maps (project, filename) to the location of a plan file under
+``projects/``, and back. The flat layout keeps one folder per project. The
+sharded layouts keep directories small for stores with many projects or very
+large projects:
+
+    flat        projects/<project>/<filename>
+    hash        projects/<2 hex of sha256(project)>/<project>/<filename>
+    date        projects/<project>/<YYYY>/<MM>/<filename>
+    hash-date   projects/<2 hex>/<project>/<YYYY>/<MM>/<filename>
+
+The date shard comes from the YYYY-MM-DD prefix of the filename. Filenames
+without that prefix are kept directly in the project folder. Every location
+is computed, never searched for.
+
+Each combination of shards gives a different depth, so parse() recovers the
+project and filename of any plan file without knowing the layout. A store
+half-way through a migration can therefore still be read and rebuilt.
+
+The layout of a store is recorded in ``layout.json``; change it with
+``plans_admin.py migrate``.
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+try:
+    from .fileio import atomic_write
+except ImportError:
+    # For standalone execution
+    from fileio import atomic_write
+
+LAYOUTS = ("flat", "hash", "date", "hash-date")
+
+LAYOUT_FILE = "layout.json"
+
+_DATED_FILENAME = re.compile(r"(\d{4})-(\d{2})-\d{2}")
+
+# Path depth below projects/ -> (index of the project part, or None if not a plan path)
+_PROJECT_PART = {2: 0, 3: 1, 4: 0, 5: 1}
+
+
+class PlanLayout:
+    """Where plan files live under the projects directory."""
+
+    def __init__(self, name: str = "flat"):
+        """
+        Args:
+            name: One of LAYOUTS
+
+        Raises:
+            ValueError: If ``name`` is not a known layout
+        """
+        if name not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {name!r} (expected one of {', '.join(LAYOUTS)})")
+        self.name = name
+        self.shard_projects = name in ("hash", "hash-date")
+        self.shard_dates = name in ("date", "hash-date")
+
+    @classmethod
+    def load(cls, plans_dir: Path) -> "PlanLayout":
+        """Return the layout recorded for a store; flat if none is recorded."""
+        try:
+            with open(Path(plans_dir) / LAYOUT_FILE, 'r', encoding='utf-8') as f:
+                return cls(json.load(f)["layout"])
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, plans_dir: Path):
+        """Record this layout as the layout of a store."""
+        atomic_write(Path(plans_dir) / LAYOUT_FILE, json.dumps({"layout": self.name}) + "\n")
+
+    def project_dir(self, projects_dir: Path, project: str) -> Path:
+        """Return the folder of ``project``."""
+        if self.shard_projects:
+            return projects_dir / hashlib.sha256(project.encode('utf-8')).hexdigest()[:2] / project
+        return projects_dir / project
+
+    def plan_path(self, projects_dir: Path, project: str, filename: str) -> Path:
+        """Return the location of a plan file."""
+        path = self.project_dir(projects_dir, project)
+        if self.shard_dates:
+            match = _DATED_FILENAME.match(filename)
+            if match:
+                path = path / match.group(1) / match.group(2)
+        return path / filename
+
+    @staticmethod
+    def parse(projects_dir: Path, path: Path) -> Optional[Tuple[str, str]]:
+        """Return the (project, filename) of a plan file in any layout, or None."""
+        parts = Path(path).relative_to(projects_dir).parts
+        index = _PROJECT_PART.get(len(parts))
+        if index is None:
+            return None
+        return parts[index], parts[-1]
+
+    @classmethod
+    def iter_plan_files(cls, projects_dir: Path) -> Iterator[Tuple[Path, str, str]]:
+        """Yield (path, project, filename) for every plan file, whatever its layout."""
+        for plan_file in projects_dir.rglob("*.md"):
+            parsed = cls.parse(projects_dir, plan_file)
+            if parsed is not None:
+                yield (plan_file,) + parsed
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Plans Metrics
+
+Per-tool counters for the MCP server: call and error counts, a latency
+histogram, bytes read and written, and files touched.
+
+I/O is attributed to the tool call that caused it through a context
+variable. The server sets it between begin() and end(), and the file
+helpers report into it with record_read() and record_write(). Outside a
+tool call (e.g. background index rewrites) those are no-ops. The hot path
+costs a context-variable lookup and a few integer additions under the
+call's own lock, which only contends when one call does I/O on several
+threads (save_plans); the registry lock is taken once per call.
+"""
+
+import bisect
+import contextvars
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf
+# bucket catches everything slower
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class CallStats:
+    """A tool call in progress and the I/O it has performed so far."""
+
+    __slots__ = ("tool", "failed", "started", "token", "lock",
+                 "bytes_read", "bytes_written", "files_read", "files_written")
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.failed = False
+        self.started = time.perf_counter()
+        self.token = None
+        self.lock = threading.Lock()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.files_read = 0
+        self.files_written = 0
+
+
+_current_call: contextvars.ContextVar[Optional[CallStats]] = contextvars.ContextVar(
+    "plans_current_call", default=None
+)
+
+
+def record_read(nbytes: int, files: int = 1):
+    """Attribute a read of ``nbytes`` to the current tool call, if any."""
+    stats = _current_call.get()
+    if stats is not None:
+        with stats.lock:
+            stats.bytes_read += nbytes
+            stats.files_read += files
+
+
+def record_write(nbytes: int, files: int = 1):
+    """Attribute a write of ``nbytes`` to the current tool call, if any."""
+    stats = _current_call.get()
+    if stats is not None:
+        with stats.lock:
+            stats.bytes_written += nbytes
+            stats.files_written += files
+
+
+class ToolMetrics:
+    """Accumulated counters of one tool."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.files_read = 0
+        self.files_written = 0
+
+    def to_dict(self) -> Dict:
+        cumulative = 0
+        histogram = {}
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self.buckets):
+            cumulative += count
+            histogram[str(bound)] = cumulative
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_seconds': {
+                'sum': self.latency_sum,
+                'count': self.calls,
+                'buckets': histogram,
+            },
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'files_read': self.files_read,
+            'files_written': self.files_written,
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe per-tool metrics store."""
+
+    def __init__(self):
+        self._tools: Dict[str, ToolMetrics] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def begin(self, tool: str) -> CallStats:
+        """
+        Start timing a call of ``tool`` and collecting the I/O it performs.
+
+        Work done on other threads must run in a copy of the current context
+        (see contextvars.copy_context) for its I/O to be attributed. Set
+        ``failed`` on the returned object to count the call as an error.
+        """
+        stats = CallStats(tool)
+        stats.token = _current_call.set(stats)
+        return stats
+
+    def end(self, stats: CallStats):
+        """Finish a call started with begin() and record it."""
+        elapsed = time.perf_counter() - stats.started
+        _current_call.reset(stats.token)
+        self.observe(stats.tool, elapsed, stats.failed, stats)
+
+    def observe(self, tool: str, seconds: float, error: bool = False,
+                stats: Optional[CallStats] = None):
+        """Record one completed call of ``tool``."""
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            metrics = self._tools.get(tool)
+            if metrics is None:
+                metrics = self._tools[tool] = ToolMetrics()
+            metrics.calls += 1
+            metrics.errors += error
+            metrics.buckets[bucket] += 1
+            metrics.latency_sum += seconds
+            if stats is not None:
+                metrics.bytes_read += stats.bytes_read
+                metrics.bytes_written += stats.bytes_written
+                metrics.files_read += stats.files_read
+                metrics.files_written += stats.files_written
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return every tool's counters as plain dicts."""
+        with self._lock:
+            return {tool: metrics.to_dict() for tool, metrics in sorted(self._tools.items())}
+
+    def to_json(self, extra: Optional[Dict] = None) -> str:
+        """Render the metrics (plus optional ``extra`` sections) as JSON."""
+        report = {
+            'uptime_seconds': time.time() - self.started_at,
+            'tools': self.snapshot(),
+        }
+        if extra:
+            report.update(extra)
+        return json.dumps(report, indent=2)
+
+    def to_prometheus(self, extra: Optional[Dict[str, Tuple[str, str, float]]] = None) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            extra: Optional process-wide metrics, as name -> (type, help,
+                value); names get the ``plans_`` prefix
+        """
+        tools = self.snapshot()
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        counters = (
+            ("calls", "plans_tool_calls_total", "Tool calls handled."),
+            ("errors", "plans_tool_errors_total", "Tool calls that failed."),
+            ("bytes_read", "plans_tool_read_bytes_total", "Bytes read from the Plans store."),
+            ("bytes_written", "plans_tool_written_bytes_total", "Bytes written to the Plans store."),
+            ("files_read", "plans_tool_files_read_total", "Files read from the Plans store."),
+            ("files_written", "plans_tool_files_written_total", "Files written to the Plans store."),
+        )
+        for key, name, help_text in counters:
+            family(name, "counter", help_text)
+            for tool, metrics in tools.items():
+                lines.append(f'{name}{{tool="{tool}"}} {metrics[key]}')
+
+        family("plans_tool_latency_seconds", "histogram", "Tool call latency.")
+        for tool, metrics in tools.items():
+            latency = metrics['latency_seconds']
+            for bound, count in latency['buckets'].items():
+                lines.append(f'plans_tool_latency_seconds_bucket{{tool="{tool}",le="{bound}"}} {count}')
+            lines.append(f'plans_tool_latency_seconds_sum{{tool="{tool}"}} {latency["sum"]}')
+            lines.append(f'plans_tool_latency_seconds_count{{tool="{tool}"}} {latency["count"]}')
+
+        for name, (kind, help_text, value) in (extra or {}).items():
+            family(f"plans_{name}", kind, help_text)
+            lines.append(f"plans_{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the server
+metrics = MetricsRegistry()
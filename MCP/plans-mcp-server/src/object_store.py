@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Plans Object Store
+
+Content-addressed storage for plan bodies. Each unique body is stored once
+under ``objects/<2 hex>/<62 hex>``, named by its SHA-256. Saving a body that
+is already present costs a hash and a stat(), with no write.
+
+Plans stored this way have no ``.md`` file of their own. They are referenced
+from the catalog by hash, and every reference is also appended to
+``objects/refs.log``. The catalog can therefore be rebuilt without a file
+per plan. Objects are immutable, so readers need no locking.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    from .fileio import FileLock, atomic_write
+    from .metrics import record_read, record_write
+except ImportError:
+    # For standalone execution
+    from fileio import FileLock, atomic_write
+    from metrics import record_read, record_write
+
+
+class ObjectStore:
+    """Blobs named by the SHA-256 of their content, plus a log of references to them."""
+
+    def __init__(self, root: Path):
+        """Use ``root`` as the object directory; it is created on first write."""
+        self.root = Path(root)
+        self.refs_path = self.root / "refs.log"
+        self._refs_lock = FileLock(self.root / "refs.lock")
+
+    @staticmethod
+    def digest(content: str) -> str:
+        """Return the hex SHA-256 naming ``content``."""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def path(self, digest: str) -> Path:
+        """Return where the object named ``digest`` is stored."""
+        return self.root / digest[:2] / digest[2:]
+
+    def put(self, content: str) -> str:
+        """
+        Store ``content`` unless an identical object already exists.
+
+        Returns:
+            The object's digest
+        """
+        digest = self.digest(content)
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Concurrent writers of the same object write identical bytes
+            atomic_write(path, content)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the content of the object named ``digest``, or None if it is not stored."""
+        try:
+            with open(self.path(digest), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        record_read(len(data))
+        return data.decode('utf-8')
+
+    def __contains__(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def append_refs(self, records: List[Dict]):
+        """Append catalog records that refer to objects to the reference log."""
+        if not records:
+            return
+        data = "".join(
+            json.dumps(record, separators=(',', ':')) + "\n" for record in records
+        ).encode('utf-8')
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._refs_lock:
+            fd = os.open(self.refs_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        record_write(len(data))
+
+    def iter_refs(self) -> Iterator[Dict]:
+        """Yield every logged reference, oldest first."""
+        try:
+            with open(self.refs_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        record_read(len(data))
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line from an interrupted write
+                continue
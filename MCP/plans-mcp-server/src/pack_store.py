@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Plans Archive Packs
+
+Cold storage for old plans. An archive run bundles many plan files into one
+immutable pack under ``packs/``. Each plan is compressed on its own, so a
+single plan can be read back without decompressing the rest of the pack.
+
+Layout (integers little-endian):
+
+    magic (8 bytes) | header length (u32) | header (JSON) | data
+
+The header maps "project/filename" to the plan's compressed span, relative
+to the end of the header, plus its catalog metadata. The catalog can
+therefore be rebuilt from the headers alone. The catalog records which pack
+holds each archived plan, so a read opens exactly one pack. A pack's header
+is parsed the first time the pack is read and then kept in memory.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    from .fileio import atomic_write
+    from .metrics import record_read
+except ImportError:
+    # For standalone execution
+    from fileio import atomic_write
+    from metrics import record_read
+
+MAGIC = b"PLNPACK\x00"
+FORMAT_VERSION = 1
+
+_HEADER_LENGTH = struct.Struct("<I")
+
+# zlib level used for archived plans; packs are written rarely and read often
+COMPRESSION_LEVEL = 9
+
+
+def _key(project: str, filename: str) -> str:
+    return f"{project}/{filename}"
+
+
+class PackStore:
+    """Directory of archive packs with random access by project and filename."""
+
+    def __init__(self, root: Path):
+        """Use ``root`` as the pack directory; it is created on first write."""
+        self.root = Path(root)
+        self._headers: Dict[str, Tuple[int, Dict[str, Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def write_pack(self, plans: Iterable[Tuple[Dict, str]]) -> Optional[str]:
+        """
+        Write a new pack holding ``plans``.
+
+        Args:
+            plans: (catalog record, content) pairs
+
+        Returns:
+            The pack's name, or None if there was nothing to write
+        """
+        entries: Dict[str, Dict] = {}
+        data = bytearray()
+        for record, content in plans:
+            compressed = zlib.compress(content.encode('utf-8'), COMPRESSION_LEVEL)
+            entries[_key(record['project'], record['filename'])] = {
+                'offset': len(data),
+                'length': len(compressed),
+                'date': record.get('date'),
+                'status': record.get('status'),
+                'tags': record.get('tags', []),
+                'size': record['size'],
+                'mtime': record['mtime'],
+            }
+            data += compressed
+        if not entries:
+            return None
+
+        header = json.dumps({'version': FORMAT_VERSION, 'entries': entries},
+                            separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = f"pack-{time.time_ns()}-{os.getpid()}.pack"
+        atomic_write(self.root / name, MAGIC + _HEADER_LENGTH.pack(len(header)) + header + bytes(data))
+        return name
+
+    def _header(self, name: str) -> Tuple[int, Dict[str, Dict]]:
+        """Return a pack's data offset and entry table, parsing it on first use."""
+        with self._lock:
+            cached = self._headers.get(name)
+        if cached is not None:
+            return cached
+
+        with open(self.root / name, 'rb') as f:
+            prefix = f.read(len(MAGIC) + _HEADER_LENGTH.size)
+            if prefix[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"Not a plan pack: {self.root / name}")
+            (header_length,) = _HEADER_LENGTH.unpack_from(prefix, len(MAGIC))
+            header = json.loads(f.read(header_length))
+        record_read(len(prefix) + header_length)
+        if header.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported pack version in {self.root / name}")
+
+        parsed = (len(prefix) + header_length, header['entries'])
+        with self._lock:
+            self._headers[name] = parsed
+        return parsed
+
+    def read(self, name: str, project: str, filename: str) -> Optional[str]:
+        """Return an archived plan's content, or None if the pack does not hold it."""
+        try:
+            data_start, entries = self._header(name)
+        except FileNotFoundError:
+            return None
+        entry = entries.get(_key(project, filename))
+        if entry is None:
+            return None
+        with open(self.root / name, 'rb') as f:
+            f.seek(data_start + entry['offset'])
+            compressed = f.read(entry['length'])
+        record_read(len(compressed))
+        return zlib.decompress(compressed).decode('utf-8')
+
+    def packs(self) -> Iterator[str]:
+        """Yield the names of all packs, oldest first."""
+        if self.root.is_dir():
+            yield from sorted(path.name for path in self.root.glob("pack-*.pack"))
+
+    def records(self, name: str) -> Iterator[Dict]:
+        """Yield catalog records for every plan in a pack."""
+        for key, entry in self._header(name)[1].items():
+            project, _, filename = key.partition('/')
+            yield {
+                'project': project,
+                'filename': filename,
+                'date': entry['date'],
+                'status': entry.get('status'),
+                'tags': entry['tags'],
+                'size': entry['size'],
+                'mtime': entry['mtime'],
+                'pack': name,
+            }
@@ -8,41 +8,49 @@ from Claude Code's plan mode into organized markdown files.
 This is a standalone version that can be used independently or as part of the MCP server.
 """
 
+import ast
+import contextvars
+import difflib
 import os
 import re
-from datetime import datetime
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
+try:
+    from .catalog import PlanCatalog, decode_cursor, encode_cursor
+    from .content_cache import DEFAULT_MAX_BYTES, ContentCache
+    from .fileio import FileLock, atomic_write, claim_file
+    from .layout import PlanLayout
+    from .metrics import record_read
+    from .object_store import ObjectStore
+    from .pack_store import PackStore
+    from .related_index import RelatedIndex
+    from .search_index import SearchIndex, make_snippet
+    from .similarity_index import DEFAULT_THRESHOLD, SimilarityIndex
+    from .tag_classifier import TagClassifier
+    from .version_history import VersionHistory
+except ImportError:
+    # For standalone execution
+    from catalog import PlanCatalog, decode_cursor, encode_cursor
+    from content_cache import DEFAULT_MAX_BYTES, ContentCache
+    from fileio import FileLock, atomic_write, claim_file
+    from layout import PlanLayout
+    from metrics import record_read
+    from object_store import ObjectStore
+    from pack_store import PackStore
+    from related_index import RelatedIndex
+    from search_index import SearchIndex, make_snippet
+    from similarity_index import DEFAULT_THRESHOLD, SimilarityIndex
+    from tag_classifier import TagClassifier
+    from version_history import VersionHistory
 
-class PlanManager:
-    def __init__(self, plans_dir: str = None):
-        """Initialize the plan manager with the Plans directory."""
-        if plans_dir is None:
-            # Default to ~/.claude/Plans for compatibility
-            plans_dir = os.path.join(os.path.expanduser("~"), ".claude", "Plans")
-        
-        self.plans_dir = Path(plans_dir)
-        self.projects_dir = self.plans_dir / "projects"
-        self.templates_dir = self.plans_dir / "templates"
-        self.index_file = self.plans_dir / "index.md"
-        
-        # Ensure directories exist
-        self._ensure_directories()
-    
-    def _ensure_directories(self):
-        """Ensure all required directories exist."""
-        self.plans_dir.mkdir(exist_ok=True)
-        self.projects_dir.mkdir(exist_ok=True)
-        self.templates_dir.mkdir(exist_ok=True)
-        
-        # Create initial index if it doesn't exist
-        if not self.index_file.exists():
-            self._create_initial_index()
-    
-    def _create_initial_index(self):
-        """Create the initial index.md file."""
-        initial_content = """# Plans Index
+
+# Layout of index.md; regenerated from the catalog on every write
+INDEX_TEMPLATE = """# Plans Index
 
 This is the master index of all validated project plans stored in the Plans system.
 
@@ -50,10 +58,10 @@ This is the master index of all validated project plans stored in the Plans syst
 The Plans system automatically captures and stores validated project plans created in Claude Code's plan mode. Each plan is saved as a markdown file with metadata and structured content.
 
 ## Recent Plans
-*No plans have been saved yet.*
+{recent}
 
 ## Projects
-*No projects have been created yet.*
+{projects}
 
 ## Usage
 When you exit plan mode in Claude Code, your validated plan will be automatically saved to the appropriate project folder and indexed here.
@@ -70,10 +78,125 @@ Plans/
 
 ---
 *Last updated: {date}*
-*Total plans: 0*""".format(date=datetime.now().strftime("%Y-%m-%d"))
+*Total plans: {total}*"""
+
+# Number of entries shown under "Recent Plans"
+RECENT_PLANS = 10
+
+# Maximum number of plans written to one archive pack
+PACK_MAX_PLANS = 5000
+
+# Near-duplicates reported for a saved plan
+SIMILAR_REPORTED = 5
+
+# Calendar months, the current one included, that plan_stats() growth covers
+GROWTH_MONTHS = 3
+
+
+def parse_time_bound(value, end: bool = False) -> Optional[float]:
+    """
+    Turn a since/until filter into a timestamp.
+    
+    Args:
+        value: None, a timestamp, or an ISO date ("2025-03-01") or
+            date and time ("2025-03-01T14:30") in local time
+        end: If True, a bare date means the end of that day, so
+            until="2025-03-31" still includes plans saved on the 31st
+    
+    Raises:
+        ValueError: If ``value`` is not a timestamp or an ISO date
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD or an ISO date and time)")
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment.timestamp()
+
+
+class PlanManager:
+    def __init__(self, plans_dir: str = None, cache_bytes: int = DEFAULT_MAX_BYTES,
+                 defer_index: bool = False, dedup: bool = False,
+                 similarity_threshold: float = DEFAULT_THRESHOLD, merge_similar: bool = False,
+                 keep_files: Optional[int] = None):
+        """
+        Initialize the plan manager with the Plans directory.
+        
+        Args:
+            plans_dir: Root of the Plans store (defaults to ~/.claude/Plans)
+            cache_bytes: Memory budget for the plan content cache
+            defer_index: If True, saves only mark index.md dirty and the
+                caller is responsible for calling write_index() later
+            dedup: If True, new plans are stored as content-addressed
+                objects, each unique body once, instead of as .md files
+            similarity_threshold: Estimated similarity at or above which a
+                saved plan is reported as a near-duplicate of a stored one
+            merge_similar: If True, a near-duplicate of a plan in another
+                project is saved as a new version of that project instead
+            keep_files: If set, each save deletes the .md files of versions
+                that fall out of the project's ``keep_files`` most recent
+                ones, once they are in the version history. By default every
+                version keeps its file as well as its history entry.
+        """
+        if keep_files is not None and keep_files < 1:
+            raise ValueError("keep_files must be at least 1")
+        if plans_dir is None:
+            # Default to ~/.claude/Plans for compatibility
+            plans_dir = os.path.join(os.path.expanduser("~"), ".claude", "Plans")
         
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            f.write(initial_content)
+        self.plans_dir = Path(plans_dir)
+        self.projects_dir = self.plans_dir / "projects"
+        self.templates_dir = self.plans_dir / "templates"
+        self.index_file = self.plans_dir / "index.md"
+        self.layout = PlanLayout.load(self.plans_dir)
+        self.objects = ObjectStore(self.plans_dir / "objects")
+        self.history = VersionHistory(self.plans_dir / "history", objects=self.objects)
+        self.packs = PackStore(self.plans_dir / "packs")
+        self.dedup = dedup
+        self._search_index = SearchIndex(self.plans_dir / "search_index.json")
+        self._search_index_loaded = False
+        self._search_index_lock = threading.Lock()
+        self._similarity_index = SimilarityIndex(self.plans_dir / "similarity.log")
+        self._similarity_index_loaded = False
+        self._similarity_index_lock = threading.Lock()
+        self._related_index = RelatedIndex(self.plans_dir / "related.log", reader=self._read_plan)
+        self._related_index_loaded = False
+        self._related_index_lock = threading.Lock()
+        self.similarity_threshold = similarity_threshold
+        self.merge_similar = merge_similar
+        self.keep_files = keep_files
+        self.content_cache = ContentCache(cache_bytes)
+        self.defer_index = defer_index
+        self.index_dirty = False
+        # Serializes index.md rewrites across threads and processes
+        self._index_lock = threading.Lock()
+        self._index_file_lock = FileLock(self.plans_dir / "index.lock")
+        # Plan files claimed by saves in progress; apply_file_changes() leaves them alone
+        self._saving: Set[Path] = set()
+        self._saving_lock = threading.Lock()
+        
+        # Ensure directories exist
+        self._ensure_directories()
+        
+        self.tag_classifier = TagClassifier.from_file(self.templates_dir / "tag_rules.json")
+        self.catalog = PlanCatalog(self.plans_dir / "catalog.db")
+        if self.catalog.needs_rebuild:
+            self.rebuild_catalog()
+        
+        # Create initial index if it doesn't exist
+        if not self.index_file.exists():
+            self.write_index()
+    
+    def _ensure_directories(self):
+        """Ensure all required directories exist."""
+        self.plans_dir.mkdir(exist_ok=True)
+        self.projects_dir.mkdir(exist_ok=True)
+        self.templates_dir.mkdir(exist_ok=True)
     
     def _sanitize_project_name(self, name: str) -> str:
         """Sanitize project name for use as folder name."""
@@ -97,45 +220,91 @@ Plans/
                 continue
         
         # Fallback: use timestamp if no clear project name found
+        return self._default_project_name()
+    
+    @staticmethod
+    def _default_project_name() -> str:
+        """Name a project after the current time."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         return f"project_{timestamp}"
     
-    def _create_project_folder(self, project_name: str) -> Path:
-        """Create project folder if it doesn't exist."""
-        project_path = self.projects_dir / project_name
-        project_path.mkdir(exist_ok=True)
-        return project_path
+    def plan_path(self, project_name: str, filename: str) -> Path:
+        """Return where a plan's .md file lives (or would live) in the store's layout."""
+        return self.layout.plan_path(self.projects_dir, project_name, filename)
+    
+    def _plan_location(self, plan_file: Path) -> Tuple[str, str]:
+        """
+        Return the (project, filename) of a plan file.
+        
+        Raises:
+            ValueError: If the path is not a plan file location of the store
+        """
+        parsed = self.layout.parse(self.projects_dir, plan_file)
+        if parsed is None:
+            raise ValueError(f"Not a plan file location: {plan_file}")
+        return parsed
+    
+    def _remove_empty_dirs(self, directory: Path):
+        """Remove ``directory`` and its parents below projects/ while they are empty."""
+        while directory != self.projects_dir and self.projects_dir in directory.parents:
+            try:
+                directory.rmdir()
+            except OSError:
+                # Not empty
+                return
+            directory = directory.parent
     
-    def _generate_filename(self, project_name: str) -> str:
-        """Generate filename for the plan."""
-        timestamp = datetime.now().strftime("%Y-%m-%d")
+    def _generate_filename(self, project_name: str, attempt: int = 1,
+                           digest: str = None) -> str:
+        """
+        Generate filename for the plan; later attempts add a counter suffix.
+        
+        Plans stored as objects carry a prefix of their body's ``digest``
+        instead, which keeps names unique without claiming a file.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        if digest:
+            timestamp += f"_{digest[:8]}"
+        elif attempt > 1:
+            timestamp += f"-{attempt}"
         return f"{timestamp}_plan.md"
     
+    def _claim_plan_file(self, project_name: str) -> Path:
+        """
+        Reserve a new, unique plan file in the project folder.
+        
+        The file is created exclusively, so concurrent saves from other
+        threads or processes can never pick the same name. Names of versions
+        whose files were pruned are skipped too, so their history is kept.
+        """
+        attempt = 1
+        while True:
+            filename = self._generate_filename(project_name, attempt)
+            plan_file_path = self.plan_path(project_name, filename)
+            # Refuse before creating anything a rebuild could not attribute
+            self._plan_location(plan_file_path)
+            plan_file_path.parent.mkdir(parents=True, exist_ok=True)
+            if (project_name, filename) not in self.history and claim_file(plan_file_path):
+                with self._saving_lock:
+                    self._saving.add(plan_file_path)
+                return plan_file_path
+            attempt += 1
+    
     def _create_plan_metadata(self, project_name: str, plan_content: str) -> str:
         """Create frontmatter metadata for the plan."""
         current_date = datetime.now().strftime("%Y-%m-%d")
         
-        # Extract tags from plan content (basic implementation)
-        tags = []
-        content_lower = plan_content.lower()
-        if 'web' in content_lower or 'website' in content_lower:
-            tags.append('web')
-        if 'api' in content_lower:
-            tags.append('api')
-        if 'database' in content_lower:
-            tags.append('database')
-        if 'ai' in content_lower or 'machine learning' in content_lower:
-            tags.append('ai')
-        if 'react' in content_lower:
-            tags.append('react')
-        if 'python' in content_lower:
-            tags.append('python')
-        if 'typescript' in content_lower or 'javascript' in content_lower:
-            tags.append('javascript')
+        # Extract tags from plan content using the configured keyword rules
+        tags = self.tag_classifier.classify(plan_content)
         
+        return self._render_metadata(project_name, current_date, tags)
+    
+    @staticmethod
+    def _render_metadata(project_name: str, date: str, tags: List[str]) -> str:
+        """Render the frontmatter block; also rebuilds it for plans stored as objects."""
         metadata = f"""---
 project_name: "{project_name}"
-date: "{current_date}"
+date: "{date}"
 status: "validated"
 tags: {tags}
 version: "1.0"
@@ -156,18 +325,134 @@ auto_generated: true
         Returns:
             Path to the saved plan file
         """
+        return self.save_plan(plan_content, project_name)['path']
+    
+    def save_plan(self, plan_content: str, project_name: str = None,
+                  merge_similar: Optional[bool] = None) -> Dict:
+        """
+        Save a validated plan and report near-duplicates of it.
+        
+        Args:
+            plan_content: The plan content from exit_plan_mode
+            project_name: Optional project name override
+            merge_similar: Overrides the manager's merge_similar setting
+            
+        Returns:
+            {'path': Path, 'similar': [...], 'merged_into': dict or None}.
+            'similar' lists stored plans of other projects at or above the
+            similarity threshold, most similar first. 'merged_into' is the
+            plan whose project the save was redirected to, if any.
+        """
+        plan_file_path, full_content, body, duplicates = self._prepare_plan(
+            plan_content, project_name, merge_similar
+        )
+        
+        # Save the file
+        self._write_plan_file(plan_file_path, full_content, body)
+        
+        error = self._record_saved_plans([(plan_file_path, full_content, body)])[0]
+        if error is not None:
+            raise error
+        
+        return dict(duplicates, path=plan_file_path)
+    
+    def save_plans(self, plans: Sequence[Tuple[str, Optional[str]]],
+                   max_workers: int = 8, merge_similar: Optional[bool] = None) -> List[Dict]:
+        """
+        Save many validated plans at once.
+        
+        Plan files are written in parallel; the catalog, search index and
+        master index are then updated once for the whole batch.
+        
+        Args:
+            plans: (plan_content, project_name) pairs; project_name may be None
+            max_workers: Maximum number of files written concurrently
+            merge_similar: Overrides the manager's merge_similar setting
+            
+        Returns:
+            One result per input pair, in order: {'ok': True, 'path': Path}
+            plus the 'similar' and 'merged_into' of save_plan(), or
+            {'ok': False, 'error': str}. Plans of the same batch are not
+            compared with each other.
+        """
+        results: List[Dict] = [{} for _ in plans]
+        
+        # Prepare every item up front; each one claims its own unique file
+        prepared = []
+        for i, (plan_content, project_name) in enumerate(plans):
+            try:
+                if not plan_content or not plan_content.strip():
+                    raise ValueError("plan_content cannot be empty")
+                plan_file_path, full_content, body, duplicates = self._prepare_plan(
+                    plan_content, project_name, merge_similar
+                )
+            except Exception as e:
+                results[i] = {'ok': False, 'error': str(e)}
+                continue
+            results[i] = duplicates
+            prepared.append((i, plan_file_path, full_content, body))
+        
+        def write_one(i: int, plan_file_path: Path, full_content: str, body: str) -> bool:
+            try:
+                self._write_plan_file(plan_file_path, full_content, body)
+            except OSError as e:
+                results[i] = {'ok': False, 'error': str(e)}
+                return False
+            results[i] = dict(results[i], ok=True, path=plan_file_path)
+            return True
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # Run each write in a copy of the caller's context, so its I/O
+            # is attributed to the caller's tool call
+            futures = [executor.submit(contextvars.copy_context().run, write_one, *item)
+                       for item in prepared]
+            ok = [future.result() for future in futures]
+        
+        written = [item for item, item_ok in zip(prepared, ok) if item_ok]
+        errors = self._record_saved_plans([item[1:] for item in written])
+        for (i, *_), error in zip(written, errors):
+            if error is not None:
+                results[i] = {'ok': False, 'error': str(error)}
+        
+        return results
+    
+    def _prepare_plan(self, plan_content: str, project_name: str = None,
+                      merge_similar: Optional[bool] = None) -> Tuple[Path, str, str, Dict]:
+        """
+        Resolve the target file for a plan and build its full content.
+        
+        Returns:
+            The plan's path, its full content, its body (plan_content) and
+            its near-duplicates as {'similar': [...], 'merged_into': ...}
+        """
         # Extract project name if not provided
         if project_name is None:
             project_name = self._extract_project_name_from_plan(plan_content)
         else:
             project_name = self._sanitize_project_name(project_name)
+        if not project_name:
+            # Nothing usable was left after sanitizing, e.g. an emoji-only title
+            project_name = self._default_project_name()
         
-        # Create project folder
-        project_path = self._create_project_folder(project_name)
+        matches = self.similarity_index.query(plan_content, self.similarity_threshold)
+        merged_into = None
+        if self.merge_similar if merge_similar is None else merge_similar:
+            merged_into = next((match for match in matches if match['project'] != project_name), None)
+            if merged_into is not None:
+                project_name = merged_into['project']
+        # Earlier versions of the same project are not duplicates
+        similar = [match for match in matches if match['project'] != project_name][:SIMILAR_REPORTED]
         
-        # Generate filename
-        filename = self._generate_filename(project_name)
-        plan_file_path = project_path / filename
+        if self.dedup:
+            # Nothing is created on disk until the object is written
+            digest = self.objects.digest(plan_content)
+            plan_file_path = self.plan_path(
+                project_name, self._generate_filename(project_name, digest=digest)
+            )
+            self._plan_location(plan_file_path)
+        else:
+            # Reserve a collision-free filename, creating its folder
+            plan_file_path = self._claim_plan_file(project_name)
         
         # Create metadata
         metadata = self._create_plan_metadata(project_name, plan_content)
@@ -175,106 +460,895 @@ auto_generated: true
         # Combine metadata and content
         full_content = metadata + plan_content
         
-        # Save the file
-        with open(plan_file_path, 'w', encoding='utf-8') as f:
-            f.write(full_content)
+        return plan_file_path, full_content, plan_content, {'similar': similar, 'merged_into': merged_into}
+    
+    def _write_plan_file(self, plan_file_path: Path, full_content: str, body: str):
+        """
+        Atomically write a claimed plan file, releasing the claim on failure.
+        
+        In dedup mode only the body is stored, as an object, and only if no
+        identical body has been stored before.
+        """
+        if self.dedup:
+            self.objects.put(body)
+            return
+        try:
+            atomic_write(plan_file_path, full_content)
+        except OSError:
+            try:
+                plan_file_path.unlink()
+            except OSError:
+                pass
+            with self._saving_lock:
+                self._saving.discard(plan_file_path)
+            raise
+    
+    def _record_saved_plans(self, saved: List[Tuple[Path, str, str]]) -> List[Optional[Exception]]:
+        """
+        Update cache, catalog, search index and master index for written plans.
         
-        # Update index
-        self._update_index(project_name, filename, plan_file_path)
+        Returns:
+            One entry per plan, in order: None if it was recorded, or the
+            error that kept it out of the catalog and indexes
+        """
+        if not saved:
+            return []
+        
+        errors: List[Optional[Exception]] = []
+        records, recorded = [], []
+        for plan_file_path, full_content, body in saved:
+            try:
+                if self.dedup:
+                    record = self._object_record(plan_file_path, full_content, body)
+                else:
+                    self.content_cache.put(plan_file_path, full_content)
+                    record = self._catalog_record(plan_file_path, full_content)
+                # Log versions first, so a rebuilt catalog never misses one
+                self.history.append([(record['project'], record['filename'], record['mtime'],
+                                      full_content, body if record.get('blob') else None)])
+            except Exception as e:
+                # Only this plan fails; the rest of the batch is still recorded
+                if not self.dedup:
+                    self.content_cache.invalidate(plan_file_path)
+                    try:
+                        plan_file_path.unlink()
+                    except OSError:
+                        pass
+                errors.append(e)
+                continue
+            errors.append(None)
+            records.append(record)
+            recorded.append(full_content)
         
-        return plan_file_path
+        self.objects.append_refs([record for record in records if record.get('blob')])
+        self.catalog.record_saves(records)
+        documents = [
+            (record['project'], record['filename'], full_content, record['mtime'])
+            for record, full_content in zip(records, recorded)
+        ]
+        self.search_index.add_documents(documents)
+        self.similarity_index.add_documents(documents)
+        # Until the first related_plans() loads the index, this only logs the
+        # plans' names; their terms are counted at load time
+        self._related_index.add_documents(documents)
+        with self._saving_lock:
+            self._saving.difference_update(plan_file_path for plan_file_path, _, _ in saved)
+        if self.keep_files is not None:
+            # Only the versions these saves pushed out of the window can
+            # still have files; older ones were pruned by earlier saves
+            saves = Counter(record['project'] for record in records)
+            for project, count in saves.items():
+                self._prune_project(project, self.keep_files, limit=self.keep_files + count)
+        if records:
+            self._update_index()
+        return errors
     
-    def _update_index(self, project_name: str, filename: str, file_path: Path):
-        """Update the master index with the new plan."""
-        # Read current index
-        if self.index_file.exists():
-            with open(self.index_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+    def _update_index(self):
+        """Bring index.md up to date, or just mark it dirty in deferred mode."""
+        if self.defer_index:
+            self.index_dirty = True
         else:
-            content = ""
+            self.write_index()
+    
+    def render_index(self) -> str:
+        """Render the master index from the catalog."""
+        recent = []
+        for record in self.catalog.most_recent(RECENT_PLANS):
+            plan_file = self.plan_path(record['project'], record['filename'])
+            saved_date = record['date'] or datetime.fromtimestamp(record['mtime']).strftime("%Y-%m-%d")
+            name = record['filename'].replace('_plan.md', '')
+            if plan_file.exists():
+                recent.append(f"- [{record['project']}]({plan_file.relative_to(self.plans_dir)}) - {name} - {saved_date}")
+            else:
+                # No loose file to link to; get_plan still reads it
+                if record.get('pack'):
+                    where = "archived"
+                elif record.get('blob'):
+                    where = "deduplicated"
+                else:
+                    where = "in version history"
+                recent.append(f"- {record['project']} - {name} - {saved_date} ({where})")
         
-        # Extract current stats
-        total_plans = len(list(self.projects_dir.rglob("*.md")))
-        current_date = datetime.now().strftime("%Y-%m-%d")
+        projects = [f"- {project}" for project in self.catalog.projects()]
         
-        # Create new entry
-        relative_path = file_path.relative_to(self.plans_dir)
-        new_entry = f"- [{project_name}]({relative_path}) - {filename.replace('_plan.md', '')} - {current_date}"
+        return INDEX_TEMPLATE.format(
+            recent='\n'.join(recent) or "*No plans have been saved yet.*",
+            projects='\n'.join(projects) or "*No projects have been created yet.*",
+            date=datetime.now().strftime("%Y-%m-%d"),
+            total=self.catalog.count()
+        )
+    
+    def write_index(self):
+        """Regenerate index.md from the catalog and replace it atomically."""
+        with self._index_lock, self._index_file_lock:
+            self.index_dirty = False
+            atomic_write(self.index_file, self.render_index())
+    
+    def list_plans(self, project_name: str = None, tags: List[str] = None,
+                   limit: int = None, cursor: str = None, status: str = None,
+                   since=None, until=None) -> List[Dict]:
+        """
+        List saved plans, most recent first.
         
-        # Update recent plans section
-        if "*No plans have been saved yet.*" in content:
-            content = content.replace("*No plans have been saved yet.*", new_entry)
-        else:
-            # Add to recent plans (keep last 10)
-            recent_section_start = content.find("## Recent Plans")
-            if recent_section_start != -1:
-                projects_section_start = content.find("## Projects", recent_section_start)
-                if projects_section_start != -1:
-                    recent_content = content[recent_section_start:projects_section_start].strip()
-                    entries = [line for line in recent_content.split('\n') if line.strip().startswith('- [')]
-                    entries.insert(0, new_entry)
-                    entries = entries[:10]  # Keep only last 10
-                    
-                    new_recent_section = "## Recent Plans\n" + '\n'.join(entries) + "\n\n"
-                    content = content[:recent_section_start] + new_recent_section + content[projects_section_start:]
-        
-        # Update projects section
-        projects = set()
-        for plan_file in self.projects_dir.rglob("*.md"):
-            project_folder = plan_file.parent.name
-            projects.add(project_folder)
-        
-        projects_list = "\n".join([f"- {project}" for project in sorted(projects)])
-        if "*No projects have been created yet.*" in content:
-            content = content.replace("*No projects have been created yet.*", projects_list)
-        else:
-            # Update projects list
-            projects_start = content.find("## Projects")
-            if projects_start != -1:
-                usage_start = content.find("## Usage", projects_start)
-                if usage_start != -1:
-                    content = content[:projects_start] + f"## Projects\n{projects_list}\n\n" + content[usage_start:]
-        
-        # Update footer stats
-        content = re.sub(r'\*Last updated: \d{4}-\d{2}-\d{2}\*', f'*Last updated: {current_date}*', content)
-        content = re.sub(r'\*Total plans: \d+\*', f'*Total plans: {total_plans}*', content)
-        
-        # Save updated index
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-    
-    def list_plans(self) -> List[Dict]:
-        """List all saved plans."""
-        plans = []
-        for plan_file in self.projects_dir.rglob("*.md"):
-            project_name = plan_file.parent.name
-            plans.append({
-                'project': project_name,
-                'filename': plan_file.name,
-                'path': plan_file,
-                'date': plan_file.stat().st_mtime
-            })
+        Args:
+            project_name: Only list plans of this project
+            tags: Only list plans whose frontmatter carries one of these tags
+            limit: Optional maximum number of plans to return
+            cursor: Resume after the plan carrying this 'cursor' value
+            status: Only list plans whose frontmatter has this status
+            since: Only list plans saved at or after this date (see parse_time_bound)
+            until: Only list plans saved up to this date, inclusive
+        """
+        return list(self.iter_plans(project_name, tags, limit, cursor, status, since, until))
+    
+    def iter_plans(self, project_name: str = None, tags: List[str] = None,
+                   limit: int = None, cursor: str = None, status: str = None,
+                   since=None, until=None) -> Iterator[Dict]:
+        """
+        Lazily yield saved plans, most recent first.
+        
+        The order is stable (ties on mtime are broken by project and
+        filename), and each plan carries an opaque 'cursor' that resumes the
+        listing right after it. Filters are those of list_plans(), each
+        served by a catalog index range scan.
+        """
+        after = decode_cursor(cursor, ((int, float), str, str)) if cursor else None
+        records = self.catalog.iter_plans(
+            project_name, tags, after, limit, status,
+            parse_time_bound(since), parse_time_bound(until, end=True)
+        )
+        for record in records:
+            yield {
+                'project': record['project'],
+                'filename': record['filename'],
+                'path': self.plan_path(record['project'], record['filename']),
+                'date': record['mtime'],
+                'cursor': encode_cursor(self.catalog.sort_key(record))
+            }
+    
+    def plan_stats(self) -> Dict:
+        """
+        Return aggregate statistics about the stored plans.
         
-        return sorted(plans, key=lambda x: x['date'], reverse=True)
+        The counters are maintained by the catalog on every write and
+        delete, so this reads a few dozen rows however many plans are stored.
+        
+        Returns:
+            The catalog's stats() (total plans and bytes, counts per
+            project, status, month and tag) plus 'growth': plans and bytes
+            per day saved over the last GROWTH_MONTHS calendar months (UTC),
+            counting plans that are still stored
+        """
+        stats = self.catalog.stats()
+        now = datetime.now(timezone.utc)
+        months = now.year * 12 + now.month - GROWTH_MONTHS
+        start = datetime(months // 12, months % 12 + 1, 1, tzinfo=timezone.utc)
+        first_month = start.strftime("%Y-%m")
+        recent = [counts for month, counts in stats['months'].items() if month >= first_month]
+        days = (now - start).total_seconds() / 86400
+        stats['growth'] = {
+            'since': start.strftime("%Y-%m-%d"),
+            'plans_per_day': sum(counts['plans'] for counts in recent) / days,
+            'bytes_per_day': sum(counts['bytes'] for counts in recent) / days
+        }
+        return stats
     
     def get_plan_content(self, project_name: str, filename: str = None) -> Optional[str]:
         """Get the content of a specific plan."""
-        project_path = self.projects_dir / project_name
-        
-        if filename:
-            plan_file = project_path / filename
-        else:
+        record = None
+        if not filename:
             # Get the most recent plan file
-            plan_files = list(project_path.glob("*.md"))
-            if not plan_files:
+            record = self.catalog.latest(project_name)
+            if record is None:
                 return None
-            plan_file = max(plan_files, key=lambda x: x.stat().st_mtime)
+            filename = record['filename']
+        
+        return self._read_plan(project_name, filename, record)
+    
+    def _read_plan(self, project_name: str, filename: str,
+                   record: Optional[Dict] = None) -> Optional[str]:
+        """
+        Read a plan from its .md file, the object store, an archive pack or the version history.
+        
+        Args:
+            record: The plan's catalog record, if the caller has it already
+        """
+        content = self.content_cache.read(self.plan_path(project_name, filename))
+        if content is not None:
+            return content
+        
+        if record is None:
+            record = self.catalog.get(project_name, filename)
+        if record is not None and record.get('blob'):
+            body = self.content_cache.read(self.objects.path(record['blob']))
+            if body is not None:
+                return self._render_metadata(project_name, record['date'], record['tags']) + body
+        if record is not None and record.get('pack'):
+            content = self.packs.read(record['pack'], project_name, filename)
+            if content is not None:
+                return content
+        return self.history.get(project_name, filename)
+    
+    def materialize_plan(self, project_name: str, filename: str = None) -> Optional[Path]:
+        """
+        Write a plan stored as an object out to its .md file.
         
+        Plans that already have a file are left untouched. The catalog keeps
+        referring to the object, so deleting the file again loses nothing.
+        
+        Returns:
+            The plan file's path, or None if there is no such plan
+        """
+        record = self.catalog.get(project_name, filename) if filename else self.catalog.latest(project_name)
+        if record is None:
+            return None
+        plan_file = self.plan_path(project_name, record['filename'])
         if plan_file.exists():
+            return plan_file
+        
+        content = self._read_plan(project_name, record['filename'], record)
+        if content is None:
+            return None
+        plan_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(plan_file, content)
+        return plan_file
+    
+    def get_plan_version(self, project_name: str, version: int) -> Optional[str]:
+        """Get the content of a project's plan as of a version from get_plan_history()."""
+        entry = self.catalog.get_version(project_name, version)
+        if entry is None:
+            return None
+        return self._read_plan(project_name, entry['filename'])
+    
+    def diff_plans(self, project_name: str, from_version: int = None,
+                   to_version: int = None, context: int = 3) -> Optional[str]:
+        """
+        Return a unified diff between two versions of a project's plan.
+        
+        Args:
+            project_name: Name of the project
+            from_version: Older version (defaults to the one before to_version)
+            to_version: Newer version (defaults to the latest)
+            context: Lines of context around each change
+            
+        Returns:
+            The diff (empty if the versions are identical), or None if either
+            version does not exist
+        """
+        if to_version is None:
+            latest = self.catalog.history(project_name, 1)
+            if not latest:
+                return None
+            to_version = latest[0]['version']
+        if from_version is None:
+            from_version = to_version - 1
+        
+        texts = []
+        for version in (from_version, to_version):
+            entry = self.catalog.get_version(project_name, version)
+            content = self._read_plan(project_name, entry['filename']) if entry else None
+            if content is None:
+                return None
+            texts.append((f"{project_name}@v{version} ({entry['filename']})", content))
+        
+        (from_label, from_text), (to_label, to_text) = texts
+        return "".join(difflib.unified_diff(
+            from_text.splitlines(keepends=True), to_text.splitlines(keepends=True),
+            from_label, to_label, n=context
+        ))
+    
+    def prune_plan_files(self, project_name: str = None, keep: int = 1) -> int:
+        """
+        Delete the .md files of superseded versions, keeping them in the version history.
+        
+        A file is only deleted once the history returns its exact content;
+        files saved before the history existed are logged first. Pruned
+        versions stay readable through every tool and can be written out
+        again with materialize_plan().
+        
+        Args:
+            project_name: Only prune this project (defaults to all projects)
+            keep: Number of most recent versions per project whose files are kept
+            
+        Returns:
+            The number of files deleted
+        """
+        projects = [project_name] if project_name else self.catalog.projects()
+        return sum(self._prune_project(project, keep) for project in projects)
+    
+    def _prune_project(self, project: str, keep: int, limit: Optional[int] = None) -> int:
+        """Prune one project's superseded files among its ``limit`` newest versions."""
+        kept, candidates = set(), []
+        for entry in self.catalog.history(project, limit):
+            filename = entry['filename']
+            if filename in kept or filename in candidates:
+                continue
+            if len(kept) < keep:
+                kept.add(filename)
+            else:
+                candidates.append(filename)
+        
+        # Oldest first, so versions logged now are stored as deltas of their predecessors
+        contents = []
+        for filename in reversed(candidates):
+            plan_file = self.plan_path(project, filename)
+            content = self.content_cache.read(plan_file)
+            if content is not None:
+                contents.append((plan_file, content))
+        self.history.append(
+            (project, plan_file.name, plan_file.stat().st_mtime, content)
+            for plan_file, content in contents
+            if (project, plan_file.name) not in self.history
+        )
+        
+        removed = 0
+        for plan_file, content in contents:
+            if self.history.get(project, plan_file.name) != content:
+                continue
+            try:
+                plan_file.unlink()
+            except FileNotFoundError:
+                # Pruned by another process saving to the same project
+                continue
+            self.content_cache.invalidate(plan_file)
+            removed += 1
+        return removed
+    
+    def archive_plans(self, older_than_days: float, project_name: str = None) -> Dict:
+        """
+        Move plan files older than a threshold into compressed archive packs.
+        
+        Archived plans keep their catalog entries and search index documents
+        and are read back transparently; only their .md files go away.
+        
+        Args:
+            older_than_days: Archive plans last modified more than this many days ago
+            project_name: Only archive plans of this project
+            
+        Returns:
+            Dict with the number of plans archived, the packs written, and the
+            bytes their files took before and their packs take after
+        """
+        cutoff = datetime.now().timestamp() - older_than_days * 86400
+        result = {'archived': 0, 'packs': [], 'bytes_before': 0, 'bytes_after': 0}
+        
+        batch = []
+        for record in self.catalog.iter_plans(project_name, after=(cutoff, "", "")):
+            plan_file = self.plan_path(record['project'], record['filename'])
+            try:
+                with open(plan_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                    record_read(os.fstat(f.fileno()).st_size)
+            except FileNotFoundError:
+                # Already archived, or stored as an object
+                continue
+            batch.append((record, content))
+            if len(batch) >= PACK_MAX_PLANS:
+                self._archive_batch(batch, result)
+                batch = []
+        self._archive_batch(batch, result)
+        return result
+    
+    def _archive_batch(self, batch: List[Tuple[Dict, str]], result: Dict):
+        """Write one pack and remove the files it now holds."""
+        pack = self.packs.write_pack(batch)
+        if pack is None:
+            return
+        self.catalog.set_pack(((record['project'], record['filename']) for record, _ in batch), pack)
+        
+        # Only delete files once the catalog points at the pack
+        plan_dirs = set()
+        for record, _ in batch:
+            plan_file = self.plan_path(record['project'], record['filename'])
+            result['bytes_before'] += plan_file.stat().st_size
+            plan_file.unlink()
+            self.content_cache.invalidate(plan_file)
+            plan_dirs.add(plan_file.parent)
+        for plan_dir in plan_dirs:
+            self._remove_empty_dirs(plan_dir)
+        
+        result['archived'] += len(batch)
+        result['packs'].append(pack)
+        result['bytes_after'] += (self.packs.root / pack).stat().st_size
+    
+    def migrate_layout(self, layout_name: str) -> int:
+        """
+        Move every plan file to where ``layout_name`` puts it, and make it the store's layout.
+        
+        Files are renamed, not copied. Plan files are found whatever layout
+        they are in, so an interrupted migration can simply be run again.
+        Other processes using the store must be restarted afterwards.
+        
+        Returns:
+            The number of files moved
+        """
+        layout = PlanLayout(layout_name)
+        moved = 0
+        for plan_file, project_name, filename in list(PlanLayout.iter_plan_files(self.projects_dir)):
+            target = layout.plan_path(self.projects_dir, project_name, filename)
+            if target == plan_file:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(plan_file, target)
+            self.content_cache.invalidate(plan_file)
+            self._remove_empty_dirs(plan_file.parent)
+            moved += 1
+        
+        layout.save(self.plans_dir)
+        self.layout = layout
+        # Links in index.md follow the layout
+        self.write_index()
+        return moved
+    
+    def get_plan_history(self, project_name: str, limit: int = None) -> List[Dict]:
+        """
+        Return the saved versions of a project, newest first.
+        
+        Args:
+            project_name: Name of the project
+            limit: Optional maximum number of versions to return
+            
+        Returns:
+            Dicts with version, filename and saved_at (a timestamp)
+        """
+        return self.catalog.history(project_name, limit)
+    
+    def _parse_frontmatter(self, content: str) -> Dict:
+        """Parse the simple key: value frontmatter written by _create_plan_metadata."""
+        frontmatter = {}
+        if not content.startswith('---\n'):
+            return frontmatter
+        end = content.find('\n---', 4)
+        if end == -1:
+            return frontmatter
+        
+        for line in content[4:end].split('\n'):
+            key, sep, value = line.partition(':')
+            if not sep:
+                continue
+            value = value.strip()
+            if value.startswith('['):
+                try:
+                    frontmatter[key.strip()] = [str(v) for v in ast.literal_eval(value)]
+                except (ValueError, SyntaxError):
+                    frontmatter[key.strip()] = []
+            else:
+                frontmatter[key.strip()] = value.strip('"\'')
+        return frontmatter
+    
+    def _catalog_record(self, plan_file: Path, content: str) -> Dict:
+        """Build the catalog record for a plan file and its content."""
+        frontmatter = self._parse_frontmatter(content)
+        project_name, filename = self._plan_location(plan_file)
+        stat = plan_file.stat()
+        return {
+            'project': project_name,
+            'filename': filename,
+            'date': frontmatter.get('date'),
+            'status': frontmatter.get('status'),
+            'tags': frontmatter.get('tags', []),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime
+        }
+    
+    def apply_file_changes(self, paths: Iterable[Path]) -> int:
+        """
+        Update the catalog, search index, version history and cache for changed plan files.
+        
+        Used for files created, edited or deleted outside this manager, e.g.
+        by hand or by a sync tool. Only the given files are read. Paths
+        outside the store's layout are ignored.
+        
+        A deleted file removes its plan, unless the plan does not need a file
+        (see _stored_without_file()): deleting a superseded version's file is
+        treated like prune_plan_files().
+        
+        Args:
+            paths: Locations of plan files that were created, modified or deleted
+            
+        Returns:
+            The number of plans updated or removed
+        """
+        changed, deleted = [], []
+        for path in set(Path(path) for path in paths):
+            if path.suffix != '.md' or path.name.startswith('.'):
+                continue
+            try:
+                parsed = self._plan_location(path)
+            except ValueError:
+                # Not under projects/, or not at a plan file's depth
+                continue
+            if path != self.plan_path(*parsed):
+                continue
+            with self._saving_lock:
+                if path in self._saving:
+                    # Recorded by the save itself once written
+                    continue
+            
+            self.content_cache.invalidate(path)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                    record_read(os.fstat(f.fileno()).st_size)
+                if not content:
+                    # Claimed by another process's save that has not written it yet
+                    continue
+                changed.append((self._catalog_record(path, content), content))
+            except FileNotFoundError:
+                deleted.append(parsed)
+        
+        # Deletions first, so a renamed project head is replaced rather than kept as superseded
+        removed = []
+        for project_name, filename in deleted:
+            record = self.catalog.get(project_name, filename)
+            if record is not None and not self._stored_without_file(record):
+                self.catalog.remove_many([(project_name, filename)])
+                removed.append((project_name, filename))
+        if removed:
+            self.search_index.remove_documents(removed)
+            self.similarity_index.remove_documents(removed)
+            self._related_index.remove_documents(removed)
+        
+        written = self.catalog.record_changes([record for record, _ in changed])
+        if written:
+            contents = {(record['project'], record['filename']): content for record, content in changed}
+            documents = [
+                (record['project'], record['filename'], contents[(record['project'], record['filename'])], record['mtime'])
+                for record in written
+            ]
+            self.history.append(
+                (project_name, filename, mtime, content) for project_name, filename, content, mtime in documents
+            )
+            self.search_index.add_documents(documents)
+            self.similarity_index.add_documents(documents)
+            self._related_index.add_documents(documents)
+        
+        if written or removed:
+            self._update_index()
+        return len(written) + len(removed)
+    
+    def find_file_changes(self) -> List[Path]:
+        """
+        Compare the plan files on disk with the catalog.
+        
+        Costs one stat() per file and reads none. Used to catch up on changes
+        made while nothing was watching.
+        
+        Returns:
+            Paths of plan files that are new, modified, or catalogued but missing,
+            for apply_file_changes()
+        """
+        known = {(record['project'], record['filename']): record for record in self.catalog.iter_plans()}
+        paths = []
+        for plan_file, project_name, filename in PlanLayout.iter_plan_files(self.projects_dir):
+            record = known.pop((project_name, filename), None)
+            stat = plan_file.stat()
+            if record is None or record['size'] != stat.st_size or record['mtime'] != stat.st_mtime:
+                paths.append(plan_file)
+        
+        for (project_name, filename), record in known.items():
+            if not self._stored_without_file(record):
+                paths.append(self.plan_path(project_name, filename))
+        return paths
+    
+    def _stored_without_file(self, record: Dict) -> bool:
+        """
+        Whether a catalogued plan stays readable without its .md file.
+        
+        True for deduplicated and archived plans, and for superseded versions
+        kept in the version history while the project's latest version is
+        still there, i.e. what prune_plan_files() leaves behind.
+        """
+        if record.get('blob') or record.get('pack'):
+            return True
+        project_name, filename = record['project'], record['filename']
+        if (project_name, filename) not in self.history:
+            return False
+        latest = self.catalog.latest(project_name)
+        if latest is None or latest['filename'] == filename:
+            return False
+        return bool(latest.get('blob') or latest.get('pack')) or self.plan_path(project_name, latest['filename']).exists()
+    
+    def _content_record(self, project_name: str, filename: str, content: str,
+                        mtime: float) -> Dict:
+        """Build the catalog record for a plan that has no file of its own."""
+        frontmatter = self._parse_frontmatter(content)
+        return {
+            'project': project_name,
+            'filename': filename,
+            'date': frontmatter.get('date'),
+            'status': frontmatter.get('status'),
+            'tags': frontmatter.get('tags', []),
+            'size': len(content.encode('utf-8')),
+            'mtime': mtime
+        }
+    
+    def _object_record(self, plan_file: Path, content: str, body: str) -> Dict:
+        """Build the catalog record for a plan stored as an object."""
+        project_name, filename = self._plan_location(plan_file)
+        record = self._content_record(project_name, filename, content, datetime.now().timestamp())
+        record['blob'] = self.objects.digest(body)
+        return record
+    
+    def rebuild_catalog(self):
+        """Re-sync the catalog with the plan files on disk, archive packs, object references and version history."""
+        records = {}
+        for project in self.history.projects():
+            for filename, saved_at in self.history.entries(project):
+                content = self.history.get(project, filename)
+                records[(project, filename)] = self._content_record(project, filename, content, saved_at)
+        for pack in self.packs.packs():
+            for record in self.packs.records(pack):
+                records[(record['project'], record['filename'])] = record
+        for ref in self.objects.iter_refs():
+            if ref.get('blob') in self.objects:
+                records[(ref['project'], ref['filename'])] = ref
+        for plan_file, _, _ in PlanLayout.iter_plan_files(self.projects_dir):
+            with open(plan_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+                record_read(os.fstat(f.fileno()).st_size)
+            record = self._catalog_record(plan_file, content)
+            # A materialized plan keeps its object or pack as a fallback
+            ref = records.get((record['project'], record['filename']))
+            if ref is not None:
+                record['blob'] = ref.get('blob')
+                record['pack'] = ref.get('pack')
+            records[(record['project'], record['filename'])] = record
+        self.catalog.replace_all(records.values())
+    
+    @property
+    def search_index(self) -> SearchIndex:
+        """The search index, loaded (or built from the plans on disk) on first use."""
+        if not self._search_index_loaded:
+            self._load_search_index()
+        return self._search_index
+    
+    def _load_search_index(self):
+        """Load the persisted search index, building it if it does not exist."""
+        with self._search_index_lock:
+            if not self._search_index_loaded:
+                self._search_index.load_or_build(self._iter_plan_documents)
+                self._search_index_loaded = True
+    
+    @property
+    def similarity_index(self) -> SimilarityIndex:
+        """The near-duplicate index, loaded (or built from the stored plans) on first use."""
+        if not self._similarity_index_loaded:
+            self._load_similarity_index()
+        return self._similarity_index
+    
+    def _load_similarity_index(self):
+        """Load the persisted similarity index, building it if it does not exist."""
+        with self._similarity_index_lock:
+            if not self._similarity_index_loaded:
+                self._similarity_index.load_or_build(self._iter_plan_documents)
+                self._similarity_index_loaded = True
+    
+    @property
+    def related_index(self) -> RelatedIndex:
+        """The TF-IDF index behind related_plans(), loaded (or built from the stored plans) on first use."""
+        if not self._related_index_loaded:
+            with self._related_index_lock:
+                if not self._related_index_loaded:
+                    self._related_index.load_or_build(self._iter_plan_documents)
+                    self._related_index_loaded = True
+        return self._related_index
+    
+    def warm_up(self):
+        """Load state that is otherwise loaded lazily by the first call needing it."""
+        self._load_search_index()
+        self._load_similarity_index()
+    
+    def rebuild_search_index(self):
+        """Re-index every plan on disk from scratch."""
+        with self._search_index_lock:
+            self._search_index.rebuild(self._iter_plan_documents())
+            self._search_index_loaded = True
+    
+    def rebuild_similarity_index(self):
+        """Recompute the signature of every stored plan from scratch."""
+        with self._similarity_index_lock:
+            self._similarity_index.rebuild(self._iter_plan_documents())
+            self._similarity_index_loaded = True
+    
+    def rebuild_related_index(self):
+        """Recount the terms of every stored plan from scratch."""
+        with self._related_index_lock:
+            self._related_index.rebuild(self._iter_plan_documents())
+            self._related_index_loaded = True
+    
+    def _iter_plan_documents(self):
+        """Yield (project, filename, content, mtime) for every catalogued plan."""
+        on_disk = set()
+        for plan_file, project_name, filename in PlanLayout.iter_plan_files(self.projects_dir):
             with open(plan_file, 'r', encoding='utf-8') as f:
-                return f.read()
+                content = f.read()
+                record_read(os.fstat(f.fileno()).st_size)
+            on_disk.add((project_name, filename))
+            yield (project_name, filename, content, plan_file.stat().st_mtime)
         
-        return None
+        # Plans stored as objects, archived, or only in the version history
+        for record in self.catalog.iter_plans():
+            if (record['project'], record['filename']) in on_disk:
+                continue
+            content = self._read_plan(record['project'], record['filename'], record)
+            if content is not None:
+                yield (record['project'], record['filename'], content, record['mtime'])
+    
+    def search_plans(self, query: str, tags: Optional[List[str]] = None,
+                     match: str = "phrase", limit: int = None,
+                     snippets: bool = False,
+                     cancel_event: Optional[threading.Event] = None,
+                     cursor: str = None, project_name: str = None,
+                     status: str = None, since=None, until=None) -> List[Dict]:
+        """
+        Search saved plans using the inverted index, ranked by BM25.
+        
+        Args:
+            query: Case-insensitive text to look for in plan content
+            tags: Optional tags; a plan's frontmatter must carry one of them
+            match: "phrase" (whole query as a substring), "all" or "any"
+            limit: Optional maximum number of results (top-k by relevance)
+            snippets: If True, attach a highlighted excerpt to each result
+            cancel_event: Optional event that aborts the search when set
+            cursor: Resume after the result carrying this 'cursor' value
+            project_name, status, since, until: Filters as in list_plans()
+            
+        Returns:
+            Matching plans, best first, in the same shape as list_plans() plus
+            a 'score' (and 'snippet' when requested)
+        """
+        after = decode_cursor(cursor, ((int, float), (int, float), str)) if cursor else None
+        since, until = parse_time_bound(since), parse_time_bound(until, end=True)
+        restrict = None
+        if project_name is not None or status or since is not None or until is not None:
+            # Candidates come from the catalog indexes, not from scoring every match
+            restrict = self.search_index.doc_ids(
+                self.catalog.matching(project_name, tags, status or None, since, until)
+            )
+        elif tags:
+            restrict = self.search_index.doc_ids(self.catalog.tagged(tags))
+        
+        docs = self.search_index.search(query, match, limit, restrict, cancel_event, after)
+        
+        results = []
+        for doc in docs:
+            plan_file = self.plan_path(doc['project'], doc['filename'])
+            result = {
+                'project': doc['project'],
+                'filename': doc['filename'],
+                'path': plan_file,
+                'date': doc['mtime'],
+                'score': doc['score'],
+                'cursor': encode_cursor((doc['score'], doc['mtime'], doc['key']))
+            }
+            if snippets:
+                content = self._read_plan(doc['project'], doc['filename'])
+                result['snippet'] = make_snippet(content, query, match) if content else ""
+            results.append(result)
+        return results
+    
+    def find_similar_plans(self, plan_content: str = None, project_name: str = None,
+                           filename: str = None, threshold: float = None,
+                           limit: int = 10) -> Optional[List[Dict]]:
+        """
+        Find stored plans that are near-duplicates of a text or of a stored plan.
+        
+        Only plans sharing an LSH bucket with the query are compared, so the
+        cost does not grow with the number of stored plans.
+        
+        Args:
+            plan_content: Text to compare against; if omitted, the stored plan
+                given by project_name and filename is used
+            project_name: Project of the stored plan to compare against
+            filename: Plan file of that project (defaults to its latest plan)
+            threshold: Minimum estimated similarity (defaults to the manager's)
+            limit: Maximum number of results
+            
+        Returns:
+            Plans in the same shape as list_plans() plus 'similarity' (0-1),
+            most similar first, or None if the stored plan does not exist
+        """
+        if threshold is None:
+            threshold = self.similarity_threshold
+        if plan_content is not None:
+            matches = self.similarity_index.query(plan_content, threshold, limit)
+        else:
+            if filename is None:
+                latest = self.catalog.latest(project_name)
+                if latest is None:
+                    return None
+                project_name, filename = latest['project'], latest['filename']
+            matches = self.similarity_index.similar_to(project_name, filename, threshold, limit)
+            if matches is None:
+                return None
+        
+        results = []
+        for match in matches:
+            record = self.catalog.get(match['project'], match['filename'])
+            if record is None:
+                continue
+            results.append({
+                'project': match['project'],
+                'filename': match['filename'],
+                'path': self.plan_path(match['project'], match['filename']),
+                'date': record['mtime'],
+                'similarity': match['similarity']
+            })
+        return results
+    
+    def related_plans(self, plan_content: str = None, project_name: str = None,
+                      filename: str = None, limit: int = 10,
+                      include_same_project: bool = False) -> Optional[List[Dict]]:
+        """
+        Recommend stored plans on the same topic as a text or a stored plan.
+        
+        Plans are ranked by cosine similarity of their TF-IDF vectors (see
+        related_index), so unlike find_similar_plans() they need not share
+        any wording beyond their vocabulary.
+        
+        Args:
+            plan_content: Text to find related plans for; if omitted, the
+                stored plan given by project_name and filename is used
+            project_name: Project of the stored plan
+            filename: Plan file of that project (defaults to its latest plan)
+            limit: Maximum number of results
+            include_same_project: Also return other plans of the stored
+                plan's project
+            
+        Returns:
+            Plans in the same shape as list_plans() plus 'score' (0-1), best
+            first, or None if the stored plan does not exist
+        """
+        exclude_project = None
+        if plan_content is None:
+            if filename is None:
+                latest = self.catalog.latest(project_name)
+                if latest is None:
+                    return None
+                filename = latest['filename']
+            if not include_same_project:
+                exclude_project = project_name
+        
+        matches = self.related_index.related(
+            plan_content, project_name, filename, limit, exclude_project
+        )
+        if matches is None:
+            return None
+        
+        results = []
+        for match in matches:
+            record = self.catalog.get(match['project'], match['filename'])
+            if record is None:
+                continue
+            results.append({
+                'project': match['project'],
+                'filename': match['filename'],
+                'path': self.plan_path(match['project'], match['filename']),
+                'date': record['mtime'],
+                'score': match['score']
+            })
+        return results
 
 
 def save_plan_as_md(plan_content: str, project_name: str = None) -> str:
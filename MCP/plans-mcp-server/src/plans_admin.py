@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Plans Store Maintenance
+
+Command-line entry point for maintenance jobs on a Plans store. These jobs
+are too slow or too disruptive to run inside a tool call.
+
+    python src/plans_admin.py archive --older-than-days 90
+    python src/plans_admin.py prune --keep 1
+    python src/plans_admin.py migrate --layout hash-date
+
+Every command works on ~/.claude/Plans unless --plans-dir is given.
+archive and prune are safe to run while servers are using the store;
+migrate is not, so stop them first.
+"""
+
+import argparse
+import sys
+from typing import List, Optional
+
+try:
+    from .layout import LAYOUTS
+    from .plan_manager import PlanManager
+except ImportError:
+    # For standalone execution
+    from layout import LAYOUTS
+    from plan_manager import PlanManager
+
+
+def _archive(manager: PlanManager, options: argparse.Namespace) -> int:
+    result = manager.archive_plans(options.older_than_days, options.project)
+    if not result['archived']:
+        print("No plans to archive")
+        return 0
+    print(f"Archived {result['archived']} plans into {len(result['packs'])} pack(s): "
+          f"{result['bytes_before']} bytes of files -> {result['bytes_after']} bytes of packs")
+    for pack in result['packs']:
+        print(f"  {manager.packs.root / pack}")
+    return 0
+
+
+def _prune(manager: PlanManager, options: argparse.Namespace) -> int:
+    removed = manager.prune_plan_files(options.project, options.keep)
+    print(f"Removed {removed} superseded plan file(s)")
+    return 0
+
+
+def _migrate(manager: PlanManager, options: argparse.Namespace) -> int:
+    previous = manager.layout.name
+    moved = manager.migrate_layout(options.layout)
+    print(f"Layout {previous} -> {options.layout}: moved {moved} plan file(s)")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintenance commands for a Plans store")
+    parser.add_argument("--plans-dir", help="Root of the Plans store (default ~/.claude/Plans)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive = commands.add_parser(
+        "archive", help="Move old plan files into compressed archive packs")
+    archive.add_argument("--older-than-days", type=float, required=True,
+                         help="Archive plans last modified more than this many days ago")
+    archive.add_argument("--project", help="Only archive plans of this project")
+    archive.set_defaults(run=_archive)
+
+    prune = commands.add_parser(
+        "prune", help="Delete files of superseded versions, keeping them in the version history")
+    prune.add_argument("--project", help="Only prune this project")
+    prune.add_argument("--keep", type=int, default=1,
+                       help="Most recent versions per project whose files are kept (default 1)")
+    prune.set_defaults(run=_prune)
+
+    migrate = commands.add_parser(
+        "migrate", help="Move plan files to another directory layout (stop servers first)")
+    migrate.add_argument("--layout", choices=LAYOUTS, required=True,
+                         help="Target layout")
+    migrate.set_defaults(run=_migrate)
+
+    options = parser.parse_args(argv)
+    return options.run(PlanManager(options.plans_dir), options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Plans Call Profiler
+
+Opt-in cProfile capture of individual tool calls. Profiling is enabled for
+a sample of all calls with the PLANS_PROFILE environment variable, or for a
+single call with its ``debug_profile`` argument. Each profiled call is
+dumped to ``<plans_dir>/profiles/`` as a pstats file; only the newest
+dumps are kept.
+
+The profile is attached to the tool call through a context variable and
+enabled only around the blocking work the call runs on the worker pool.
+When profiling is off, the cost is one flag check per call, and the
+profiler modules are not even imported.
+"""
+
+import contextvars
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+
+if TYPE_CHECKING:
+    import cProfile
+
+PROFILE_DIR = "profiles"
+
+# Number of functions listed in the summary returned with a profiled call
+SUMMARY_LINES = 15
+
+_active_profile: "contextvars.ContextVar[Optional[cProfile.Profile]]" = contextvars.ContextVar(
+    "plans_active_profile", default=None
+)
+
+
+def _env_flag(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class CallProfiler:
+    """Decides which calls to profile and stores their dumps."""
+
+    def __init__(self, enabled: bool = False, sample_rate: float = 1.0, keep: int = 100):
+        """
+        Create a profiler.
+
+        Args:
+            enabled: Profile calls without being asked to
+            sample_rate: Fraction of calls profiled when ``enabled``
+            keep: Number of most recent dumps to retain
+        """
+        self.enabled = enabled
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.keep = max(1, keep)
+        # Only one profiler can be active per interpreter on newer Pythons
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CallProfiler":
+        """Configure from PLANS_PROFILE, PLANS_PROFILE_SAMPLE_RATE and PLANS_PROFILE_KEEP."""
+        return cls(
+            enabled=_env_flag(os.environ.get("PLANS_PROFILE")),
+            sample_rate=float(os.environ.get("PLANS_PROFILE_SAMPLE_RATE", "1.0")),
+            keep=int(os.environ.get("PLANS_PROFILE_KEEP", "100")),
+        )
+
+    def start(self, requested: bool = False) -> Optional["cProfile.Profile"]:
+        """
+        Return a profile for the call about to run, or None to skip it.
+
+        A call is profiled when ``requested``, or when profiling is enabled
+        and the call is sampled. Calls that overlap one already being
+        profiled are not profiled.
+        """
+        if not requested:
+            if not self.enabled or random.random() >= self.sample_rate:
+                return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        import cProfile
+        return cProfile.Profile()
+
+    def activate(self, profile: "cProfile.Profile") -> contextvars.Token:
+        """Attach ``profile`` to the current context; see profiled()."""
+        return _active_profile.set(profile)
+
+    def deactivate(self, token: contextvars.Token):
+        """Detach the profile attached by activate() and allow the next one."""
+        _active_profile.reset(token)
+        self._busy.release()
+
+    def save(self, profile: "cProfile.Profile", plans_dir: Path, tool: str) -> Tuple[Path, str]:
+        """
+        Dump ``profile`` under ``plans_dir`` and prune old dumps.
+
+        Returns:
+            The dump's path and a short text summary of the hottest functions
+        """
+        profile_dir = Path(plans_dir) / PROFILE_DIR
+        profile_dir.mkdir(exist_ok=True)
+        safe_tool = re.sub(r'[^\w-]', '_', tool)
+        path = profile_dir / f"{time.time_ns()}_{safe_tool}_{os.getpid()}.prof"
+        profile.dump_stats(path)
+        self._prune(profile_dir)
+
+        import io
+        import pstats
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(SUMMARY_LINES)
+        return path, out.getvalue().strip()
+
+    def _prune(self, profile_dir: Path):
+        dumps = sorted(profile_dir.glob("*.prof"))
+        for old in dumps[:-self.keep]:
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def profiled(func: Callable) -> Callable:
+    """Wrap ``func`` to run under the active profile, if there is one."""
+    profile = _active_profile.get()
+    if profile is None:
+        return func
+    return lambda: profile.runcall(func)
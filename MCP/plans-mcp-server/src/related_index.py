@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Plans Related-Plan Index
+
+Recommends plans that cover the same ground as a given plan or text. Plans
+are compared as TF-IDF vectors: term weights are 1 + log(term count),
+scaled by the inverse document frequency of the term, and the score is
+the cosine of two vectors. Unlike search_plans, no query words are needed,
+and everything runs locally.
+
+The vectors form a sparse matrix with one row per plan and one column per
+term, stored column-major. A query only touches the columns of its own
+terms, and all candidates are scored in one batch. With NumPy and SciPy
+installed, scoring is one sparse matrix-vector product plus an
+argpartition top-k. Without them, the same arithmetic runs over
+per-term postings in pure Python, which is correct but slower.
+
+Saves update the index incrementally. Rows added or removed since the
+matrix was built are scored directly, and the matrix is rebuilt once
+CONSOLIDATE_THRESHOLD rows have changed. The IDF weights of the documents in
+the matrix are fixed when it is built. Until the next rebuild they lag
+behind the corpus by at most CONSOLIDATE_THRESHOLD plans.
+
+Term counts are persisted as an append-only log, ``related.log``, in the
+same way as the similarity index. The log is only read when a related-plans
+query needs it. Until then, saves do no text processing at all: they append
+a line naming the plan, and its terms are counted from the stored plan
+when the log is next loaded. Compaction writes those counts back.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    # Optional; scoring falls back to pure Python
+    np = None
+    sparse = None
+
+try:
+    from .fileio import FileLock, atomic_write
+    from .metrics import record_read, record_write
+    from .similarity_index import strip_frontmatter
+except ImportError:
+    # For standalone execution
+    from fileio import FileLock, atomic_write
+    from metrics import record_read, record_write
+    from similarity_index import strip_frontmatter
+
+# Words of two or more characters, starting with a letter
+_WORD_PATTERN = re.compile(r"[^\W\d_]\w+")
+
+# Rows added or removed since the matrix was built before it is rebuilt
+CONSOLIDATE_THRESHOLD = 256
+
+# Obsolete log lines tolerated before the log is rewritten
+COMPACT_THRESHOLD = 500
+
+
+def term_counts(text: str) -> Dict[str, int]:
+    """Count the lowercased words of a plan, ignoring its frontmatter."""
+    counts: Dict[str, int] = {}
+    for word in _WORD_PATTERN.findall(strip_frontmatter(text).lower()):
+        counts[word] = counts.get(word, 0) + 1
+    return counts
+
+
+def _key(project: str, filename: str) -> str:
+    return f"{project}/{filename}"
+
+
+class _Row:
+    """Term ids and counts of one plan."""
+
+    __slots__ = ("project", "filename", "terms", "counts")
+
+    def __init__(self, project: str, filename: str, terms: array, counts: array):
+        self.project = project
+        self.filename = filename
+        self.terms = terms
+        self.counts = counts
+
+
+class _Matrix:
+    """Snapshot of the TF-IDF matrix at the time it was built."""
+
+    def __init__(self, keys: List[str], rows: List[_Row], idf: List[float], use_numpy: bool):
+        self.keys = keys
+        self.positions = {key: i for i, key in enumerate(keys)}
+        # Project -> row positions
+        self.by_project: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            self.by_project.setdefault(row.project, []).append(i)
+        self.idf = idf
+        self.columns = len(idf)
+        if use_numpy:
+            self._build_numpy(rows)
+        else:
+            self._build_python(rows)
+
+    def _build_numpy(self, rows: List[_Row]):
+        lengths = np.fromiter((len(row.terms) for row in rows), dtype=np.int64, count=len(rows))
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        counts = np.empty(indptr[-1], dtype=np.float64)
+        for i, row in enumerate(rows):
+            indices[indptr[i]:indptr[i + 1]] = np.frombuffer(row.terms, dtype=np.uint32)
+            counts[indptr[i]:indptr[i + 1]] = np.frombuffer(row.counts, dtype=np.uint32)
+        idf = np.asarray(self.idf)
+        weights = (1.0 + np.log(counts)) * idf[indices]
+        norms = np.sqrt(np.add.reduceat(weights * weights, indptr[:-1])) if len(weights) else np.zeros(len(rows))
+        # reduceat repeats the next value for empty rows
+        norms[lengths == 0] = 0.0
+        norms[norms == 0] = 1.0
+        # Normalized rows, so a dot product with a unit query is the cosine
+        weights /= np.repeat(norms, lengths)
+        self.matrix = sparse.csr_matrix((weights, indices, indptr),
+                                        shape=(len(rows), self.columns)).tocsc()
+        self.postings = None
+
+    def _build_python(self, rows: List[_Row]):
+        self.matrix = None
+        # Term id -> (row positions, normalized weights)
+        postings: Dict[int, Tuple[array, array]] = {}
+        for i, row in enumerate(rows):
+            weights = [(1.0 + math.log(count)) * self.idf[term] for term, count in zip(row.terms, row.counts)]
+            norm = math.sqrt(sum(w * w for w in weights)) or 1.0
+            for term, weight in zip(row.terms, weights):
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array('I'), array('d'))
+                entry[0].append(i)
+                entry[1].append(weight / norm)
+        self.postings = postings
+
+    def top(self, query: Dict[int, float], limit: int, excluded: List[int]) -> List[Tuple[float, int]]:
+        """
+        Return the (cosine, row position) pairs of the rows closest to a unit query vector.
+
+        Rows at ``excluded`` positions are skipped. Terms added to the
+        vocabulary after the matrix was built cannot occur in its rows and
+        are ignored.
+        """
+        columns = [term for term in query if term < self.columns]
+        if not columns or limit <= 0:
+            return []
+
+        if self.postings is None:
+            values = np.fromiter((query[term] for term in columns), dtype=np.float64, count=len(columns))
+            # Only the query's columns are touched
+            scores = self.matrix[:, columns] @ values
+            if excluded:
+                scores[excluded] = 0.0
+            k = min(limit, len(scores))
+            if k == 0:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            return [(float(scores[i]), int(i)) for i in best if scores[i] > 0]
+
+        scores: Dict[int, float] = {}
+        for term in columns:
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            value = query[term]
+            for i, weight in zip(*entry):
+                scores[i] = scores.get(i, 0.0) + weight * value
+        for i in excluded:
+            scores.pop(i, None)
+        return heapq.nlargest(limit, ((score, i) for i, score in scores.items()))
+
+
+class RelatedIndex:
+    """Incrementally maintained TF-IDF vectors of all plans."""
+
+    def __init__(self, path: Path, use_numpy: Optional[bool] = None,
+                 reader: Optional[Callable[[str, str], Optional[str]]] = None):
+        """
+        Args:
+            path: Location of the log; the lock file sits next to it
+            use_numpy: Score with NumPy/SciPy; defaults to whether they are installed
+            reader: Returns the content of a stored plan given its project
+                and filename. With a reader, plans added while the index
+                is not loaded are only counted when it is.
+        """
+        self.path = Path(path)
+        self.reader = reader
+        self.use_numpy = np is not None if use_numpy is None else use_numpy and np is not None
+        self._file_lock = FileLock(self.path.with_suffix(".lock"))
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._vocabulary: Dict[str, int] = {}
+        self._words: List[str] = []
+        # Document frequency per term id
+        self._df: List[int] = []
+        self._rows: Dict[str, _Row] = {}
+        self._matrix: Optional[_Matrix] = None
+        # Keys added or removed since the matrix was built
+        self._changed = set()
+        self._ident: Optional[Tuple[int, int]] = None
+        self._parsed = 0
+        self._lines = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load_or_build(self, documents: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        """Load the persisted index, or build it from ``documents()`` if absent."""
+        with self._lock:
+            if not self.exists():
+                with self._file_lock:
+                    # Another process may have built it while we waited
+                    if not self.exists():
+                        self._rebuild(documents())
+                        return
+            self._loaded = True
+            self._refresh()
+
+    def _refresh(self):
+        """Replay log lines appended since the last call, reloading if the log was replaced."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            if self._ident is not None:
+                self._reset()
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            ident = (stat.st_dev, stat.st_ino)
+            if ident != self._ident or stat.st_size < self._parsed:
+                # Compacted or rebuilt by another process
+                self._reset()
+                self._ident = ident
+            if stat.st_size == self._parsed:
+                return
+            f.seek(self._parsed)
+            data = f.read()
+        record_read(len(data))
+
+        # Only consume complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line from an interrupted write
+                continue
+            self._apply(entry)
+            self._lines += 1
+        self._parsed += end
+
+    def _term_id(self, word: str) -> int:
+        term = self._vocabulary.get(word)
+        if term is None:
+            term = self._vocabulary[word] = len(self._words)
+            self._words.append(word)
+            self._df.append(0)
+        return term
+
+    def _apply(self, entry: Dict):
+        key = _key(entry["project"], entry["filename"])
+        row = self._rows.pop(key, None)
+        if row is not None:
+            for term in row.terms:
+                self._df[term] -= 1
+            self._changed.add(key)
+        if entry["op"] != "add":
+            return
+        tf = entry.get("tf")
+        if tf is None:
+            # Logged without counts by a process that had not loaded the index
+            content = self.reader(entry["project"], entry["filename"]) if self.reader else None
+            tf = term_counts(content) if content else {}
+        if not tf:
+            return
+        terms = array('I', (self._term_id(word) for word in tf))
+        counts = array('I', tf.values())
+        for term in terms:
+            self._df[term] += 1
+        self._rows[key] = _Row(entry["project"], entry["filename"], terms, counts)
+        self._changed.add(key)
+
+    @staticmethod
+    def _encode(entries: List[Dict]) -> bytes:
+        return "".join(json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + "\n"
+                       for entry in entries).encode('utf-8')
+
+    def _commit(self, entries: List[Dict]):
+        """Append entries to the log under the file lock, applying them if the index is loaded."""
+        if not entries:
+            return
+        with self._lock, self._file_lock:
+            if not self._loaded and not self.exists():
+                # Picked up when the index is built from the stored plans
+                return
+            if self._loaded:
+                self._refresh()
+            data = self._encode(entries)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if self._loaded and os.fstat(fd).st_size != self._parsed:
+                    # Terminate a torn line left by an interrupted write
+                    data = b"\n" + data
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            record_write(len(data))
+            if not self._loaded:
+                return
+            self._refresh()
+            if self._lines - len(self._rows) > max(COMPACT_THRESHOLD, len(self._rows)):
+                self._compact()
+
+    def _add_entry(self, project: str, filename: str, counts: Dict[str, int]) -> Dict:
+        return {"op": "add", "project": project, "filename": filename, "tf": counts}
+
+    def _compact(self):
+        """Rewrite the log with one line per live plan (caller holds both locks)."""
+        entries = [
+            self._add_entry(row.project, row.filename,
+                            {self._words[term]: count for term, count in zip(row.terms, row.counts)})
+            for row in self._rows.values()
+        ]
+        self._write_log(entries)
+
+    def _write_log(self, entries: List[Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.path, self._encode(entries))
+        self._reset()
+        self._loaded = True
+        self._refresh()
+
+    def _idf(self, term: int) -> float:
+        # Smoothed, so a term in every plan still weighs something
+        return math.log((len(self._rows) + 1) / (self._df[term] + 1)) + 1.0
+
+    def _build_matrix(self):
+        keys = list(self._rows)
+        idf = [self._idf(term) for term in range(len(self._df))]
+        self._matrix = _Matrix(keys, [self._rows[key] for key in keys], idf, self.use_numpy)
+        self._changed = set()
+
+    def _query_vector(self, counts: Dict[int, int]) -> Dict[int, float]:
+        """Unit TF-IDF vector of a query, weighted with the current IDF."""
+        vector = {term: (1.0 + math.log(count)) * self._idf(term) for term, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {term: value / norm for term, value in vector.items()} if norm else {}
+
+    def _row_cosine(self, row: _Row, query: Dict[int, float]) -> float:
+        weights = {term: (1.0 + math.log(count)) * self._idf(term) for term, count in zip(row.terms, row.counts)}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm:
+            return 0.0
+        return sum(weights[term] * value for term, value in query.items() if term in weights) / norm
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def add_documents(self, documents: Iterable[Tuple[str, str, str, float]]):
+        """Index (or re-index) plans given as (project, filename, content, mtime)."""
+        if not self._loaded and self.reader is not None:
+            # Counted by whoever loads the index next
+            self._commit([{"op": "add", "project": project, "filename": filename}
+                          for project, filename, _, _ in documents])
+            return
+        self._commit([self._add_entry(project, filename, term_counts(content))
+                      for project, filename, content, _ in documents])
+
+    def remove_documents(self, plans: Iterable[Tuple[str, str]]):
+        """Drop plans from the index."""
+        self._commit([{"op": "remove", "project": project, "filename": filename}
+                      for project, filename in plans])
+
+    def rebuild(self, documents: Iterable[Tuple[str, str, str, float]]):
+        """Replace the whole index with the given documents and persist it."""
+        with self._lock, self._file_lock:
+            self._rebuild(documents)
+
+    def _rebuild(self, documents: Iterable[Tuple[str, str, str, float]]):
+        self._write_log([self._add_entry(project, filename, term_counts(content))
+                         for project, filename, content, _ in documents])
+
+    def related(self, content: Optional[str] = None, project: Optional[str] = None,
+                filename: Optional[str] = None, limit: int = 10,
+                exclude_project: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Rank indexed plans by cosine similarity to a text or to an indexed plan.
+
+        Args:
+            content: Query text; if None, the plan (project, filename) is the query
+            project: Project of the query plan
+            filename: Filename of the query plan, which is never returned itself
+            limit: Maximum number of results
+            exclude_project: Leave out plans of this project
+
+        Returns:
+            Dicts with 'project', 'filename' and 'score' (cosine, 0-1), best
+            first, or None if the query plan is not indexed
+        """
+        with self._lock:
+            self._refresh()
+            if content is not None:
+                counts = {}
+                for word, count in term_counts(content).items():
+                    term = self._vocabulary.get(word)
+                    if term is not None:
+                        counts[term] = count
+                exclude_key = None
+            else:
+                exclude_key = _key(project, filename)
+                row = self._rows.get(exclude_key)
+                if row is None:
+                    return None
+                counts = dict(zip(row.terms, row.counts))
+            query = self._query_vector(counts)
+            if not query:
+                return []
+
+            if self._matrix is None or len(self._changed) > CONSOLIDATE_THRESHOLD:
+                self._build_matrix()
+            matrix = self._matrix
+
+            # Rows of the matrix that were since removed or replaced are scored separately
+            excluded = [matrix.positions[key] for key in self._changed if key in matrix.positions]
+            if exclude_key in matrix.positions:
+                excluded.append(matrix.positions[exclude_key])
+            if exclude_project is not None:
+                excluded.extend(matrix.by_project.get(exclude_project, ()))
+            ranked = [
+                (score, matrix.keys[i]) for score, i in matrix.top(query, limit, excluded)
+            ]
+            for key in self._changed:
+                row = self._rows.get(key)
+                if row is None or key == exclude_key or row.project == exclude_project:
+                    continue
+                score = self._row_cosine(row, query)
+                if score > 0:
+                    ranked.append((score, key))
+
+            results = []
+            for score, key in heapq.nlargest(limit, ranked):
+                row = self._rows[key]
+                results.append({'project': row.project, 'filename': row.filename,
+                                'score': min(score, 1.0)})
+        return results
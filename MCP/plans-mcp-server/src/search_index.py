@@ -0,0 +1,860 @@
+#!/usr/bin/env python3
+"""
+Plans Search Index
+
+A persistent, token-level inverted index over saved plans. It lets
+search_plans answer queries without opening plan files.
+
+Plan text is lowercased and split into maximal runs of word characters,
+whitespace and punctuation. Every run is indexed with its position. Because
+the runs concatenate back to the original text, a substring query can be
+answered exactly from the postings. The first query run must be a suffix of
+a document run, the last run a prefix, and the runs in between must match
+exactly.
+
+The index is persisted as a snapshot plus an append-only journal of
+document updates. This means a save only appends one line to disk. The
+journal is folded back into the snapshot once it grows past a threshold.
+The snapshot is memory-mapped (see index_snapshot), so a new process only
+decodes the postings of the terms its queries touch.
+Several processes can share one index. Writers append under a file lock,
+and readers replay whatever other processes appended since their last
+query.
+
+Matches are ranked with BM25 over the query's words. Occurrences in the plan
+title and headings are boosted. Document lengths and the total corpus length
+are maintained incrementally as plans are added and removed, and document
+frequencies come straight from the postings.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import shlex
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .fileio import FileLock, atomic_write
+    from .index_snapshot import MappedSnapshot, PostingsMap, write_snapshot
+    from .metrics import record_read, record_write
+except ImportError:
+    # For standalone execution
+    from fileio import FileLock, atomic_write
+    from index_snapshot import MappedSnapshot, PostingsMap, write_snapshot
+    from metrics import record_read, record_write
+
+# Word runs, whitespace runs and punctuation runs, in that order of preference
+_RUN_PATTERN = re.compile(r"\w+|\s+|[^\w\s]+")
+
+# Number of journal entries tolerated before the snapshot is rewritten
+COMPACT_THRESHOLD = 500
+
+# Lock-free load attempts before falling back to loading under the file lock
+MAX_LOAD_ATTEMPTS = 3
+
+MATCH_MODES = ("phrase", "all", "any")
+
+# BM25 parameters and the weight of an occurrence in a title or heading
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_BOOST = 3.0
+HEADING_BOOST = 2.0
+
+# Characters of context shown on each side of the first hit in a snippet
+SNIPPET_RADIUS = 60
+
+# Length of the term slices in the vocabulary's substring index, and the
+# number of new terms held unsorted before they are merged into the sorted
+# term lists
+GRAM_SIZE = 3
+VOCABULARY_MERGE_THRESHOLD = 1024
+
+
+class SearchCancelled(Exception):
+    """Raised when a caller cancels a running search."""
+
+
+def _check_cancelled(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise SearchCancelled()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split lowercased text into the runs used as index terms."""
+    return _RUN_PATTERN.findall(text.lower())
+
+
+def _is_word(run: str) -> bool:
+    return run[0].isalnum() or run[0] == "_"
+
+
+def _heading_ranges(runs: List[str]) -> Tuple[Optional[List[int]], List[List[int]]]:
+    """
+    Locate markdown headings in a run sequence.
+
+    Returns:
+        The [start, end) run range of the title (the first level-one
+        heading), if any, and the ranges of all other headings
+    """
+    title = None
+    headings = []
+    line_start = True
+    start = None
+    for position, run in enumerate(runs + ["\n"]):
+        if start is not None and run[0].isspace() and "\n" in run:
+            if title is None and runs[start] == "#":
+                title = [start, position]
+            else:
+                headings.append([start, position])
+            start = None
+        if line_start and not run.strip("#"):
+            start = position
+        line_start = run[0].isspace() and "\n" in run
+    return title, headings
+
+
+def _count_in(positions: List[int], ranges: List[List[int]]) -> int:
+    """Count sorted positions that fall inside any of the [start, end) ranges."""
+    return sum(
+        bisect_left(positions, end) - bisect_left(positions, start)
+        for start, end in ranges
+    )
+
+
+def parse_query(query: str) -> List[str]:
+    """Split a query into clauses, keeping quoted phrases together."""
+    try:
+        clauses = shlex.split(query)
+    except ValueError:
+        # Unbalanced quotes: fall back to plain whitespace splitting
+        clauses = query.split()
+    return [clause for clause in clauses if clause]
+
+
+def make_snippet(content: str, query: str, mode: str = "phrase",
+                 radius: int = SNIPPET_RADIUS) -> str:
+    """
+    Build a one-line excerpt around the first hit, with hits in **bold**.
+
+    The frontmatter is skipped. If the query only matched there, the snippet
+    shows the start of the plan body instead.
+    """
+    body = content
+    if content.startswith("---\n"):
+        end = content.find("\n---", 4)
+        if end != -1:
+            body = content[end + 4:]
+
+    needles = [query] if mode == "phrase" else parse_query(query)
+    needles = sorted({n for n in needles if n.strip()}, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(n) for n in needles), re.IGNORECASE) if needles else None
+
+    hit = pattern.search(body) if pattern else None
+    if hit is None:
+        start, end = 0, 2 * radius
+    else:
+        start, end = max(0, hit.start() - radius), hit.end() + radius
+    window = body[start:end]
+    if pattern:
+        window = pattern.sub(lambda m: f"**{m.group(0)}**", window)
+    window = " ".join(window.split())
+
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(body) else ""
+    return f"{prefix}{window}{suffix}"
+
+
+class _Vocabulary:
+    """
+    Prefix, suffix and substring lookups over the terms of an index.
+
+    The terms are kept sorted, forwards and reversed, so the terms starting
+    or ending with a run are a bisection away. Substring lookups go through
+    an index from every GRAM_SIZE-character slice of a term to the ids of the
+    terms containing it, built on the first such lookup. New terms wait in a
+    short unsorted list until VOCABULARY_MERGE_THRESHOLD of them have
+    accumulated. Removed terms are only flagged, and leave the sorted lists
+    at the next merge.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self._ids: Dict[str, int] = {}
+        self._words: List[str] = []
+        self._live = bytearray()
+        self._grams: Optional[Dict[str, array]] = None
+        # Ids of terms too short to have a slice of their own
+        self._short: List[int] = []
+        for term in terms:
+            self._register(term)
+        self._sorted = sorted(self._ids)
+        self._reversed = sorted(term[::-1] for term in self._ids)
+        self._pending: Dict[str, None] = {}
+        self._removed = 0
+
+    def _register(self, term: str):
+        term_id = self._ids.get(term)
+        if term_id is not None:
+            self._live[term_id] = 1
+            return
+        term_id = len(self._words)
+        self._ids[term] = term_id
+        self._words.append(term)
+        self._live.append(1)
+        if self._grams is not None:
+            self._index_grams(term_id, term)
+
+    def _index_grams(self, term_id: int, term: str):
+        if len(term) < GRAM_SIZE:
+            self._short.append(term_id)
+            return
+        grams = self._grams
+        for gram in {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}:
+            ids = grams.get(gram)
+            if ids is None:
+                grams[gram] = ids = array('I')
+            ids.append(term_id)
+
+    def _is_live(self, term: str) -> bool:
+        return bool(self._live[self._ids[term]])
+
+    def add(self, term: str):
+        self._register(term)
+        index = bisect_left(self._sorted, term)
+        if index == len(self._sorted) or self._sorted[index] != term:
+            self._pending[term] = None
+            if len(self._pending) >= VOCABULARY_MERGE_THRESHOLD:
+                self._merge()
+
+    def remove(self, term: str):
+        term_id = self._ids.get(term)
+        if term_id is None or not self._live[term_id]:
+            return
+        self._live[term_id] = 0
+        if term in self._pending:
+            del self._pending[term]
+            return
+        self._removed += 1
+        if self._removed > max(VOCABULARY_MERGE_THRESHOLD, len(self._sorted) // 2):
+            self._merge()
+
+    def _merge(self):
+        # Both lists are already sorted runs, which sorted() merges in
+        # linear time
+        live = [term for term in self._sorted if self._is_live(term)]
+        live_reversed = [term for term in self._reversed if self._is_live(term[::-1])]
+        self._sorted = sorted(live + sorted(self._pending))
+        self._reversed = sorted(live_reversed + sorted(term[::-1] for term in self._pending))
+        self._pending = {}
+        self._removed = 0
+
+    @staticmethod
+    def _starting_with(terms: List[str], prefix: str) -> Iterable[str]:
+        for index in range(bisect_left(terms, prefix), len(terms)):
+            if not terms[index].startswith(prefix):
+                break
+            yield terms[index]
+
+    def prefixed(self, prefix: str) -> List[str]:
+        """Return the terms that start with ``prefix``."""
+        terms = [term for term in self._starting_with(self._sorted, prefix)
+                 if self._is_live(term)]
+        terms.extend(term for term in self._pending if term.startswith(prefix))
+        return terms
+
+    def suffixed(self, suffix: str) -> List[str]:
+        """Return the terms that end with ``suffix``."""
+        terms = [term[::-1] for term in self._starting_with(self._reversed, suffix[::-1])]
+        terms = [term for term in terms if self._is_live(term)]
+        terms.extend(term for term in self._pending if term.endswith(suffix))
+        return terms
+
+    def containing(self, text: str) -> List[str]:
+        """Return the terms that contain ``text``."""
+        if self._grams is None:
+            self._grams = {}
+            for term_id, term in enumerate(self._words):
+                self._index_grams(term_id, term)
+        if len(text) >= GRAM_SIZE:
+            # Every matching term contains all of the text's slices; walk the
+            # rarest one
+            rarest = None
+            for i in range(len(text) - GRAM_SIZE + 1):
+                ids = self._grams.get(text[i:i + GRAM_SIZE])
+                if ids is None:
+                    return []
+                if rarest is None or len(ids) < len(rarest):
+                    rarest = ids
+            candidates: Iterable[int] = rarest
+        else:
+            # Shorter text is found through the slices that contain it, which
+            # are far fewer than the terms
+            found: Set[int] = set(self._short)
+            for gram, ids in self._grams.items():
+                if text in gram:
+                    found.update(ids)
+            candidates = found
+        words = self._words
+        return [words[term_id] for term_id in candidates
+                if self._live[term_id] and text in words[term_id]]
+
+
+class SearchIndex:
+    """Inverted index mapping plan terms to positional postings."""
+
+    def __init__(self, index_path: Path):
+        """
+        Bind the index to its base path.
+
+        The snapshot (``.snap``), journal (``.log``) and lock file sit next to
+        ``index_path``. A JSON snapshot at ``index_path`` itself, written by
+        earlier versions, is still read until the next compaction replaces it.
+        """
+        self.index_path = Path(index_path)
+        self.snapshot_path = self.index_path.with_suffix(".snap")
+        self.journal_path = self.index_path.with_suffix(".log")
+        self._file_lock = FileLock(self.index_path.with_suffix(".lock"))
+        self._snapshot: Optional[MappedSnapshot] = None
+        self._postings = PostingsMap()
+        # Built on the first substring query, then kept up to date
+        self._vocabulary: Optional[_Vocabulary] = None
+        self._docs: Dict[int, Dict] = {}
+        self._keys: Dict[str, int] = {}
+        self._next_id = 0
+        self._journal_entries = 0
+        self._total_length = 0
+        # Position in the journal up to which entries have been applied, and
+        # the identity of that journal, to notice appends and compactions made
+        # by other processes
+        self._generation = 0
+        self._journal_offset = 0
+        self._journal_id: Optional[Tuple[int, int]] = None
+        self._journal_generation = 0
+        # Guards the in-memory structures against concurrent readers/writers
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @staticmethod
+    def _doc_key(project: str, filename: str) -> str:
+        return f"{project}/{filename}"
+
+    def exists(self) -> bool:
+        """Return True if a persisted snapshot or journal is on disk."""
+        return (self.snapshot_path.exists() or self.index_path.exists()
+                or self.journal_path.exists())
+
+    def load(self):
+        """Load the snapshot and replay the journal on top of it."""
+        with self._lock:
+            self._load()
+
+    def load_or_build(self, documents: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        """Load the persisted index, or build it from ``documents()`` if absent."""
+        with self._lock:
+            if not self.exists():
+                with self._file_lock:
+                    # Another process may have built it while we waited
+                    if not self.exists():
+                        self._rebuild(documents())
+                        return
+            self._load()
+
+    def _load(self):
+        # A compaction can slip in between reading the snapshot and the
+        # journal; retry until both come from the same generation
+        for _ in range(MAX_LOAD_ATTEMPTS):
+            if self._try_load():
+                return
+        with self._file_lock:
+            self._try_load()
+
+    def _try_load(self) -> bool:
+        self._reset()
+        if self.snapshot_path.exists():
+            self._load_snapshot()
+        elif self.index_path.exists():
+            self._load_json_snapshot()
+
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return True
+        with f:
+            journal_id, generation, header_size = self._read_journal_header(f)
+            if generation > self._generation:
+                # The journal belongs to a newer snapshot; the caller retries
+                return False
+            self._journal_id = journal_id
+            self._journal_generation = generation
+            if generation < self._generation:
+                # Left over from an interrupted compaction; the snapshot
+                # already contains these entries
+                self._journal_offset = os.fstat(f.fileno()).st_size
+            else:
+                self._journal_offset = header_size
+                self._replay_tail(f)
+        return True
+
+    def _load_snapshot(self):
+        snapshot = MappedSnapshot(self.snapshot_path)
+        record_read(snapshot.eager_size)
+        self._snapshot = snapshot
+        self._generation = snapshot.generation
+        self._next_id = snapshot.next_id
+        self._total_length = snapshot.total_length
+        self._docs = snapshot.docs()
+        self._keys = {doc["key"]: doc_id for doc_id, doc in self._docs.items()}
+        self._postings = PostingsMap(snapshot)
+
+    def _load_json_snapshot(self):
+        """Load a snapshot in the JSON format of earlier versions."""
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+            record_read(os.fstat(f.fileno()).st_size)
+        self._generation = snapshot.get("generation", 0)
+        self._next_id = snapshot.get("next_id", 0)
+        for doc_id, doc in snapshot.get("docs", {}).items():
+            self._docs[int(doc_id)] = doc
+            self._keys[doc["key"]] = int(doc_id)
+            self._total_length += doc.get("length", 0)
+        for term, postings in snapshot.get("postings", {}).items():
+            self._postings[term] = {
+                int(doc_id): positions for doc_id, positions in postings.items()
+            }
+
+    def _reset(self):
+        self._snapshot = None
+        self._postings = PostingsMap()
+        self._vocabulary = None
+        self._docs = {}
+        self._keys = {}
+        self._next_id = 0
+        self._journal_entries = 0
+        self._total_length = 0
+        self._generation = 0
+        self._journal_offset = 0
+        self._journal_id = None
+        self._journal_generation = 0
+
+    @staticmethod
+    def _read_journal_header(f) -> Tuple[Tuple[int, int], int, int]:
+        """Return the journal's identity, generation and header length."""
+        stat = os.fstat(f.fileno())
+        line = f.readline()
+        try:
+            header = json.loads(line) if line.endswith(b"\n") else None
+        except json.JSONDecodeError:
+            header = None
+        if not isinstance(header, dict) or "op" in header:
+            # No header yet, or a journal from before headers were written
+            return (stat.st_dev, stat.st_ino), 0, 0
+        return (stat.st_dev, stat.st_ino), header.get("generation", 0), len(line)
+
+    def _replay_tail(self, f):
+        """Apply complete journal lines from the current offset onwards."""
+        f.seek(self._journal_offset)
+        data = f.read()
+        record_read(len(data))
+        # Only consume complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line from an interrupted write
+                continue
+            self._apply(entry)
+            self._journal_entries += 1
+        self._journal_offset += end
+
+    def refresh(self):
+        """Pick up index changes persisted by other processes."""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            # Inode numbers can be reused, so a compaction is detected by the
+            # journal's identity and its generation together
+            journal_id, generation, _ = self._read_journal_header(f)
+            if (journal_id, generation) != (self._journal_id, self._journal_generation):
+                stale = True
+            else:
+                stale = False
+                if os.fstat(f.fileno()).st_size > self._journal_offset:
+                    self._replay_tail(f)
+        if stale:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add_document(self, project: str, filename: str, content: str, mtime: float):
+        """Index (or re-index) a plan and record the change in the journal."""
+        self._commit([self._make_add_entry(project, filename, content, mtime)])
+
+    def add_documents(self, documents: Iterable[Tuple[str, str, str, float]]):
+        """Index several plans with a single journal append."""
+        self._commit([self._make_add_entry(*document) for document in documents])
+
+    def remove_document(self, project: str, filename: str):
+        """Drop a plan from the index."""
+        self._commit([{"op": "remove", "key": self._doc_key(project, filename)}])
+
+    def remove_documents(self, plans: Iterable[Tuple[str, str]]):
+        """Drop several plans with a single journal append."""
+        self._commit([{"op": "remove", "key": self._doc_key(project, filename)}
+                      for project, filename in plans])
+
+    def rebuild(self, documents: Iterable[Tuple[str, str, str, float]]):
+        """Replace the whole index with the given documents and persist it."""
+        with self._lock, self._file_lock:
+            self._rebuild(documents)
+
+    def _rebuild(self, documents: Iterable[Tuple[str, str, str, float]]):
+        entries = [self._make_add_entry(*document) for document in documents]
+        generation = max(self._generation, self._disk_generation())
+        self._reset()
+        self._generation = generation
+        for entry in entries:
+            self._apply(entry)
+        self._compact()
+
+    def _disk_generation(self) -> int:
+        """Read the generation recorded in the journal header on disk."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                return self._read_journal_header(f)[1]
+        except FileNotFoundError:
+            return 0
+
+    def _commit(self, entries: List[Dict]):
+        """Apply entries and append them to the journal under the file lock."""
+        if not entries:
+            return
+        with self._lock, self._file_lock:
+            self._refresh()
+            for entry in entries:
+                self._apply(entry)
+            self._append_journal(entries)
+
+    def _make_add_entry(self, project: str, filename: str, content: str,
+                        mtime: float) -> Dict:
+        runs = tokenize(content)
+        terms: Dict[str, List[int]] = {}
+        for position, term in enumerate(runs):
+            terms.setdefault(term, []).append(position)
+        title, headings = _heading_ranges(runs)
+        return {
+            "op": "add",
+            "key": self._doc_key(project, filename),
+            "project": project,
+            "filename": filename,
+            "mtime": mtime,
+            "length": sum(1 for run in runs if _is_word(run)),
+            "title": title,
+            "headings": headings,
+            "terms": terms,
+        }
+
+    def _apply(self, entry: Dict):
+        key = entry["key"]
+        old_id = self._keys.pop(key, None)
+        if old_id is not None:
+            self._drop(old_id)
+
+        if entry["op"] != "add":
+            return
+
+        doc_id = self._next_id
+        self._next_id += 1
+        self._keys[key] = doc_id
+        self._docs[doc_id] = {
+            "key": key,
+            "project": entry["project"],
+            "filename": entry["filename"],
+            "mtime": entry["mtime"],
+            "length": entry.get("length", 0),
+            "title": entry.get("title"),
+            "headings": entry.get("headings", []),
+            "terms": list(entry["terms"].keys()),
+        }
+        self._total_length += entry.get("length", 0)
+        for term, positions in entry["terms"].items():
+            postings = self._postings.get(term)
+            if postings is None:
+                self._postings[term] = postings = {}
+                if self._vocabulary is not None:
+                    self._vocabulary.add(term)
+            postings[doc_id] = positions
+
+    def _drop(self, doc_id: int):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc.get("length", 0)
+        terms = doc["terms"] if "terms" in doc else self._snapshot.doc_terms(doc["terms_at"])
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                if self._vocabulary is not None:
+                    self._vocabulary.remove(term)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _append_journal(self, entries: List[Dict]):
+        # Caller holds the file lock and has refreshed, so nobody else has
+        # appended since our offset
+        if self._journal_id is None:
+            self._start_journal()
+        data = "".join(
+            json.dumps(entry, separators=(',', ':')) + "\n" for entry in entries
+        ).encode('utf-8')
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        record_write(len(data))
+        self._journal_offset += len(data)
+        self._journal_entries += len(entries)
+
+        if self._journal_entries > COMPACT_THRESHOLD:
+            self._compact()
+
+    def _start_journal(self):
+        header = json.dumps({"generation": self._generation}) + "\n"
+        atomic_write(self.journal_path, header)
+        stat = os.stat(self.journal_path)
+        self._journal_id = (stat.st_dev, stat.st_ino)
+        self._journal_generation = self._generation
+        self._journal_offset = len(header.encode('utf-8'))
+        self._journal_entries = 0
+
+    def compact(self):
+        """Write a full snapshot and truncate the journal."""
+        with self._lock, self._file_lock:
+            self._refresh()
+            self._compact()
+
+    def _compact(self):
+        # Caller holds the file lock. The snapshot is written before the
+        # journal is replaced, and both carry the new generation so readers
+        # can tell when they have caught the pair mid-compaction.
+        self._generation += 1
+        write_snapshot(self.snapshot_path, self._generation, self._next_id,
+                       self._total_length, self._docs, self._postings)
+        if self.index_path.exists():
+            # Superseded JSON snapshot from an earlier version
+            os.unlink(self.index_path)
+        self._start_journal()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, mode: str = "phrase", limit: Optional[int] = None,
+               restrict: Optional[Set[int]] = None,
+               cancel_event: Optional[threading.Event] = None,
+               after: Optional[Tuple[float, float, str]] = None) -> List[Dict]:
+        """
+        Find plans matching a query, best matches first.
+
+        Args:
+            query: Text to look for, case-insensitively
+            mode: "phrase" matches the whole query as one substring (the
+                historical search_plans behaviour); "all" and "any" split it
+                into clauses (quoted phrases stay together) and combine their
+                matches with AND or OR respectively
+            limit: Return only the top ``limit`` hits, selected with a heap
+                rather than by sorting every match
+            restrict: Optional set of document ids the hits must come from
+            cancel_event: Optional event; once set, the search stops early
+                by raising SearchCancelled
+            after: Sort key (score, mtime, key) of the last hit of the
+                previous page; only hits ranked below it are returned
+
+        Returns:
+            Document records with a BM25 ``score``, ordered by score, then by
+            recency, then by key, so the order is stable across pages
+        """
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {mode}")
+
+        with self._lock:
+            self._refresh()
+            doc_ids = self._match(query, mode, cancel_event)
+            if restrict is not None:
+                doc_ids &= restrict
+
+            scores = self._bm25(query, doc_ids, cancel_event)
+            ranked = ((scores.get(doc_id, 0.0), self._docs[doc_id]["mtime"],
+                       self._docs[doc_id]["key"], doc_id)
+                      for doc_id in doc_ids)
+            if after is not None:
+                ranked = (entry for entry in ranked if entry[:3] < after)
+            if limit is None:
+                top = sorted(ranked, reverse=True)
+            else:
+                top = heapq.nlargest(limit, ranked)
+
+            return [self._result(doc_id, score) for score, _, _, doc_id in top]
+
+    def _match(self, query: str, mode: str,
+               cancel_event: Optional[threading.Event]) -> Set[int]:
+        if mode == "phrase":
+            return self._match_substring(query, cancel_event)
+
+        doc_ids: Set[int] = set()
+        for i, clause in enumerate(parse_query(query)):
+            matches = self._match_substring(clause, cancel_event)
+            if mode == "any":
+                doc_ids |= matches
+            elif i == 0:
+                doc_ids = matches
+            else:
+                doc_ids &= matches
+            if mode == "all" and not doc_ids:
+                break
+        return doc_ids
+
+    def _bm25(self, query: str, doc_ids: Set[int],
+              cancel_event: Optional[threading.Event]) -> Dict[int, float]:
+        """Score candidate documents against the words of the query."""
+        words = {run for run in tokenize(query) if _is_word(run)}
+        n_docs = len(self._docs)
+        if not doc_ids or not words or not n_docs:
+            return {}
+        avg_length = max(self._total_length / n_docs, 1.0)
+
+        scores: Dict[int, float] = {}
+        for word in words:
+            _check_cancelled(cancel_event)
+            postings = self._postings.get(word)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            # Walk whichever side is smaller
+            if len(postings) < len(doc_ids):
+                hits = [doc_id for doc_id in postings if doc_id in doc_ids]
+            else:
+                hits = [doc_id for doc_id in doc_ids if doc_id in postings]
+            for doc_id in hits:
+                doc = self._docs[doc_id]
+                positions = postings[doc_id]
+                tf = float(len(positions))
+                if doc.get("title"):
+                    tf += (TITLE_BOOST - 1) * _count_in(positions, [doc["title"]])
+                if doc.get("headings"):
+                    tf += (HEADING_BOOST - 1) * _count_in(positions, doc["headings"])
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc.get("length", 0) / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def _result(self, doc_id: int, score: float) -> Dict:
+        doc = self._docs[doc_id]
+        return {
+            "key": doc["key"],
+            "project": doc["project"],
+            "filename": doc["filename"],
+            "mtime": doc["mtime"],
+            "score": score,
+        }
+
+    def match_substring(self, text: str,
+                        cancel_event: Optional[threading.Event] = None) -> Set[int]:
+        """Return ids of documents whose lowercased text contains ``text``."""
+        with self._lock:
+            self._refresh()
+            return self._match_substring(text, cancel_event)
+
+    def _match_substring(self, text: str,
+                         cancel_event: Optional[threading.Event]) -> Set[int]:
+        runs = tokenize(text)
+        if not runs:
+            return set()
+
+        if self._vocabulary is None:
+            self._vocabulary = _Vocabulary(self._postings)
+
+        if len(runs) == 1:
+            return self._docs_for(self._vocabulary.containing(runs[0]))
+
+        _check_cancelled(cancel_event)
+        first_terms = self._vocabulary.suffixed(runs[0])
+        last_terms = self._vocabulary.prefixed(runs[-1])
+        middle = runs[1:-1]
+        if not first_terms or not last_terms:
+            return set()
+        for term in middle:
+            if term not in self._postings:
+                return set()
+
+        # Narrow the candidates with the cheapest constraints first
+        candidates = self._docs_for(first_terms) & self._docs_for(last_terms)
+        for term in sorted(middle, key=lambda t: len(self._postings[t])):
+            candidates &= self._postings[term].keys()
+            if not candidates:
+                return set()
+
+        last_offset = len(runs) - 1
+        matches = set()
+        for i, doc_id in enumerate(candidates):
+            if i % 256 == 0:
+                _check_cancelled(cancel_event)
+            starts = set()
+            for term in first_terms:
+                starts.update(self._postings[term].get(doc_id, ()))
+            for offset, term in enumerate(middle, start=1):
+                positions = set(self._postings[term][doc_id])
+                starts = {p for p in starts if p + offset in positions}
+                if not starts:
+                    break
+            if not starts:
+                continue
+            ends = set()
+            for term in last_terms:
+                ends.update(self._postings[term].get(doc_id, ()))
+            if any(p + last_offset in ends for p in starts):
+                matches.add(doc_id)
+        return matches
+
+    def _docs_for(self, terms: List[str]) -> Set[int]:
+        doc_ids: Set[int] = set()
+        for term in terms:
+            doc_ids.update(self._postings[term])
+        return doc_ids
+
+    def doc_ids(self, plans: Iterable[Tuple[str, str]]) -> Set[int]:
+        """Map (project, filename) pairs to the ids of indexed documents."""
+        with self._lock:
+            self._refresh()
+            keys = (self._doc_key(project, filename) for project, filename in plans)
+            return {self._keys[key] for key in keys if key in self._keys}
+
+    def get_document(self, project: str, filename: str) -> Optional[Dict]:
+        """Return the indexed record for a plan, if present."""
+        with self._lock:
+            doc_id = self._keys.get(self._doc_key(project, filename))
+            return self._docs.get(doc_id) if doc_id is not None else None
@@ -9,44 +9,275 @@ A Model Context Protocol server that provides tools for automatically
 saving and managing validated project plans created in Claude Code's plan mode.
 """
 
+from __future__ import annotations
+
+import contextvars
+import importlib
+import importlib.util
 import json
 import logging
+import os
 import sys
-from typing import Any, Dict, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 import asyncio
 from pathlib import Path
 
-# MCP imports
-try:
-    from mcp.server import Server
-    from mcp.server.models import InitializationOptions
-    import mcp.server.stdio
-    import mcp.types as types
-except ImportError as e:
+# Any MCP import loads the whole SDK, so it is imported by main() (and by
+# the first use of ``types``), not by importing this module
+if importlib.util.find_spec("mcp") is None:
     print(f"Error: MCP SDK not installed. Run: pip install mcp", file=sys.stderr)
     sys.exit(1)
 
-# Import our plan manager
+
+class _DeferredModule:
+    """Stands in for a module that is imported on first attribute access."""
+    
+    def __init__(self, name: str):
+        self._name = name
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(importlib.import_module(self._name), attr)
+
+
+types = _DeferredModule("mcp.types")
+
+# PlanManager is imported by _get_plan_manager(), off the startup path
 try:
-    from .plan_manager import PlanManager
+    from .metrics import PROMETHEUS_CONTENT_TYPE, metrics
+    from .profiling import CallProfiler, profiled
 except ImportError:
     # For standalone execution
+    from metrics import PROMETHEUS_CONTENT_TYPE, metrics
+    from profiling import CallProfiler, profiled
+
+if TYPE_CHECKING:
+    from mcp.server import Server
     from plan_manager import PlanManager
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("plans-mcp-server")
 
-# Initialize the server
-server = Server("plans-mcp-server")
-
 # Global plan manager instance
 plan_manager = None
+_plan_manager_lock = threading.Lock()
+
+# Watcher started by main() when PLANS_WATCH is set
+plan_watcher = None
+
+# Plan-store I/O runs on a bounded thread pool so the event loop stays free
+MAX_WORKERS = max(1, int(os.environ.get("PLANS_MAX_WORKERS", "4")))
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="plans-io")
+
+# index.md is regenerated in the background at most once per debounce window;
+# 0 writes it synchronously on every save instead
+INDEX_DEBOUNCE_MS = max(0, int(os.environ.get("PLANS_INDEX_DEBOUNCE_MS", "500")))
+
+# Store new plans as deduplicated, content-addressed objects instead of .md files
+DEDUP_STORAGE = os.environ.get("PLANS_DEDUP", "").strip().lower() in ("1", "true", "yes", "on")
+
+# Estimated similarity at or above which a saved plan is reported as a near-duplicate
+SIMILARITY_THRESHOLD = float(os.environ.get("PLANS_SIMILARITY_THRESHOLD", "0.8"))
+
+# Save near-duplicates of another project's plan as new versions of that project
+MERGE_SIMILAR = os.environ.get("PLANS_MERGE_SIMILAR", "").strip().lower() in ("1", "true", "yes", "on")
+
+# Delete the .md files of versions older than the newest N per project once they
+# are in the version history; unset keeps every file
+KEEP_FILES = int(os.environ["PLANS_KEEP_FILES"]) if os.environ.get("PLANS_KEEP_FILES") else None
+
+# Pick up plan files changed outside the server: off (default), auto, inotify or poll
+WATCH_MODE = os.environ.get("PLANS_WATCH", "off").strip().lower()
+
+# Seconds between scans when watching by polling
+WATCH_INTERVAL = max(0.1, float(os.environ.get("PLANS_WATCH_INTERVAL", "2")))
+
+# Number of ranked hits search_plans returns when no limit is given
+DEFAULT_SEARCH_LIMIT = 20
+
+# Largest limit search_plans accepts; more results are fetched page by page
+MAX_SEARCH_LIMIT = 200
+
+# Page size of list_plans when no limit is given
+DEFAULT_LIST_LIMIT = 100
+
+# Largest page size list_plans accepts
+MAX_LIST_LIMIT = 1000
+
+# Output formats of the listing tools: Markdown-ish text, or compact JSON
+OUTPUT_FORMATS = ("text", "json")
+
+_PAGING_PROPERTIES = {
+    "cursor": {
+        "type": "string",
+        "description": "Opaque cursor from a previous page's next_cursor; resumes right after it"
+    },
+    "format": {
+        "type": "string",
+        "enum": list(OUTPUT_FORMATS),
+        "description": "'text' (default) or 'json' for a compact machine-readable page"
+    }
+}
+
+# Catalog filters shared by list_plans and search_plans, each an index range scan
+_FILTER_PROPERTIES = {
+    "status": {
+        "type": "string",
+        "description": "Optional frontmatter status (e.g. 'validated'); only plans with it are returned"
+    },
+    "since": {
+        "type": "string",
+        "description": "Optional ISO date or date-time; only plans saved at or after it are returned"
+    },
+    "until": {
+        "type": "string",
+        "description": "Optional ISO date or date-time; only plans saved up to it (a bare date includes that whole day) are returned"
+    }
+}
+
+
+# Opt-in cProfile capture of tool calls (PLANS_PROFILE=1 or debug_profile)
+profiler = CallProfiler.from_env()
+
+_DEBUG_PROFILE_PROPERTY = {
+    "type": "boolean",
+    "description": "Profile this call and return a summary of where the time went"
+}
+
+
+def _parse_limit(value: Any, default: int, maximum: int) -> Optional[int]:
+    """Return ``value`` as a page size in 1..``maximum``, or None if it is not one."""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return None
+    try:
+        limit = int(value) if isinstance(value, (int, str)) else None
+    except ValueError:
+        return None
+    if limit is None or not 1 <= limit <= maximum:
+        return None
+    return limit
+
+
+def _paginate(items: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Split ``limit + 1`` fetched items into a page and the cursor of the next one."""
+    if len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    return page, page[-1]["cursor"]
+
+
+def _json_page(key: str, items: List[Dict[str, Any]], next_cursor: Optional[str]) -> str:
+    """Serialize a page of results as compact JSON."""
+    return json.dumps(
+        {key: items, "next_cursor": next_cursor},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+
+
+def _get_plan_manager() -> "PlanManager":
+    """Create the shared PlanManager on first use (runs on a worker thread)."""
+    global plan_manager
+    with _plan_manager_lock:
+        if plan_manager is None:
+            try:
+                from .plan_manager import PlanManager
+            except ImportError:
+                # For standalone execution
+                from plan_manager import PlanManager
+            
+            options: Dict[str, Any] = {
+                "defer_index": INDEX_DEBOUNCE_MS > 0,
+                "dedup": DEDUP_STORAGE,
+                "similarity_threshold": SIMILARITY_THRESHOLD,
+                "merge_similar": MERGE_SIMILAR,
+                "keep_files": KEEP_FILES
+            }
+            cache_bytes = os.environ.get("PLANS_CACHE_BYTES")
+            if cache_bytes:
+                options["cache_bytes"] = int(cache_bytes)
+            plan_manager = PlanManager(**options)
+        return plan_manager
+
+
+async def _run_blocking(func: Callable, *args, cancellable: bool = False, **kwargs) -> Any:
+    """
+    Run a blocking plan-store call on the worker pool.
+    
+    If the awaiting task is cancelled (e.g. the client cancelled the request),
+    a call that has not started yet is dropped, and a cancellable call that is
+    already running receives a set ``cancel_event`` so it can stop early.
+    """
+    cancel_event = threading.Event()
+    if cancellable:
+        kwargs["cancel_event"] = cancel_event
+    
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context so I/O is attributed to its tool
+    # call, under the call's profiler when it is being profiled
+    context = contextvars.copy_context()
+    work = profiled(partial(func, *args, **kwargs))
+    future = loop.run_in_executor(_executor, partial(context.run, work))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+
+
+class IndexWriter:
+    """Coalesces index.md rewrites into one background write per debounce window."""
+    
+    def __init__(self, debounce_ms: int):
+        self.debounce = debounce_ms / 1000
+        self._dirty: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def mark_dirty(self):
+        """Schedule a rewrite; bursts of calls within the window share one write."""
+        if self._dirty is None:
+            self._dirty = asyncio.Event()
+        self._dirty.set()
+        if self._task is None or self._task.done():
+            # Start the task from an empty context, so its writes are neither
+            # charged to nor profiled with the tool call that scheduled it
+            self._task = contextvars.Context().run(asyncio.create_task, self._run())
+    
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(self.debounce)
+            self._dirty.clear()
+            try:
+                await _run_blocking(_write_index_if_dirty)
+            except Exception as e:
+                logger.error(f"Error writing plans index: {str(e)}")
+    
+    async def flush(self):
+        """Stop the background task and write any pending changes."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await _run_blocking(_write_index_if_dirty)
+
+
+def _write_index_if_dirty():
+    if plan_manager is not None and plan_manager.index_dirty:
+        plan_manager.write_index()
+
+
+index_writer = IndexWriter(INDEX_DEBOUNCE_MS)
 
-@server.list_tools()
 async def handle_list_tools() -> List[types.Tool]:
     """List available tools."""
-    return [
+    tools = [
         types.Tool(
             name="save_plan",
             description="Save a validated project plan as markdown with metadata",
@@ -60,11 +291,43 @@ async def handle_list_tools() -> List[types.Tool]:
                     "project_name": {
                         "type": "string",
                         "description": "Optional project name (auto-extracted if not provided)"
+                    },
+                    "merge_similar": {
+                        "type": "boolean",
+                        "description": "Save a near-duplicate of another project's plan as a new version of that project (default from PLANS_MERGE_SIMILAR)"
                     }
                 },
                 "required": ["plan_content"]
             }
         ),
+        types.Tool(
+            name="save_plans",
+            description="Save many validated plans in one call, updating the index once",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "plans": {
+                        "type": "array",
+                        "description": "Plans to save",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "plan_content": {
+                                    "type": "string",
+                                    "description": "The validated plan content to save"
+                                },
+                                "project_name": {
+                                    "type": "string",
+                                    "description": "Optional project name (auto-extracted if not provided)"
+                                }
+                            },
+                            "required": ["plan_content"]
+                        }
+                    }
+                },
+                "required": ["plans"]
+            }
+        ),
         types.Tool(
             name="list_plans",
             description="List all saved project plans",
@@ -74,7 +337,20 @@ async def handle_list_tools() -> List[types.Tool]:
                     "project_filter": {
                         "type": "string",
                         "description": "Optional project name to filter by"
-                    }
+                    },
+                    "tags": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Optional frontmatter tags; plans carrying any of them are listed"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": MAX_LIST_LIMIT,
+                        "description": f"Maximum number of plans per page (default {DEFAULT_LIST_LIMIT}, at most {MAX_LIST_LIMIT})"
+                    },
+                    **_FILTER_PROPERTIES,
+                    **_PAGING_PROPERTIES
                 }
             }
         ),
@@ -91,11 +367,134 @@ async def handle_list_tools() -> List[types.Tool]:
                     "filename": {
                         "type": "string", 
                         "description": "Optional specific plan filename (uses most recent if not provided)"
+                    },
+                    "materialize": {
+                        "type": "boolean",
+                        "description": "Also write a deduplicated plan out to its .md file (default false)"
+                    }
+                },
+                "required": ["project_name"]
+            }
+        ),
+        types.Tool(
+            name="get_plan_version",
+            description="Retrieve a project's plan as of an earlier saved version",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "project_name": {
+                        "type": "string",
+                        "description": "Name of the project"
+                    },
+                    "version": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Version number; 1 is the project's first saved plan"
+                    }
+                },
+                "required": ["project_name", "version"]
+            }
+        ),
+        types.Tool(
+            name="diff_plans",
+            description="Show a unified diff between two saved versions of a project's plan",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "project_name": {
+                        "type": "string",
+                        "description": "Name of the project"
+                    },
+                    "from_version": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Older version (defaults to the one before to_version)"
+                    },
+                    "to_version": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Newer version (defaults to the latest)"
                     }
                 },
                 "required": ["project_name"]
             }
         ),
+        types.Tool(
+            name="find_similar_plans",
+            description="Find stored plans that are near-duplicates of a text or of a saved plan",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "plan_content": {
+                        "type": "string",
+                        "description": "Text to compare against stored plans"
+                    },
+                    "project_name": {
+                        "type": "string",
+                        "description": "Compare against this project's plan instead of plan_content"
+                    },
+                    "filename": {
+                        "type": "string",
+                        "description": "Plan file of project_name (defaults to its latest plan)"
+                    },
+                    "threshold": {
+                        "type": "number",
+                        "minimum": 0,
+                        "maximum": 1,
+                        "description": "Minimum estimated similarity, 0-1 (default from PLANS_SIMILARITY_THRESHOLD)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Maximum number of results (default 10)"
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="related_plans",
+            description="Recommend saved plans on the same topic as a text or a saved plan (TF-IDF cosine)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "plan_content": {
+                        "type": "string",
+                        "description": "Text to find related plans for, e.g. the plan being written"
+                    },
+                    "project_name": {
+                        "type": "string",
+                        "description": "Find plans related to this project's plan instead of plan_content"
+                    },
+                    "filename": {
+                        "type": "string",
+                        "description": "Plan file of project_name (defaults to its latest plan)"
+                    },
+                    "include_same_project": {
+                        "type": "boolean",
+                        "description": "Also return other plans of project_name (default false)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "description": "Maximum number of results (default 10)"
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="get_plan_stats",
+            description="Aggregate statistics: plan counts and bytes per project, tag, status and month, plus growth rate",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "enum": list(OUTPUT_FORMATS),
+                        "description": "'text' (default) or 'json' for the full counters"
+                    }
+                }
+            }
+        ),
         types.Tool(
             name="get_plans_index",
             description="Get the master index of all plans",
@@ -117,24 +516,78 @@ async def handle_list_tools() -> List[types.Tool]:
                     "tags": {
                         "type": "array",
                         "items": {"type": "string"},
-                        "description": "Optional tags to filter by"
-                    }
+                        "description": "Optional frontmatter tags; only plans carrying any of them match"
+                    },
+                    "project": {
+                        "type": "string",
+                        "description": "Optional project name; only its plans match"
+                    },
+                    "match": {
+                        "type": "string",
+                        "enum": ["phrase", "all", "any"],
+                        "description": "How to combine query terms: 'phrase' matches the whole query (default), 'all'/'any' require every/some term or quoted phrase"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": MAX_SEARCH_LIMIT,
+                        "description": f"Maximum number of ranked results to return (default {DEFAULT_SEARCH_LIMIT}, at most {MAX_SEARCH_LIMIT})"
+                    },
+                    **_FILTER_PROPERTIES,
+                    **_PAGING_PROPERTIES
                 },
                 "required": ["query"]
             }
         )
     ]
+    for tool in tools:
+        tool.inputSchema["properties"]["debug_profile"] = _DEBUG_PROFILE_PROPERTY
+    return tools
 
-@server.call_tool()
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
-    """Handle tool calls."""
-    global plan_manager
+    """Handle tool calls, recording metrics and profiling them on request."""
+    call = metrics.begin(name)
+    try:
+        profile = profiler.start(bool(arguments.get("debug_profile")))
+        if profile is None:
+            return await _dispatch_tool(name, arguments, call)
+        return await _profiled_call(profile, name, arguments, call)
+    finally:
+        metrics.end(call)
+
+
+async def _profiled_call(profile, name: str, arguments: Dict[str, Any],
+                         call) -> List[types.TextContent]:
+    """Run a tool call under ``profile`` and save the profile."""
+    token = profiler.activate(profile)
+    try:
+        result = await _dispatch_tool(name, arguments, call)
+    finally:
+        profiler.deactivate(token)
     
-    # Initialize plan manager if not already done
     if plan_manager is None:
-        plan_manager = PlanManager()
+        return result
+    try:
+        path, summary = await _run_blocking(profiler.save, profile, plan_manager.plans_dir, name)
+    except Exception as e:
+        logger.error(f"Error saving profile of {name}: {str(e)}")
+        return result
     
+    if arguments.get("debug_profile"):
+        relative_path = path.relative_to(plan_manager.plans_dir)
+        result = result + [types.TextContent(
+            type="text",
+            text=f"🔬 Profile saved to {relative_path}\n\n```\n{summary}\n```"
+        )]
+    return result
+
+
+async def _dispatch_tool(name: str, arguments: Dict[str, Any], call) -> List[types.TextContent]:
+    """Run a tool call."""
     try:
+        # Initialize plan manager if not already done
+        plan_manager = await _run_blocking(_get_plan_manager)
+        
         if name == "save_plan":
             plan_content = arguments.get("plan_content", "")
             project_name = arguments.get("project_name")
@@ -146,28 +599,112 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
                 )]
             
             # Save the plan
-            saved_path = plan_manager.save_plan_as_md(plan_content, project_name)
+            merge_similar = arguments.get("merge_similar")
+            saved = await _run_blocking(
+                plan_manager.save_plan, plan_content, project_name,
+                None if merge_similar is None else bool(merge_similar)
+            )
+            saved_path = saved['path']
+            if plan_manager.index_dirty:
+                index_writer.mark_dirty()
             
             # Get relative path for display
             relative_path = saved_path.relative_to(plan_manager.plans_dir)
             
             result = f"✅ Plan saved successfully!\n\n"
             result += f"📁 Location: {relative_path}\n"
-            result += f"🔗 Project: {saved_path.parent.name}\n"
+            result += f"🔗 Project: {plan_manager.layout.parse(plan_manager.projects_dir, saved_path)[0]}\n"
             result += f"📅 Date: {saved_path.name.split('_')[0]}\n\n"
+            if saved['merged_into']:
+                merged = saved['merged_into']
+                result += f"🔀 Merged into project {merged['project']}: {merged['similarity']:.0%} similar to {merged['filename']}\n\n"
+            if saved['similar']:
+                result += f"⚠️ Near-duplicates in other projects:\n"
+                for match in saved['similar']:
+                    result += f"• **{match['project']}** - {match['filename']} ({match['similarity']:.0%} similar)\n"
+                result += "\n"
             result += f"View all plans: check the Plans/index.md file"
             
             return [types.TextContent(type="text", text=result)]
         
+        elif name == "save_plans":
+            items = arguments.get("plans") or []
+            
+            if not items:
+                return [types.TextContent(
+                    type="text",
+                    text="Error: plans cannot be empty"
+                )]
+            
+            pairs = [(item.get("plan_content", ""), item.get("project_name")) for item in items]
+            results = await _run_blocking(plan_manager.save_plans, pairs)
+            if plan_manager.index_dirty:
+                index_writer.mark_dirty()
+            
+            saved = sum(1 for r in results if r['ok'])
+            result = f"📦 Saved {saved} of {len(results)} plan(s):\n\n"
+            for i, r in enumerate(results):
+                if r['ok']:
+                    result += f"{i + 1}. ✅ {r['path'].relative_to(plan_manager.plans_dir)}\n"
+                    if r['merged_into']:
+                        result += f"   🔀 Merged into project {r['merged_into']['project']}\n"
+                    if r['similar']:
+                        duplicates = ", ".join(
+                            f"{match['project']}/{match['filename']} ({match['similarity']:.0%})"
+                            for match in r['similar']
+                        )
+                        result += f"   ⚠️ Near-duplicates: {duplicates}\n"
+                else:
+                    result += f"{i + 1}. ❌ {r['error']}\n"
+            
+            return [types.TextContent(type="text", text=result)]
+        
         elif name == "list_plans":
             project_filter = arguments.get("project_filter")
-            plans = plan_manager.list_plans()
+            tags_filter = arguments.get("tags") or None
+            status_filter = arguments.get("status") or None
+            since = arguments.get("since") or None
+            until = arguments.get("until") or None
+            limit = _parse_limit(arguments.get("limit"), DEFAULT_LIST_LIMIT, MAX_LIST_LIMIT)
+            output_format = arguments.get("format", "text")
+            if output_format not in OUTPUT_FORMATS:
+                raise ValueError(f"Unknown format: {output_format}")
             
-            if project_filter:
-                plans = [p for p in plans if p['project'] == project_filter]
+            if limit is None:
+                return [types.TextContent(
+                    type="text",
+                    text=f"Error: limit must be an integer from 1 to {MAX_LIST_LIMIT}"
+                )]
+            
+            # Fetch one extra plan to learn whether another page follows
+            plans = await _run_blocking(
+                plan_manager.list_plans, project_filter or None, tags_filter,
+                limit + 1, arguments.get("cursor") or None, status_filter, since, until
+            )
+            plans, next_cursor = _paginate(plans, limit)
+            
+            if output_format == "json":
+                items = [
+                    {
+                        "project": plan['project'],
+                        "filename": plan['filename'],
+                        "path": str(plan['path'].relative_to(plan_manager.plans_dir)),
+                        "mtime": plan['date']
+                    }
+                    for plan in plans
+                ]
+                return [types.TextContent(type="text", text=_json_page("plans", items, next_cursor))]
             
             if not plans:
                 filter_text = f" for project '{project_filter}'" if project_filter else ""
+                if tags_filter:
+                    filter_text += f" tagged {', '.join(tags_filter)}"
+                if status_filter:
+                    filter_text += f" with status '{status_filter}'"
+                if since:
+                    filter_text += f" since {since}"
+                if until:
+                    filter_text += f" until {until}"
                 return [types.TextContent(
                     type="text", 
                     text=f"No plans found{filter_text}"
@@ -177,6 +714,8 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
             for plan in plans:
                 result += f"• **{plan['project']}** - {plan['filename']}\n"
                 result += f"  📁 {plan['path'].relative_to(plan_manager.plans_dir)}\n\n"
+            if next_cursor:
+                result += f"➡️ More plans available, pass cursor: {next_cursor}\n"
             
             return [types.TextContent(type="text", text=result)]
         
@@ -190,7 +729,12 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
                     text="Error: project_name is required"
                 )]
             
-            content = plan_manager.get_plan_content(project_name, filename)
+            content = await _run_blocking(
+                plan_manager.get_plan_content, project_name, filename
+            )
+            
+            if content is not None and arguments.get("materialize", False):
+                await _run_blocking(plan_manager.materialize_plan, project_name, filename)
             
             if content is None:
                 return [types.TextContent(
@@ -200,20 +744,139 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
             
             return [types.TextContent(type="text", text=content)]
         
-        elif name == "get_plans_index":
-            if plan_manager.index_file.exists():
-                with open(plan_manager.index_file, 'r', encoding='utf-8') as f:
-                    index_content = f.read()
-                return [types.TextContent(type="text", text=index_content)]
-            else:
+        elif name == "get_plan_version":
+            project_name = arguments.get("project_name", "")
+            version = arguments.get("version")
+            
+            if not project_name or version is None:
+                return [types.TextContent(
+                    type="text",
+                    text="Error: project_name and version are required"
+                )]
+            
+            content = await _run_blocking(
+                plan_manager.get_plan_version, project_name, int(version)
+            )
+            
+            if content is None:
                 return [types.TextContent(
                     type="text",
-                    text="Plans index not found. Create your first plan to initialize the index."
+                    text=f"Version {version} not found for project '{project_name}'"
                 )]
+            
+            return [types.TextContent(type="text", text=content)]
+        
+        elif name == "diff_plans":
+            project_name = arguments.get("project_name", "")
+            from_version = arguments.get("from_version")
+            to_version = arguments.get("to_version")
+            
+            if not project_name:
+                return [types.TextContent(
+                    type="text",
+                    text="Error: project_name is required"
+                )]
+            
+            diff = await _run_blocking(
+                plan_manager.diff_plans, project_name,
+                None if from_version is None else int(from_version),
+                None if to_version is None else int(to_version)
+            )
+            
+            if diff is None:
+                return [types.TextContent(
+                    type="text",
+                    text=f"Versions not found for project '{project_name}'"
+                )]
+            
+            return [types.TextContent(type="text", text=diff or "No differences")]
+        
+        elif name == "find_similar_plans":
+            plan_content = arguments.get("plan_content")
+            project_name = arguments.get("project_name")
+            threshold = arguments.get("threshold")
+            limit = max(1, int(arguments.get("limit") or 10))
+            
+            if not plan_content and not project_name:
+                return [types.TextContent(
+                    type="text",
+                    text="Error: plan_content or project_name is required"
+                )]
+            
+            matches = await _run_blocking(
+                plan_manager.find_similar_plans, plan_content or None, project_name,
+                arguments.get("filename"), None if threshold is None else float(threshold), limit
+            )
+            
+            if matches is None:
+                return [types.TextContent(
+                    type="text",
+                    text=f"Plan not found for project '{project_name}'"
+                )]
+            if not matches:
+                return [types.TextContent(type="text", text="No similar plans found")]
+            
+            result = f"🧬 {len(matches)} similar plan(s):\n\n"
+            for plan in matches:
+                result += f"• **{plan['project']}** - {plan['filename']} ({plan['similarity']:.0%} similar)\n"
+                result += f"  📁 {plan['path'].relative_to(plan_manager.plans_dir)}\n\n"
+            
+            return [types.TextContent(type="text", text=result)]
+        
+        elif name == "related_plans":
+            plan_content = arguments.get("plan_content")
+            project_name = arguments.get("project_name")
+            limit = max(1, int(arguments.get("limit") or 10))
+            
+            if not plan_content and not project_name:
+                return [types.TextContent(
+                    type="text",
+                    text="Error: plan_content or project_name is required"
+                )]
+            
+            related = await _run_blocking(
+                plan_manager.related_plans, plan_content or None, project_name,
+                arguments.get("filename"), limit, bool(arguments.get("include_same_project"))
+            )
+            
+            if related is None:
+                return [types.TextContent(
+                    type="text",
+                    text=f"Plan not found for project '{project_name}'"
+                )]
+            if not related:
+                return [types.TextContent(type="text", text="No related plans found")]
+            
+            result = f"🧭 {len(related)} related plan(s):\n\n"
+            for plan in related:
+                result += f"• **{plan['project']}** - {plan['filename']} (score {plan['score']:.2f})\n"
+                result += f"  📁 {plan['path'].relative_to(plan_manager.plans_dir)}\n\n"
+            
+            return [types.TextContent(type="text", text=result)]
+        
+        elif name == "get_plan_stats":
+            output_format = arguments.get("format", "text")
+            if output_format not in OUTPUT_FORMATS:
+                raise ValueError(f"Unknown format: {output_format}")
+            
+            stats = await _run_blocking(plan_manager.plan_stats)
+            if output_format == "json":
+                return [types.TextContent(type="text", text=_json_stats(stats))]
+            return [types.TextContent(type="text", text=_render_stats(stats))]
+        
+        elif name == "get_plans_index":
+            # Render from the catalog so pending background writes are included
+            index_content = await _run_blocking(plan_manager.render_index)
+            return [types.TextContent(type="text", text=index_content)]
         
         elif name == "search_plans":
             query = arguments.get("query", "").lower()
             tags_filter = arguments.get("tags", [])
+            match = arguments.get("match", "phrase")
+            limit = _parse_limit(arguments.get("limit"), DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+            output_format = arguments.get("format", "text")
+            if output_format not in OUTPUT_FORMATS:
+                raise ValueError(f"Unknown format: {output_format}")
             
             if not query:
                 return [types.TextContent(
@@ -221,16 +884,37 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
                     text="Error: search query is required"
                 )]
             
-            # Get all plans and search through them
-            plans = plan_manager.list_plans()
-            matching_plans = []
+            if limit is None:
+                return [types.TextContent(
+                    type="text",
+                    text=f"Error: limit must be an integer from 1 to {MAX_SEARCH_LIMIT}"
+                )]
             
-            for plan in plans:
-                content = plan_manager.get_plan_content(plan['project'], plan['filename'])
-                if content and query in content.lower():
-                    # Basic tag filtering (would need more sophisticated implementation)
-                    if not tags_filter or any(tag.lower() in content.lower() for tag in tags_filter):
-                        matching_plans.append(plan)
+            # Answer from the inverted index instead of reading every plan
+            matching_plans = await _run_blocking(
+                plan_manager.search_plans, query, tags_filter, match, limit + 1,
+                snippets=True, cursor=arguments.get("cursor") or None,
+                project_name=arguments.get("project") or None,
+                status=arguments.get("status") or None,
+                since=arguments.get("since") or None,
+                until=arguments.get("until") or None,
+                cancellable=True
+            )
+            matching_plans, next_cursor = _paginate(matching_plans, limit)
+            
+            if output_format == "json":
+                items = [
+                    {
+                        "project": plan['project'],
+                        "filename": plan['filename'],
+                        "path": str(plan['path'].relative_to(plan_manager.plans_dir)),
+                        "mtime": plan['date'],
+                        "score": round(plan['score'], 4),
+                        "snippet": plan['snippet']
+                    }
+                    for plan in matching_plans
+                ]
+                return [types.TextContent(type="text", text=_json_page("results", items, next_cursor))]
             
             if not matching_plans:
                 return [types.TextContent(
@@ -238,46 +922,215 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
                     text=f"No plans found matching query: '{query}'"
                 )]
             
-            result = f"🔍 Found {len(matching_plans)} plan(s) matching '{query}':\n\n"
+            result = f"🔍 Top {len(matching_plans)} plan(s) matching '{query}':\n\n"
             for plan in matching_plans:
-                result += f"• **{plan['project']}** - {plan['filename']}\n"
-                result += f"  📁 {plan['path'].relative_to(plan_manager.plans_dir)}\n\n"
+                result += f"• **{plan['project']}** - {plan['filename']} (score {plan['score']:.2f})\n"
+                result += f"  📁 {plan['path'].relative_to(plan_manager.plans_dir)}\n"
+                if plan['snippet']:
+                    result += f"  💬 {plan['snippet']}\n"
+                result += "\n"
+            if next_cursor:
+                result += f"➡️ More results available, pass cursor: {next_cursor}\n"
             
             return [types.TextContent(type="text", text=result)]
         
         else:
+            # Keep arbitrary names out of the metrics labels
+            call.tool = "unknown"
+            call.failed = True
             return [types.TextContent(
                 type="text",
                 text=f"Unknown tool: {name}"
             )]
     
     except Exception as e:
+        call.failed = True
         logger.error(f"Error in tool {name}: {str(e)}")
         return [types.TextContent(
             type="text",
             text=f"Error executing {name}: {str(e)}"
         )]
 
+# Resources exposing the server's own metrics and the store's statistics
+METRICS_URI = "plans://metrics"
+METRICS_PROMETHEUS_URI = "plans://metrics/prometheus"
+STATS_URI = "plans://stats"
+
+# Largest groups listed per section by get_plan_stats in text form
+STATS_TEXT_ROWS = 10
+
+
+def _json_stats(stats: Dict[str, Any]) -> str:
+    """Serialize plan_stats() as compact JSON."""
+    return json.dumps(stats, separators=(",", ":"), ensure_ascii=False)
+
+
+def _render_stats(stats: Dict[str, Any]) -> str:
+    """Render plan_stats() for reading, largest groups first."""
+    growth = stats['growth']
+    result = f"📊 {stats['plans']} plan(s), {stats['bytes']} bytes\n"
+    result += (f"📈 {growth['plans_per_day']:.2f} plans/day, {growth['bytes_per_day']:.0f} bytes/day"
+               f" since {growth['since']}\n")
+    sections = [
+        ("Projects", {key: counts['plans'] for key, counts in stats['projects'].items()}),
+        ("Statuses", {key or "(none)": counts['plans'] for key, counts in stats['statuses'].items()}),
+        ("Tags", stats['tags'])
+    ]
+    for title, counts in sections:
+        if not counts:
+            continue
+        result += f"\n**{title}**\n"
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        for key, plans in ranked[:STATS_TEXT_ROWS]:
+            result += f"• {key}: {plans}\n"
+        if len(ranked) > STATS_TEXT_ROWS:
+            result += f"• ... and {len(ranked) - STATS_TEXT_ROWS} more\n"
+    if stats['months']:
+        result += "\n**Months (UTC)**\n"
+        for month, counts in sorted(stats['months'].items())[-STATS_TEXT_ROWS:]:
+            result += f"• {month}: {counts['plans']} plan(s), {counts['bytes']} bytes\n"
+    return result
+
+
+def _cache_metrics() -> Dict[str, Any]:
+    """Return content cache statistics, if the plan manager is up."""
+    if plan_manager is None:
+        return {}
+    return plan_manager.content_cache.stats()
+
+
+async def handle_list_resources() -> List[types.Resource]:
+    """List available resources."""
+    return [
+        types.Resource(
+            uri=METRICS_URI,
+            name="Plans server metrics",
+            description="Per-tool call counts, errors, latency histograms and I/O counters as JSON",
+            mimeType="application/json"
+        ),
+        types.Resource(
+            uri=METRICS_PROMETHEUS_URI,
+            name="Plans server metrics (Prometheus)",
+            description="The same metrics in the Prometheus text exposition format",
+            mimeType=PROMETHEUS_CONTENT_TYPE
+        ),
+        types.Resource(
+            uri=STATS_URI,
+            name="Plans statistics",
+            description="Plan counts and bytes per project, tag, status and month, plus growth rate, as JSON",
+            mimeType="application/json"
+        )
+    ]
+
+async def handle_read_resource(uri: Any) -> str:
+    """Read a resource."""
+    uri = str(uri)
+    cache = _cache_metrics()
+    
+    if uri == METRICS_URI:
+        return metrics.to_json({"content_cache": cache} if cache else None)
+    
+    if uri == METRICS_PROMETHEUS_URI:
+        extra = {}
+        if cache:
+            extra = {
+                "content_cache_hits_total": ("counter", "Content cache hits.", cache['hits']),
+                "content_cache_misses_total": ("counter", "Content cache misses.", cache['misses']),
+                "content_cache_evictions_total": ("counter", "Content cache evictions.", cache['evictions']),
+                "content_cache_entries": ("gauge", "Plans held in the content cache.", cache['entries']),
+                "content_cache_bytes": ("gauge", "Bytes held in the content cache.", cache['bytes'])
+            }
+        return metrics.to_prometheus(extra)
+    
+    if uri == STATS_URI:
+        manager = await _run_blocking(_get_plan_manager)
+        return _json_stats(await _run_blocking(manager.plan_stats))
+    
+    raise ValueError(f"Unknown resource: {uri}")
+
+def _warm_up():
+    """Open the Plans store and load its search index ahead of the first call."""
+    try:
+        _get_plan_manager().warm_up()
+    except Exception as e:
+        # The first tool call retries and reports the error to the client
+        logger.error(f"Error opening plans store: {str(e)}")
+
+def _start_watcher(loop: asyncio.AbstractEventLoop):
+    """Watch the Plans store for files changed outside the server (runs on a worker thread)."""
+    global plan_watcher
+    try:
+        from .watcher import PlanWatcher
+    except ImportError:
+        # For standalone execution
+        from watcher import PlanWatcher
+    
+    def index_changed():
+        # mark_dirty() must run on the event loop
+        if plan_manager.index_dirty:
+            loop.call_soon_threadsafe(index_writer.mark_dirty)
+    
+    try:
+        plan_watcher = PlanWatcher(
+            _get_plan_manager(), WATCH_MODE, interval=WATCH_INTERVAL, on_change=index_changed
+        )
+        plan_watcher.start()
+        logger.info(f"Watching plan files ({plan_watcher.mode})")
+    except Exception as e:
+        logger.error(f"Error starting plans watcher: {str(e)}")
+
+def _create_server() -> Server:
+    """Import the MCP SDK and register the handlers with a new server."""
+    from mcp.server import Server
+    
+    server = Server("plans-mcp-server")
+    server.list_tools()(handle_list_tools)
+    server.call_tool()(handle_call_tool)
+    server.list_resources()(handle_list_resources)
+    server.read_resource()(handle_read_resource)
+    return server
+
 async def main():
     """Run the server."""
+    import mcp.server.stdio
+    from mcp.server import NotificationOptions
+    from mcp.server.models import InitializationOptions
+    
+    logging.basicConfig(level=logging.INFO)
+    
+    server = _create_server()
+    
     # Server initialization options
     options = InitializationOptions(
         server_name="plans-mcp-server",
         server_version="1.0.0",
         capabilities=server.get_capabilities(
-            notification_options=None,
+            notification_options=NotificationOptions(),
             experimental_capabilities=None,
         )
     )
     
     logger.info("Starting Plans MCP Server...")
     
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            options,
-        )
+    # Opening the store runs in the background while the client connects, so
+    # the server answers the handshake without waiting for it
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(_executor, _warm_up)
+    if WATCH_MODE not in ("", "off", "0", "false", "no"):
+        loop.run_in_executor(_executor, _start_watcher, loop)
+    
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                options,
+            )
+    finally:
+        if plan_watcher is not None:
+            await loop.run_in_executor(None, plan_watcher.stop)
+        await index_writer.flush()
+        _executor.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Plans Similarity Index
+
+Finds near-duplicate plans without comparing against every stored plan. Each
+plan is reduced to a MinHash signature of its word 3-shingles, so the
+fraction of equal signature slots estimates the Jaccard similarity of two
+plans. The signature is cut into BANDS bands of ROWS slots. Plans that
+share any whole band land in the same bucket of the LSH table, and only
+those candidates are compared. A query therefore costs one signature plus
+a few bucket lookups, whatever the size of the corpus. A pair with
+similarity 0.8 shares a band with probability above 0.99, and a pair
+with similarity 0.6 with probability about 0.8.
+
+Signatures use one-permutation hashing: every shingle is hashed once, and
+its hash picks both a slot and a value. Slots no shingle fell into borrow
+the value of the next filled slot (rotation densification). A signature
+therefore costs one hash per shingle instead of one per shingle and slot.
+
+The index is persisted as an append-only log, ``similarity.log``, of added
+and removed signatures. It is replayed on load and rewritten in compacted
+form once most of its lines are obsolete. Several processes can share
+the log: appends take a file lock, and readers replay lines appended by
+others before answering.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .fileio import FileLock, atomic_write
+    from .metrics import record_read, record_write
+except ImportError:
+    # For standalone execution
+    from fileio import FileLock, atomic_write
+    from metrics import record_read, record_write
+
+# Words per shingle
+SHINGLE_WORDS = 3
+
+# LSH banding; a signature has BANDS * ROWS slots
+BANDS = 20
+ROWS = 5
+NUM_SLOTS = BANDS * ROWS
+
+# Similarity at or above which a saved plan is reported as a near-duplicate
+DEFAULT_THRESHOLD = 0.8
+
+# Obsolete log lines tolerated before the log is rewritten
+COMPACT_THRESHOLD = 500
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Odd 32-bit constant spreading borrowed slot values (golden ratio)
+_ROTATION = 0x9E3779B9
+
+
+def strip_frontmatter(text: str) -> str:
+    """Strip a leading frontmatter block."""
+    if text.startswith("---\n"):
+        end = text.find("\n---", 4)
+        if end != -1:
+            return text[end + 4:]
+    return text
+
+
+def shingles(text: str) -> Set[str]:
+    """Return the lowercased word shingles of a plan, ignoring its frontmatter."""
+    words = _WORD_PATTERN.findall(strip_frontmatter(text).lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(text: str) -> Optional[array]:
+    """Return the MinHash signature of a plan, or None if it has no words."""
+    slots = [None] * NUM_SLOTS
+    for shingle in shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        slot, value = (h >> 32) % NUM_SLOTS, h & 0xFFFFFFFF
+        if slots[slot] is None or value < slots[slot]:
+            slots[slot] = value
+    filled = [i for i, value in enumerate(slots) if value is not None]
+    if not filled:
+        return None
+
+    result = array('I', bytes(4 * NUM_SLOTS))
+    # Walk backwards so every empty slot knows the next filled one to its right
+    next_filled = filled[0] + NUM_SLOTS
+    for i in range(NUM_SLOTS - 1, -1, -1):
+        if slots[i] is not None:
+            result[i] = slots[i]
+            next_filled = i
+        else:
+            distance = next_filled - i
+            result[i] = (slots[next_filled % NUM_SLOTS] + distance * _ROTATION) & 0xFFFFFFFF
+    return result
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimate the Jaccard similarity of two plans from their signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_SLOTS
+
+
+def _band_keys(sig: array) -> List[int]:
+    # Hashes of int tuples do not depend on PYTHONHASHSEED
+    return [hash((band,) + tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def _key(project: str, filename: str) -> str:
+    return f"{project}/{filename}"
+
+
+class SimilarityIndex:
+    """MinHash signatures of all plans with an LSH table over their bands."""
+
+    def __init__(self, path: Path):
+        """Persist the index at ``path``; the lock file sits next to it."""
+        self.path = Path(path)
+        self._file_lock = FileLock(self.path.with_suffix(".lock"))
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        # Doc key -> (project, filename, signature)
+        self._docs: Dict[str, Tuple[str, str, array]] = {}
+        # Band hash -> doc keys
+        self._buckets: Dict[int, List[str]] = {}
+        self._ident: Optional[Tuple[int, int]] = None
+        self._parsed = 0
+        self._lines = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load_or_build(self, documents: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        """Load the persisted index, or build it from ``documents()`` if absent."""
+        with self._lock:
+            if not self.exists():
+                with self._file_lock:
+                    # Another process may have built it while we waited
+                    if not self.exists():
+                        self._rebuild(documents())
+                        return
+            self._refresh()
+
+    def _refresh(self):
+        """Replay log lines appended since the last call, reloading if the log was replaced."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            if self._ident is not None:
+                self._reset()
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            ident = (stat.st_dev, stat.st_ino)
+            if ident != self._ident or stat.st_size < self._parsed:
+                # Compacted or rebuilt by another process
+                self._reset()
+                self._ident = ident
+            if stat.st_size == self._parsed:
+                return
+            f.seek(self._parsed)
+            data = f.read()
+        record_read(len(data))
+
+        # Only consume complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line from an interrupted write
+                continue
+            self._apply(entry)
+            self._lines += 1
+        self._parsed += end
+
+    def _apply(self, entry: Dict):
+        key = _key(entry["project"], entry["filename"])
+        self._drop(key)
+        if entry["op"] != "add":
+            return
+        sig = array('I')
+        sig.frombytes(base64.b64decode(entry["sig"]))
+        self._docs[key] = (entry["project"], entry["filename"], sig)
+        for band_key in _band_keys(sig):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def _drop(self, key: str):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for band_key in _band_keys(doc[2]):
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                continue
+            bucket.remove(key)
+            if not bucket:
+                del self._buckets[band_key]
+
+    @staticmethod
+    def _add_entry(project: str, filename: str, sig: array) -> Dict:
+        return {"op": "add", "project": project, "filename": filename,
+                "sig": base64.b64encode(sig.tobytes()).decode('ascii')}
+
+    @staticmethod
+    def _encode(entries: List[Dict]) -> bytes:
+        return "".join(json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + "\n"
+                       for entry in entries).encode('utf-8')
+
+    def _commit(self, entries: List[Dict]):
+        """Apply entries and append them to the log under the file lock."""
+        if not entries:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._file_lock:
+            self._refresh()
+            data = self._encode(entries)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size != self._parsed:
+                    # Terminate a torn line left by an interrupted write
+                    data = b"\n" + data
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            record_write(len(data))
+            # Our own lines are applied by replaying them
+            self._refresh()
+            if self._lines - len(self._docs) > max(COMPACT_THRESHOLD, len(self._docs)):
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the log with one line per live signature (caller holds both locks)."""
+        entries = [self._add_entry(project, filename, sig) for project, filename, sig in self._docs.values()]
+        atomic_write(self.path, self._encode(entries))
+        self._reset()
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def add_documents(self, documents: Iterable[Tuple[str, str, str, float]]):
+        """Index (or re-index) plans given as (project, filename, content, mtime)."""
+        entries = []
+        for project, filename, content, _ in documents:
+            sig = signature(content)
+            if sig is None:
+                entries.append({"op": "remove", "project": project, "filename": filename})
+            else:
+                entries.append(self._add_entry(project, filename, sig))
+        self._commit(entries)
+
+    def remove_documents(self, plans: Iterable[Tuple[str, str]]):
+        """Drop plans from the index."""
+        self._commit([{"op": "remove", "project": project, "filename": filename}
+                      for project, filename in plans])
+
+    def rebuild(self, documents: Iterable[Tuple[str, str, str, float]]):
+        """Replace the whole index with the given documents and persist it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._file_lock:
+            self._rebuild(documents)
+
+    def _rebuild(self, documents: Iterable[Tuple[str, str, str, float]]):
+        entries = []
+        for project, filename, content, _ in documents:
+            sig = signature(content)
+            if sig is not None:
+                entries.append(self._add_entry(project, filename, sig))
+        atomic_write(self.path, self._encode(entries))
+        self._reset()
+        self._refresh()
+
+    def query(self, content: str, threshold: float = DEFAULT_THRESHOLD,
+              limit: Optional[int] = None) -> List[Dict]:
+        """
+        Find indexed plans similar to ``content``.
+
+        Returns:
+            Dicts with 'project', 'filename' and 'similarity' (estimated
+            Jaccard similarity of their shingles), most similar first
+        """
+        sig = signature(content)
+        if sig is None:
+            return []
+        return self._query(sig, threshold, limit)
+
+    def similar_to(self, project: str, filename: str, threshold: float = DEFAULT_THRESHOLD,
+                   limit: Optional[int] = None) -> Optional[List[Dict]]:
+        """Like query(), for an indexed plan; None if the plan is not indexed."""
+        with self._lock:
+            self._refresh()
+            doc = self._docs.get(_key(project, filename))
+        if doc is None:
+            return None
+        return self._query(doc[2], threshold, limit, exclude=_key(project, filename))
+
+    def _query(self, sig: array, threshold: float, limit: Optional[int],
+               exclude: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            self._refresh()
+            candidates = set()
+            for band_key in _band_keys(sig):
+                candidates.update(self._buckets.get(band_key, ()))
+            candidates.discard(exclude)
+            matches = []
+            for key in candidates:
+                project, filename, other = self._docs[key]
+                score = similarity(sig, other)
+                if score >= threshold:
+                    matches.append({'project': project, 'filename': filename, 'similarity': score})
+        matches.sort(key=lambda match: (-match['similarity'], match['project'], match['filename']))
+        return matches[:limit] if limit is not None else matches
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Plans Tag Classifier
+
+Assigns tags to a plan from keyword rules. All keywords of all rules are
+compiled into one Aho-Corasick automaton, so a plan is classified in a
+single linear pass over its text however many rules there are. Keywords
+only match on word boundaries: "ai" does not match "maintain".
+
+Rules are loaded from a JSON file mapping each tag to its keywords:
+
+    {
+        "web": ["web", "website"],
+        "ai": ["ai", "machine learning"]
+    }
+"""
+
+import json
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+try:
+    from .fileio import atomic_write
+except ImportError:
+    # For standalone execution
+    from fileio import atomic_write
+
+# Used when no rules file exists yet; written out so it can be edited
+DEFAULT_RULES: Dict[str, List[str]] = {
+    "web": ["web", "website"],
+    "api": ["api"],
+    "database": ["database"],
+    "ai": ["ai", "machine learning"],
+    "react": ["react"],
+    "python": ["python"],
+    "javascript": ["typescript", "javascript"],
+}
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class TagClassifier:
+    """Multi-pattern keyword matcher that maps plan text to tags."""
+
+    def __init__(self, rules: Dict[str, List[str]]):
+        """Compile ``rules`` (tag -> keywords) into an automaton."""
+        self.rules = rules
+        self._tag_order = {tag: i for i, tag in enumerate(rules)}
+        # Trie nodes: child transitions, failure link, and the
+        # (keyword length, tag) pairs that end at the node
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+
+        for tag, keywords in rules.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword:
+                    self._insert(keyword, tag)
+        self._link()
+
+    @classmethod
+    def from_file(cls, rules_path: Path) -> "TagClassifier":
+        """Load rules from ``rules_path``, creating it with the defaults if absent."""
+        rules_path = Path(rules_path)
+        if not rules_path.exists():
+            # Atomic, so a server starting alongside never reads a partial file
+            atomic_write(rules_path, json.dumps(DEFAULT_RULES, indent=2))
+            return cls(DEFAULT_RULES)
+
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        if not isinstance(rules, dict):
+            raise ValueError(f"Tag rules in {rules_path} must map tags to keyword lists")
+        for tag, keywords in rules.items():
+            # A bare string would otherwise be matched one character at a time
+            if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+                raise ValueError(
+                    f"Tag rule {tag!r} in {rules_path} must be a list of keyword strings"
+                )
+        return cls(rules)
+
+    def _insert(self, keyword: str, tag: str):
+        node = 0
+        for ch in keyword:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][ch] = child
+            node = child
+        self._out[node].append((len(keyword), tag))
+
+    def _link(self):
+        """Compute failure links breadth-first and merge outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def classify(self, text: str) -> List[str]:
+        """Return the tags whose keywords occur in ``text``, in rule order."""
+        text = text.lower()
+        found = set()
+        node = 0
+        length = len(text)
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for keyword_length, tag in self._out[node]:
+                if tag in found:
+                    continue
+                start = i - keyword_length + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if i + 1 < length and _is_word_char(text[i + 1]):
+                    continue
+                found.add(tag)
+            if len(found) == len(self._tag_order):
+                break
+        return sorted(found, key=self._tag_order.__getitem__)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Plans Version History
+
+A compact, append-only record of every saved plan version. Each project has
+a log under ``history/<project>.log``. Every line holds one version: either
+its full text, or a line-level delta against the version logged just before
+it. A full snapshot is written at least every SNAPSHOT_INTERVAL versions, and
+whenever a delta would not be much smaller than the text. Reading any
+version therefore applies at most SNAPSHOT_INTERVAL - 1 deltas.
+
+Entries are found by plan filename. Deltas point at their base by byte
+offset, so an entry never changes meaning once written. Reconstructed texts
+are kept in a small LRU cache, and a reconstruction stops at the first
+cached ancestor. Reading consecutive versions therefore costs one delta
+each.
+
+In a store that keeps plan bodies as content-addressed objects (see
+object_store), a snapshot whose text ends with a stored body logs only the
+rest of the text and the body's digest. Identical bodies saved to many
+projects are then stored once, not once per project log.
+
+Delta format: a JSON list whose items are either ``[start, end]``, meaning
+"copy lines start..end of the base", or a string of inserted text.
+
+Several processes can share the logs. Appends take a file lock, and readers
+pick up lines appended by others before answering.
+"""
+
+import difflib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .fileio import FileLock
+    from .metrics import record_read, record_write
+    from .object_store import ObjectStore
+except ImportError:
+    # For standalone execution
+    from fileio import FileLock
+    from metrics import record_read, record_write
+    from object_store import ObjectStore
+
+# Maximum delta chain length; every SNAPSHOT_INTERVAL-th entry is a full text
+SNAPSHOT_INTERVAL = 16
+
+# Reconstructed versions kept in memory
+CACHE_ENTRIES = 128
+
+
+def make_delta(base: str, text: str) -> List:
+    """Encode ``text`` as line copies from ``base`` plus inserted text."""
+    a = base.splitlines(keepends=True)
+    b = text.splitlines(keepends=True)
+    ops: List = []
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            inserted = "".join(b[j1:j2])
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += inserted
+            else:
+                ops.append(inserted)
+    return ops
+
+
+def apply_delta(base: str, ops: List) -> str:
+    """Rebuild the text a delta from make_delta() encodes."""
+    lines = base.splitlines(keepends=True)
+    return "".join(
+        op if isinstance(op, str) else "".join(lines[op[0]:op[1]])
+        for op in ops
+    )
+
+
+class _ProjectLog:
+    """In-memory offset table of one project's log."""
+
+    __slots__ = ("ident", "parsed", "files", "head", "head_depth")
+
+    def __init__(self):
+        self.ident: Optional[Tuple[int, int]] = None
+        # Bytes of the log read so far
+        self.parsed = 0
+        # Filename -> offset of its newest entry, in log order
+        self.files: "OrderedDict[str, int]" = OrderedDict()
+        # Offset and chain depth of the last entry
+        self.head: Optional[int] = None
+        self.head_depth = 0
+
+
+class VersionHistory:
+    """Per-project logs of plan versions, stored as snapshots and deltas."""
+
+    def __init__(self, root: Path, cache_entries: int = CACHE_ENTRIES,
+                 objects: Optional[ObjectStore] = None):
+        """
+        Keep the logs under ``root``; it is created on first write.
+
+        Args:
+            objects: Store holding the bodies that snapshots may refer to
+        """
+        self.root = Path(root)
+        self.objects = objects
+        self._logs: Dict[str, _ProjectLog] = {}
+        self._cache: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._cache_entries = cache_entries
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(self.root / "history.lock")
+
+    def _log_path(self, project: str) -> Path:
+        return self.root / f"{project}.log"
+
+    def _refresh(self, project: str) -> _ProjectLog:
+        """Bring the offset table of ``project`` up to date with its log."""
+        log = self._logs.get(project)
+        if log is None:
+            log = self._logs[project] = _ProjectLog()
+        try:
+            f = open(self._log_path(project), 'rb')
+        except FileNotFoundError:
+            if log.ident is not None:
+                self._logs[project] = log = _ProjectLog()
+            return log
+        with f:
+            stat = os.fstat(f.fileno())
+            ident = (stat.st_dev, stat.st_ino)
+            if ident != log.ident or stat.st_size < log.parsed:
+                # Replaced or truncated behind our back; start over
+                self._logs[project] = log = _ProjectLog()
+                log.ident = ident
+            if stat.st_size == log.parsed:
+                return log
+            f.seek(log.parsed)
+            data = f.read()
+        record_read(len(data))
+
+        # Only consume complete lines; a writer may be mid-append
+        offset = log.parsed
+        for line in data[:data.rfind(b"\n") + 1].splitlines(keepends=True):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn line from an interrupted write
+                entry = None
+            if isinstance(entry, dict) and "f" in entry:
+                log.files.pop(entry["f"], None)
+                log.files[entry["f"]] = offset
+                log.head = offset
+                log.head_depth = entry.get("d", 0)
+            offset += len(line)
+        log.parsed = offset
+        return log
+
+    def _read_entry(self, f, offset: int) -> Dict:
+        f.seek(offset)
+        line = f.readline()
+        record_read(len(line))
+        return json.loads(line)
+
+    def _cache_get(self, key: Tuple[str, int]) -> Optional[str]:
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+        return text
+
+    def _cache_put(self, key: Tuple[str, int], text: str):
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_entries:
+            self._cache.popitem(last=False)
+
+    def _text_at(self, project: str, offset: int) -> str:
+        """Reconstruct the version stored at ``offset`` of a project's log."""
+        cached = self._cache_get((project, offset))
+        if cached is not None:
+            return cached
+
+        # Walk back to a full snapshot or a cached ancestor
+        chain: List[Tuple[int, List]] = []
+        with open(self._log_path(project), 'rb') as f:
+            while True:
+                entry = self._read_entry(f, offset)
+                if "text" in entry:
+                    text = entry["text"]
+                    if "blob" in entry:
+                        body = self.objects.get(entry["blob"]) if self.objects is not None else None
+                        if body is None:
+                            raise ValueError(f"Missing object {entry['blob']} for {project}/{entry['f']}")
+                        text += body
+                    break
+                chain.append((offset, entry["ops"]))
+                offset = entry["base"]
+                text = self._cache_get((project, offset))
+                if text is not None:
+                    break
+        self._cache_put((project, offset), text)
+
+        for offset, ops in reversed(chain):
+            text = apply_delta(text, ops)
+            self._cache_put((project, offset), text)
+        return text
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def append(self, versions: Iterable[Tuple[str, str, float, str]]):
+        """
+        Log saved plan versions.
+
+        Args:
+            versions: (project, filename, saved_at, content) tuples, optionally
+                followed by the body at the end of content when that body is
+                stored as an object
+        """
+        by_project: Dict[str, List[Tuple[str, float, str, Optional[str]]]] = {}
+        for project, filename, saved_at, content, *body in versions:
+            by_project.setdefault(project, []).append((filename, saved_at, content, body[0] if body else None))
+        if not by_project:
+            return
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._file_lock:
+            for project, items in by_project.items():
+                self._append_project(project, items)
+
+    def _append_project(self, project: str, items: List[Tuple[str, float, str, Optional[str]]]):
+        # Caller holds the file lock, so nobody else appends to the log meanwhile
+        log = self._refresh(project)
+        base = self._text_at(project, log.head) if log.head is not None else None
+        head, depth = log.head, log.head_depth
+
+        fd = os.open(self._log_path(project), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            data = bytearray()
+            offset = os.fstat(fd).st_size
+            if offset != log.parsed:
+                # Terminate a torn line left by an interrupted write
+                data += b"\n"
+                offset += 1
+            written = []
+            for filename, saved_at, content, body in items:
+                entry = {"f": filename, "t": saved_at}
+                ops = None
+                if base is not None and depth + 1 < SNAPSHOT_INTERVAL:
+                    ops = make_delta(base, content)
+                # A delta must save at least half of the text to be worth a longer chain
+                if ops is not None and len(json.dumps(ops, ensure_ascii=False)) < len(content) // 2:
+                    depth += 1
+                    entry.update(base=head, d=depth, ops=ops)
+                else:
+                    depth = 0
+                    entry["text"] = content
+                    if body and self.objects is not None and content.endswith(body):
+                        digest = self.objects.digest(body)
+                        if digest in self.objects:
+                            # The body is stored once, as an object
+                            entry.update(text=content[:len(content) - len(body)], blob=digest)
+                line = (json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + "\n").encode('utf-8')
+                written.append((offset, content))
+                data += line
+                head, base = offset, content
+                offset += len(line)
+            os.write(fd, bytes(data))
+        finally:
+            os.close(fd)
+        record_write(len(data))
+
+        for offset, content in written:
+            self._cache_put((project, offset), content)
+        self._refresh(project)
+
+    def get(self, project: str, filename: str) -> Optional[str]:
+        """Return the logged content of a plan version, or None if it was never logged."""
+        with self._lock:
+            offset = self._refresh(project).files.get(filename)
+            if offset is None:
+                return None
+            return self._text_at(project, offset)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        project, filename = key
+        with self._lock:
+            return filename in self._refresh(project).files
+
+    def projects(self) -> List[str]:
+        """Return the projects that have a log."""
+        return sorted(path.stem for path in self.root.glob("*.log"))
+
+    def entries(self, project: str) -> Iterator[Tuple[str, float]]:
+        """Yield (filename, saved_at) for every logged version of ``project``, oldest first."""
+        with self._lock:
+            offsets = list(self._refresh(project).files.values())
+        if not offsets:
+            return
+        with open(self._log_path(project), 'rb') as f:
+            for offset in offsets:
+                entry = self._read_entry(f, offset)
+                yield entry["f"], entry["t"]
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Plans Directory Watcher
+
+Keeps a PlanManager in sync with plan files that are created, edited, renamed
+or deleted outside of it: by hand, by a sync tool, or by git. Only the files
+that changed are read, and the catalog, search index, version history and
+content cache are updated with PlanManager.apply_file_changes().
+
+Two backends are available:
+
+    inotify   Linux kernel notifications, read through ctypes. Changes are
+              picked up as they happen and cost nothing while idle.
+    poll      A stat() of every plan file each interval, compared with the
+              catalog. Works everywhere, but costs O(plans) per interval.
+
+"auto" picks inotify where the platform supports it and poll otherwise.
+
+Events are coalesced: a batch is applied once no new event has arrived for
+``settle`` seconds. An editor's write-rename-chmod sequence therefore costs
+one read, and a save from another server process has normally been
+recorded by that process before the watcher looks at it. When events are
+lost (queue overflow) or a whole directory moves, the watcher falls back to
+one full scan.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Set
+
+if TYPE_CHECKING:
+    from plan_manager import PlanManager
+
+logger = logging.getLogger("plans-mcp-server")
+
+WATCH_MODES = ("auto", "inotify", "poll")
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+               | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+_EVENT = struct.Struct("iIII")
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    """Return libc if it provides inotify, else None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    return libc
+
+
+def _is_plan_name(name: str) -> bool:
+    # Temporary files from atomic writes start with a dot
+    return name.endswith(".md") and not name.startswith(".")
+
+
+class PlanWatcher:
+    """Background thread applying outside changes to plan files to a PlanManager."""
+
+    def __init__(self, manager: "PlanManager", mode: str = "auto", interval: float = 2.0,
+                 settle: float = 0.5, on_change: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            manager: The PlanManager to keep in sync
+            mode: One of WATCH_MODES
+            interval: Seconds between scans of the poll backend
+            settle: Quiet period before a batch of inotify events is applied
+            on_change: Called on the watcher thread after changes were applied
+
+        Raises:
+            ValueError: If ``mode`` is unknown, or is "inotify" where inotify
+                is not available
+        """
+        if mode not in WATCH_MODES:
+            raise ValueError(f"Unknown watch mode: {mode!r} (expected one of {', '.join(WATCH_MODES)})")
+        self._libc = _load_libc() if mode != "poll" else None
+        if mode == "inotify" and self._libc is None:
+            raise ValueError("inotify is not available on this platform")
+        self.mode = "inotify" if self._libc is not None else "poll"
+        self.manager = manager
+        self.interval = interval
+        self.settle = settle
+        self.on_change = on_change
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake_r: Optional[int] = None
+        self._wake_w: Optional[int] = None
+
+    def start(self):
+        """Catch up with changes made while nobody watched, then keep watching."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        if self.mode == "inotify":
+            self._wake_r, self._wake_w = os.pipe()
+            target = self._run_inotify
+        else:
+            target = self._run_poll
+        self._thread = threading.Thread(target=target, name="plans-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and wait for the thread to exit."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"\0")
+        self._thread.join()
+        self._thread = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None
+
+    def _apply(self, paths):
+        try:
+            if paths and self.manager.apply_file_changes(paths) and self.on_change is not None:
+                self.on_change()
+        except Exception as e:
+            # Keep watching; the next change or scan retries
+            logger.error(f"Error applying plan file changes: {str(e)}")
+
+    def _changed_files(self) -> Set[Path]:
+        """Compare the whole tree with the catalog; empty if the scan fails."""
+        try:
+            return set(self.manager.find_file_changes())
+        except Exception as e:
+            # A locked catalog or a file vanishing mid-walk; the next scan retries
+            logger.error(f"Error scanning plan files: {str(e)}")
+            return set()
+
+    def _scan(self):
+        self._apply(self._changed_files())
+
+    # ------------------------------------------------------------------
+    # Poll backend
+    # ------------------------------------------------------------------
+
+    def _run_poll(self):
+        self._scan()
+        while not self._stop.wait(self.interval):
+            self._scan()
+
+    # ------------------------------------------------------------------
+    # inotify backend
+    # ------------------------------------------------------------------
+
+    def _run_inotify(self):
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            logger.error(f"inotify_init1 failed ({os.strerror(errno)}); polling instead")
+            self.mode = "poll"
+            self._run_poll()
+            return
+        try:
+            self._watch_loop(fd)
+        finally:
+            os.close(fd)
+
+    def _add_watches(self, fd: int, directory: Path, watches: Dict[int, Path],
+                     pending: Optional[Set[Path]] = None):
+        """Watch ``directory`` and every directory below it."""
+        for root, dirs, files in os.walk(directory):
+            wd = self._libc.inotify_add_watch(fd, os.fsencode(root), _WATCH_MASK)
+            if wd < 0:
+                # Removed meanwhile, or out of watches
+                errno = ctypes.get_errno()
+                if not os.path.isdir(root):
+                    continue
+                logger.error(f"Cannot watch {root}: {os.strerror(errno)}")
+                continue
+            watches[wd] = Path(root)
+            if pending is not None:
+                pending.update(Path(root) / name for name in files if _is_plan_name(name))
+
+    def _watch_loop(self, fd: int):
+        projects_dir = self.manager.projects_dir
+        watches: Dict[int, Path] = {}
+        # Watch first, then scan, so nothing changed in between is missed
+        self._add_watches(fd, projects_dir, watches)
+        self._scan()
+
+        pending: Set[Path] = set()
+        rescan = False
+        last_event = 0.0
+        while not self._stop.is_set():
+            timeout = None
+            if pending or rescan:
+                timeout = max(0.0, last_event + self.settle - time.monotonic())
+            ready, _, _ = select.select([fd, self._wake_r], [], [], timeout)
+            if self._wake_r in ready:
+                break
+            if fd not in ready:
+                # Settled
+                paths = pending
+                pending = set()
+                if rescan:
+                    rescan = False
+                    paths |= self._changed_files()
+                self._apply(paths)
+                continue
+
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            last_event = time.monotonic()
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF):
+                    watches.pop(wd, None)
+                    continue
+                directory = watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / name
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # Files may land in a new folder before it is watched
+                        self._add_watches(fd, path, watches, pending)
+                    if mask & (IN_MOVED_FROM | IN_MOVED_TO):
+                        # Plans moved along with a folder
+                        rescan = True
+                elif _is_plan_name(name) and not mask & IN_CREATE:
+                    # Creation is followed by IN_CLOSE_WRITE once written
+                    pending.add(path)
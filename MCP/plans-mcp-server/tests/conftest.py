@@ -0,0 +1,46 @@
+"""Shared fixtures for the plans-mcp-server tests."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules under src/ import each other as top-level modules, as they do
+# when the server is run as a script
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from plan_manager import PlanManager  # noqa: E402
+
+
+def make_plan(title: str, body: str = "") -> str:
+    """Return plan text whose project name is derived from ``title``."""
+    return f"# {title}\n\n{body}\n"
+
+
+@pytest.fixture
+def plans_dir(tmp_path: Path) -> Path:
+    """Root of an empty Plans store."""
+    return tmp_path / "Plans"
+
+
+@pytest.fixture
+def manager(plans_dir: Path) -> PlanManager:
+    """A PlanManager over an empty store, writing index.md on every save."""
+    return PlanManager(str(plans_dir))
+
+
+@pytest.fixture
+def server():
+    """The server module; tests using it are skipped without the mcp package."""
+    pytest.importorskip("mcp")
+    import server as server_module
+    return server_module
+
+
+@pytest.fixture
+def served(server, plans_dir: Path, monkeypatch) -> PlanManager:
+    """Point the server at a fresh store, deferring index.md writes as the server does."""
+    manager = PlanManager(str(plans_dir), defer_index=True)
+    monkeypatch.setattr(server, "plan_manager", manager)
+    return manager
@@ -0,0 +1,92 @@
+"""Tests for archiving old plans into compressed packs."""
+
+import os
+import re
+import time
+
+import plan_manager
+import plans_admin
+from plan_manager import PlanManager
+
+from .conftest import make_plan
+
+DAY = 86400
+
+
+def _save_aged(manager: PlanManager, project: str, body: str, age_days: float):
+    """Save a plan whose file was last modified ``age_days`` ago."""
+    path = manager.save_plan_as_md(make_plan(project.title(), body), project)
+    stamp = time.time() - age_days * DAY
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def _aged_store(manager: PlanManager) -> dict:
+    contents = {}
+    for i in range(7):
+        path = _save_aged(manager, "legacy", f"old kubernetes plan {i}", 100 + i)
+        contents[("legacy", path.name)] = path.read_text(encoding="utf-8")
+    for i in range(3):
+        path = _save_aged(manager, "mixed", f"plan {i}", 200 if i < 2 else 1)
+        contents[("mixed", path.name)] = path.read_text(encoding="utf-8")
+    # The catalog's mtimes decide what is old
+    manager.rebuild_catalog()
+    return contents
+
+
+def test_archive_then_read_round_trip(manager, monkeypatch):
+    monkeypatch.setattr(plan_manager, "PACK_MAX_PLANS", 4)
+    contents = _aged_store(manager)
+
+    result = manager.archive_plans(older_than_days=90)
+
+    assert result["archived"] == 9
+    assert len(result["packs"]) == 3
+    assert result["bytes_before"] > 0 and result["bytes_after"] > 0
+    assert not (manager.projects_dir / "legacy").exists()
+    assert len(list((manager.projects_dir / "mixed").glob("*.md"))) == 1
+
+    for (project, filename), content in contents.items():
+        assert manager.get_plan_content(project, filename) == content
+    assert len(manager.list_plans()) == 10
+    assert len(manager.search_plans("old kubernetes plan")) == 7
+    assert manager.search_plans("kubernetes plan 3", snippets=True)[0]["snippet"]
+    index = manager.render_index()
+    assert "(archived)" in index
+    # Only plans that still have a file are linked
+    links = re.findall(r"\]\((projects/[^)]+)\)", index)
+    assert links and all((manager.plans_dir / link).exists() for link in links)
+
+    # Nothing left to archive
+    assert manager.archive_plans(older_than_days=90)["archived"] == 0
+
+
+def test_archived_plans_survive_a_catalog_rebuild(plans_dir):
+    manager = PlanManager(str(plans_dir))
+    contents = _aged_store(manager)
+    manager.archive_plans(older_than_days=90)
+    packs = {(r["project"], r["filename"]): r["pack"] for r in manager.catalog.iter_plans()}
+    manager = None
+
+    (plans_dir / "catalog.db").unlink()
+    reopened = PlanManager(str(plans_dir))
+
+    assert {(r["project"], r["filename"]): r["pack"] for r in reopened.catalog.iter_plans()} == packs
+    for (project, filename), content in contents.items():
+        assert reopened.get_plan_content(project, filename) == content
+
+
+def test_archive_one_project(manager):
+    _aged_store(manager)
+    assert manager.archive_plans(older_than_days=90, project_name="mixed")["archived"] == 2
+    assert len(list((manager.projects_dir / "legacy").glob("*.md"))) == 7
+
+
+def test_archive_command(plans_dir, capsys):
+    manager = PlanManager(str(plans_dir))
+    _aged_store(manager)
+
+    assert plans_admin.main(["--plans-dir", str(plans_dir), "archive", "--older-than-days", "90"]) == 0
+    assert "Archived 9 plans into 1 pack(s)" in capsys.readouterr().out
+    assert plans_admin.main(["--plans-dir", str(plans_dir), "archive", "--older-than-days", "90"]) == 0
+    assert "No plans to archive" in capsys.readouterr().out
@@ -0,0 +1,45 @@
+"""Tests for saving many plans in one call."""
+
+import pytest
+
+from .conftest import make_plan
+
+
+def test_batch_results_follow_input_order(manager):
+    results = manager.save_plans([
+        (make_plan("Plan", "batch alpha"), "alpha"),
+        ("   ", "beta"),
+        (make_plan("Plan", "batch gamma"), "gamma"),
+    ])
+
+    assert [result["ok"] for result in results] == [True, False, True]
+    assert results[1]["error"] == "plan_content cannot be empty"
+    assert [result["path"].parent.name for result in (results[0], results[2])] == ["alpha", "gamma"]
+    assert {r["project"] for r in manager.search_plans("batch")} == {"alpha", "gamma"}
+
+
+def test_recording_failure_only_fails_its_item(manager, monkeypatch):
+    catalog_record = manager._catalog_record
+
+    def failing(plan_file, content):
+        if plan_file.parent.name == "beta":
+            raise OSError("disk went away")
+        return catalog_record(plan_file, content)
+
+    monkeypatch.setattr(manager, "_catalog_record", failing)
+    results = manager.save_plans([(make_plan("Plan", f"recorded {name}"), name)
+                                  for name in ("alpha", "beta", "gamma")])
+
+    assert [result["ok"] for result in results] == [True, False, True]
+    assert results[1]["error"] == "disk went away"
+    assert {record["project"] for record in manager.catalog.list()} == {"alpha", "gamma"}
+    # The failed plan leaves no file behind for a rebuild to pick up
+    assert list(manager.projects_dir.glob("beta/*.md")) == []
+    assert {r["project"] for r in manager.search_plans("recorded")} == {"alpha", "gamma"}
+    assert manager.get_plan_history("beta") == []
+    index = manager.index_file.read_text()
+    assert "alpha" in index and "gamma" in index and "*Total plans: 2*" in index
+
+    # A single save reports its own failure
+    with pytest.raises(OSError):
+        manager.save_plan(make_plan("Plan", "again"), "beta")
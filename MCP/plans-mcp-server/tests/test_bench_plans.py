@@ -0,0 +1,63 @@
+"""Tests for the synthetic-corpus benchmark."""
+
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+BENCH_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_plans.py"
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench_plans", BENCH_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _snapshot(directory: Path) -> dict:
+    return {
+        str(path.relative_to(directory)): path.read_bytes()
+        for path in sorted(directory.rglob("*")) if path.is_file()
+    }
+
+
+def test_same_seed_generates_same_corpus(bench, tmp_path):
+    first, second = tmp_path / "a", tmp_path / "b"
+    bench.generate_corpus(first, bench.CorpusGenerator(seed=7, projects=5), 40)
+    bench.generate_corpus(second, bench.CorpusGenerator(seed=7, projects=5), 40)
+
+    assert _snapshot(first) == _snapshot(second)
+    assert len(list((first / "projects").rglob("*.md"))) == 40
+
+
+def test_prepare_corpus_reuses_matching_corpus(bench, tmp_path):
+    corpus = tmp_path / "corpus"
+    generator = bench.CorpusGenerator(seed=1, projects=3)
+
+    assert bench.prepare_corpus(corpus, generator, 20)
+    assert not bench.prepare_corpus(corpus, generator, 20)
+    # A different spec regenerates
+    assert bench.prepare_corpus(corpus, generator, 30)
+    assert json.loads((corpus / bench.CORPUS_MARKER).read_text())["plans"] == 30
+
+
+def test_kept_corpus_is_not_modified_by_a_run(bench, tmp_path, capsys):
+    corpus = tmp_path / "corpus"
+    argv = ["--plans", "100", "--projects", "5", "--samples", "3", "--cold-samples", "1",
+            "--warmup", "0", "--corpus", str(corpus), "--output", str(tmp_path / "out.json")]
+
+    assert bench.main(argv) == 0
+    before = _snapshot(corpus)
+    assert bench.main(argv) == 0
+    capsys.readouterr()
+
+    # Saves, the catalog and the indexes of both runs went to scratch copies
+    assert _snapshot(corpus) == before
+    assert not (corpus / "catalog.db").exists()
+    assert not list(corpus.glob("search_index.*"))
+    report = json.loads((tmp_path / "out.json").read_text())
+    assert report["setup"]["corpus_generated"] is False
+    assert set(bench.OPERATIONS) <= set(report["results"])
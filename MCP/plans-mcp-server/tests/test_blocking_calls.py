@@ -0,0 +1,99 @@
+"""Tests for running plan-store calls off the server's event loop."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from search_index import SearchCancelled
+
+from .conftest import make_plan
+
+
+async def _ticks_during(coro, interval: float = 0.01):
+    """Await ``coro`` while counting how often the event loop got to run a ticker."""
+    ticks = 0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal ticks
+        while not done.is_set():
+            await asyncio.sleep(interval)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        result = await coro
+    finally:
+        done.set()
+        await task
+    return result, ticks
+
+
+def test_blocking_call_does_not_stall_the_loop(server, served, monkeypatch):
+    served.save_plan_as_md(make_plan("Plan", "slow listing"), "alpha")
+    list_plans = served.list_plans
+
+    def slow_list_plans(*args, **kwargs):
+        time.sleep(0.5)
+        return list_plans(*args, **kwargs)
+
+    monkeypatch.setattr(served, "list_plans", slow_list_plans)
+
+    async def run():
+        start = time.monotonic()
+        results = await asyncio.gather(
+            _ticks_during(server.handle_call_tool("list_plans", {})),
+            server.handle_call_tool("list_plans", {}),
+        )
+        return results, time.monotonic() - start
+
+    ((result, ticks), other), elapsed = asyncio.run(run())
+    assert "alpha" in result[0].text and "alpha" in other[0].text
+    # The loop kept running, and the two calls overlapped on the worker pool
+    assert ticks >= 20
+    assert elapsed < 0.9
+
+
+def test_cancelled_search_stops_its_worker(server, served, monkeypatch):
+    started, stopped = threading.Event(), threading.Event()
+
+    def endless_search(*args, cancel_event=None, **kwargs):
+        started.set()
+        # Stand-in for a long search that checks its cancel event between steps
+        deadline = time.monotonic() + 10
+        while not cancel_event.is_set() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        if cancel_event.is_set():
+            stopped.set()
+        return []
+
+    monkeypatch.setattr(served, "search_plans", endless_search)
+
+    async def cancel_midway():
+        task = asyncio.create_task(server.handle_call_tool("search_plans", {"query": "anything"}))
+        while not started.is_set():
+            await asyncio.sleep(0.005)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    start = time.monotonic()
+    assert asyncio.run(cancel_midway())
+    assert stopped.wait(2)
+    assert time.monotonic() - start < 2
+
+
+def test_cancelled_search_stops_a_real_scan(server, served):
+    for i in range(200):
+        served.save_plan_as_md(make_plan("Plan", f"kubernetes rollout step {i}"), f"proj-{i % 7}")
+    served.search_plans("warm up")
+    cancel_event = threading.Event()
+    cancel_event.set()
+    # The server sets the event when the call is cancelled; the search gives up
+    with pytest.raises(SearchCancelled):
+        served.search_plans("kubernetes", cancel_event=cancel_event)
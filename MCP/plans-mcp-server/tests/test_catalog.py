@@ -0,0 +1,95 @@
+"""Tests for the SQLite catalog that listings and saves read instead of the tree."""
+
+import os
+import sqlite3
+
+from catalog import SCHEMA_VERSION
+from plan_manager import PlanManager
+
+from .conftest import make_plan
+
+
+def _disk_records(manager: PlanManager) -> dict:
+    records = {}
+    for path in manager.projects_dir.rglob("*.md"):
+        stat = path.stat()
+        records[(path.parent.name, path.name)] = (stat.st_size, stat.st_mtime)
+    return records
+
+
+def _catalog_records(manager: PlanManager) -> dict:
+    return {(r["project"], r["filename"]): (r["size"], r["mtime"])
+            for r in manager.catalog.iter_plans()}
+
+
+def test_save_records_the_plan(manager):
+    path = manager.save_plan_as_md(make_plan("Python rollout", "Ship the python service"), "infra")
+
+    record = manager.catalog.get("infra", path.name)
+    assert record is not None
+    assert record["size"] == path.stat().st_size
+    assert record["mtime"] == path.stat().st_mtime
+    assert record["status"] == "validated"
+    assert record["tags"] == ["python"]
+    assert manager.catalog.projects() == ["infra"]
+    assert manager.catalog.count() == 1
+
+
+def test_list_plans_is_newest_first(manager):
+    paths = [manager.save_plan_as_md(make_plan(f"Plan {i}"), f"proj-{i % 3}") for i in range(9)]
+    # Spread the mtimes out, in an order unrelated to the save order
+    for offset, path in enumerate(reversed(paths)):
+        os.utime(path, (1_700_000_000 + offset, 1_700_000_000 + offset))
+    manager.rebuild_catalog()
+
+    listed = [(plan["project"], plan["filename"]) for plan in manager.list_plans()]
+    assert listed == [(path.parent.name, path.name) for path in paths]
+    assert [plan["filename"] for plan in manager.list_plans("proj-1")] == [
+        path.name for path in paths if path.parent.name == "proj-1"
+    ]
+
+
+def test_missing_catalog_is_rebuilt_from_disk(plans_dir):
+    manager = PlanManager(str(plans_dir))
+    for i in range(5):
+        manager.save_plan_as_md(make_plan(f"Plan {i}"), f"proj-{i % 2}")
+    expected = _disk_records(manager)
+    manager = None
+
+    for suffix in ("", "-wal", "-shm"):
+        path = plans_dir / f"catalog.db{suffix}"
+        if path.exists():
+            path.unlink()
+    reopened = PlanManager(str(plans_dir))
+    assert _catalog_records(reopened) == expected
+
+
+def test_outdated_schema_is_rebuilt(plans_dir):
+    manager = PlanManager(str(plans_dir))
+    manager.save_plan_as_md(make_plan("Plan"), "proj")
+    expected = _disk_records(manager)
+    manager = None
+
+    conn = sqlite3.connect(plans_dir / "catalog.db")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    conn.commit()
+    conn.close()
+
+    assert _catalog_records(PlanManager(str(plans_dir))) == expected
+
+
+def test_rebuild_catalog_picks_up_outside_changes(manager):
+    kept = manager.save_plan_as_md(make_plan("Kept"), "proj")
+    removed = manager.save_plan_as_md(make_plan("Removed"), "proj")
+    added = manager.projects_dir / "other" / "2024-01-02_030405_plan.md"
+    added.parent.mkdir()
+    added.write_text('---\nproject_name: "other"\nstatus: "draft"\ntags: ["api"]\n---\n\nbody\n')
+    removed.unlink()
+
+    manager.rebuild_catalog()
+
+    assert manager.catalog.get("proj", kept.name) is not None
+    assert manager.catalog.get("other", added.name)["tags"] == ["api"]
+    # The removed plan is still in the version history, so it stays readable
+    assert manager.get_plan_content("proj", removed.name).endswith("# Removed\n\n\n")
+    assert _disk_records(manager).items() <= _catalog_records(manager).items()
@@ -0,0 +1,71 @@
+"""Tests for several processes and threads writing to one Plans store."""
+
+import multiprocessing
+import threading
+
+from plan_manager import PlanManager
+
+from .conftest import make_plan
+
+PROCESSES = 4
+SAVES_PER_PROCESS = 15
+
+
+def _save_worker(plans_dir: str, worker: int, barrier):
+    manager = PlanManager(plans_dir)
+    barrier.wait()
+    for i in range(SAVES_PER_PROCESS):
+        # Every process saves into the shared project and its own one
+        manager.save_plan_as_md(make_plan("Shared", f"worker{worker} shared{i}"), "shared")
+        manager.save_plan_as_md(make_plan("Own", f"worker{worker} own{i}"), f"own-{worker}")
+
+
+def test_concurrent_multi_process_saves(plans_dir):
+    PlanManager(str(plans_dir))
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(PROCESSES)
+    processes = [context.Process(target=_save_worker, args=(str(plans_dir), worker, barrier))
+                 for worker in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(120)
+        assert process.exitcode == 0
+
+    manager = PlanManager(str(plans_dir))
+    total = PROCESSES * SAVES_PER_PROCESS
+    shared = list((plans_dir / "projects" / "shared").glob("*.md"))
+    assert len(shared) == total
+    # No save overwrote another
+    bodies = {path.read_text(encoding="utf-8").rsplit("# Shared\n\n", 1)[1] for path in shared}
+    assert len(bodies) == total
+
+    assert manager.catalog.count() == 2 * total
+    versions = [entry["version"] for entry in manager.get_plan_history("shared")]
+    assert sorted(versions) == list(range(1, total + 1))
+    assert {entry["filename"] for entry in manager.get_plan_history("shared")} == {
+        path.name for path in shared
+    }
+
+    # Every process's index entries made it into the shared search index
+    for worker in range(PROCESSES):
+        assert len(manager.search_plans(f"worker{worker} shared")) == SAVES_PER_PROCESS
+        assert len(manager.search_plans(f"worker{worker} own")) == SAVES_PER_PROCESS
+    index = (plans_dir / "index.md").read_text(encoding="utf-8")
+    assert f"*Total plans: {2 * total}*" in index
+
+
+def test_concurrent_thread_saves(manager):
+    def save(worker: int):
+        for i in range(10):
+            manager.save_plan_as_md(make_plan("Shared", f"thread{worker} plan{i}"), "shared")
+
+    threads = [threading.Thread(target=save, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(list((manager.projects_dir / "shared").glob("*.md"))) == 40
+    assert len(manager.list_plans("shared")) == 40
+    assert len(manager.search_plans("plan")) == 40
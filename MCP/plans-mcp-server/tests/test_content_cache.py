@@ -0,0 +1,107 @@
+"""Tests for the LRU cache of plan file contents."""
+
+import os
+
+import pytest
+
+from content_cache import ContentCache
+
+from .conftest import make_plan
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Four ten-byte files, a to d."""
+    paths = {}
+    for name in "abcd":
+        paths[name] = tmp_path / f"{name}.md"
+        paths[name].write_text(name * 10)
+    return paths
+
+
+def test_unchanged_file_is_a_hit(files):
+    cache = ContentCache()
+    assert cache.read(files["a"]) == "a" * 10
+    assert cache.read(files["a"]) == "a" * 10
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_changed_signature_is_a_miss(files):
+    cache = ContentCache()
+    path = files["a"]
+    cache.read(path)
+    stat = path.stat()
+
+    # Same size, newer mtime
+    path.write_text("z" * 10)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.read(path) == "z" * 10
+
+    # Same mtime, different size
+    stat = path.stat()
+    path.write_text("y" * 11)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.read(path) == "y" * 11
+
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 3)
+    assert cache.read(path) == "y" * 11
+    assert cache.stats()["hits"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(files):
+    cache = ContentCache(max_bytes=30)
+    for name in "abc":
+        cache.read(files[name])
+    # Touch a, so b is now the least recently used
+    cache.read(files["a"])
+    cache.read(files["d"])
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 30, 1)
+    hits = stats["hits"]
+    for name in "acd":
+        cache.read(files[name])
+    assert cache.stats()["hits"] == hits + 3
+    cache.read(files["b"])
+    assert cache.stats()["misses"] == stats["misses"] + 1
+
+
+def test_oversized_and_deleted_files_are_not_kept(files, tmp_path):
+    cache = ContentCache(max_bytes=15)
+    big = tmp_path / "big.md"
+    big.write_text("x" * 20)
+    assert cache.read(big) == "x" * 20
+    assert cache.stats()["entries"] == 0
+
+    cache.read(files["a"])
+    files["a"].unlink()
+    assert cache.read(files["a"]) is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_stats_counters(files):
+    cache = ContentCache(max_bytes=25)
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0,
+                             'entries': 0, 'bytes': 0, 'max_bytes': 25}
+    cache.read(files["a"])
+    cache.read(files["a"])
+    cache.read(files["b"])
+    cache.read(files["c"])
+    cache.put(files["d"], "d" * 10)
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'evictions': 2,
+                             'entries': 2, 'bytes': 20, 'max_bytes': 25}
+    cache.invalidate(files["d"])
+    assert cache.stats()["entries"] == 1
+    cache.clear()
+    assert (cache.stats()["entries"], cache.stats()["bytes"]) == (0, 0)
+
+
+def test_manager_reads_see_outside_edits(manager):
+    path = manager.save_plan_as_md(make_plan("Plan", "first draft"), "alpha")
+    assert "first draft" in manager.get_plan_content("alpha", path.name)
+    hits = manager.content_cache.stats()["hits"]
+    assert "first draft" in manager.get_plan_content("alpha", path.name)
+    assert manager.content_cache.stats()["hits"] == hits + 1
+
+    path.write_text(make_plan("Plan", "second draft, edited by hand"))
+    assert "second draft" in manager.get_plan_content("alpha", path.name)
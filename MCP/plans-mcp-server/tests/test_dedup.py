@@ -0,0 +1,99 @@
+"""Tests for content-addressed, deduplicated plan storage."""
+
+import pytest
+
+from plan_manager import PlanManager
+
+from .conftest import make_plan
+
+
+@pytest.fixture
+def dedup_manager(plans_dir) -> PlanManager:
+    return PlanManager(str(plans_dir), dedup=True)
+
+
+def _objects(plans_dir) -> list:
+    # Objects sit under a folder named after their first two hex digits
+    return list((plans_dir / "objects").glob("??/*"))
+
+
+def test_identical_bodies_are_stored_once(dedup_manager, plans_dir):
+    plan = make_plan("Cache layer", "Add a redis cache in front of the api")
+    first = dedup_manager.save_plan_as_md(plan, "cache")
+    second = dedup_manager.save_plan_as_md(plan, "other")
+    third = dedup_manager.save_plan_as_md(make_plan("Different"), "cache")
+
+    assert not any(path.exists() for path in (first, second, third))
+    assert len(_objects(plans_dir)) == 2
+    assert dedup_manager.catalog.count() == 3
+    digest = dedup_manager.catalog.get("cache", first.name)["blob"]
+    assert dedup_manager.catalog.get("other", second.name)["blob"] == digest
+    # The name carries a prefix of the digest instead of a counter
+    assert first.name.split("_")[2] == digest[:8]
+
+
+def test_object_backed_plans_read_like_files(dedup_manager):
+    path = dedup_manager.save_plan_as_md(make_plan("Cache layer", "Add a redis cache"), "cache")
+
+    content = dedup_manager.get_plan_content("cache", path.name)
+    assert content.startswith('---\nproject_name: "cache"\n')
+    assert content.endswith("# Cache layer\n\nAdd a redis cache\n")
+    assert dedup_manager.get_plan_content("cache") == content
+    assert [r["filename"] for r in dedup_manager.search_plans("redis cache")] == [path.name]
+    assert "(deduplicated)" in dedup_manager.render_index()
+
+
+def test_materialized_file_can_be_deleted_again(dedup_manager):
+    path = dedup_manager.save_plan_as_md(make_plan("Cache layer", "Add a redis cache"), "cache")
+    content = dedup_manager.get_plan_content("cache", path.name)
+
+    assert dedup_manager.materialize_plan("cache", path.name) == path
+    assert path.read_text(encoding="utf-8") == content
+    assert f"]({path.relative_to(dedup_manager.plans_dir)})" in dedup_manager.render_index()
+
+    path.unlink()
+    dedup_manager.content_cache.invalidate(path)
+    assert dedup_manager.get_plan_content("cache", path.name) == content
+    assert dedup_manager.materialize_plan("cache", "missing.md") is None
+
+
+def test_catalog_rebuild_restores_object_backed_plans(plans_dir):
+    manager = PlanManager(str(plans_dir), dedup=True)
+    object_path = manager.save_plan_as_md(make_plan("Object", "stored once"), "mixed")
+    manager.dedup = False
+    file_path = manager.save_plan_as_md(make_plan("File", "stored as a file"), "mixed")
+    expected = {(r["project"], r["filename"], r["blob"]) for r in manager.catalog.iter_plans()}
+    manager = None
+
+    (plans_dir / "catalog.db").unlink()
+    reopened = PlanManager(str(plans_dir))
+
+    assert {(r["project"], r["filename"], r["blob"]) for r in reopened.catalog.iter_plans()} == expected
+    assert "stored once" in reopened.get_plan_content("mixed", object_path.name)
+    assert "stored as a file" in reopened.get_plan_content("mixed", file_path.name)
+
+
+def _bytes(directory) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def test_duplicate_bodies_cost_their_size_once_on_disk(dedup_manager, plans_dir):
+    body = "".join(f"- step {i}: migrate the billing service to the new queue\n" for i in range(400))
+    plan = make_plan("Billing migration", body)
+    for i in range(10):
+        dedup_manager.save_plan_as_md(plan, f"team-{i}")
+
+    size = len(plan.encode("utf-8"))
+    assert len(_objects(plans_dir)) == 1
+    # Each project's history snapshot refers to the object instead of repeating it
+    assert _bytes(plans_dir / "history") < size // 2
+    assert _bytes(plans_dir / "objects") + _bytes(plans_dir / "history") < 2 * size
+
+    # Versions and the catalog are still rebuilt from the history and the object
+    dedup_manager = None
+    (plans_dir / "catalog.db").unlink()
+    reopened = PlanManager(str(plans_dir), dedup=True)
+    for i in range(10):
+        filename = reopened.list_plans(f"team-{i}")[0]["filename"]
+        assert reopened.history.get(f"team-{i}", filename) == reopened.get_plan_content(f"team-{i}")
+        assert reopened.history.get(f"team-{i}", filename).endswith(body + "\n")
@@ -0,0 +1,123 @@
+"""Tests for the status, date and project filters of list_plans and search_plans."""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from plan_manager import parse_time_bound
+
+from .conftest import make_plan
+
+STATUSES = ["validated", "draft", "done"]
+START = datetime(2025, 3, 1)
+
+
+@pytest.fixture
+def store(manager):
+    """30 plans over 15 days, three projects and three statuses; returns the expected records."""
+    records = {}
+    for i in range(30):
+        body = f"deploy step {i}" + (" with python scripts" if i % 2 else "")
+        path = manager.save_plan_as_md(make_plan("Plan", body), f"proj-{i % 3}")
+        status = STATUSES[i % 4 % 3]
+        path.write_text(path.read_text().replace('status: "validated"', f'status: "{status}"'))
+        stamp = (START + timedelta(hours=12 * i + 1)).timestamp()
+        os.utime(path, (stamp, stamp))
+        records[(path.parent.name, path.name)] = {
+            "status": status, "mtime": stamp, "python": bool(i % 2)
+        }
+    manager.rebuild_catalog()
+    manager.rebuild_search_index()
+    for key, record in records.items():
+        assert ("python" in manager.catalog.get(*key)["tags"]) == record["python"]
+    return manager, records
+
+
+def expected(records, project=None, tags=None, status=None, since=None, until=None) -> list:
+    since, until = parse_time_bound(since), parse_time_bound(until, end=True)
+    keys = [key for key, record in records.items()
+            if (project is None or key[0] == project)
+            and (not tags or record["python"])
+            and (status is None or record["status"] == status.lower())
+            and (since is None or record["mtime"] >= since)
+            and (until is None or record["mtime"] < until)]
+    return sorted(keys, key=lambda key: -records[key]["mtime"])
+
+
+FILTERS = [
+    {"status": "draft"},
+    {"status": "DONE"},
+    {"status": "archived"},
+    {"since": "2025-03-10"},
+    {"until": "2025-03-04"},
+    {"since": "2025-03-05", "until": "2025-03-05"},
+    {"since": "2025-03-05T12:00", "until": "2025-03-08T06:30:00"},
+    {"since": (START + timedelta(days=3)).timestamp(), "until": (START + timedelta(days=9)).timestamp()},
+    {"project_name": "proj-1", "status": "validated"},
+    {"project_name": "proj-2", "since": "2025-03-07", "tags": ["python"]},
+    {"status": "draft", "tags": ["python"], "until": "2025-03-12"},
+    {"since": "2025-04-01"},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_list_plans_filters(store, filters):
+    manager, records = store
+    listed = [(plan["project"], plan["filename"]) for plan in manager.list_plans(**filters)]
+    want = expected(records, filters.get("project_name"), filters.get("tags"), filters.get("status"),
+                    filters.get("since"), filters.get("until"))
+    assert listed == want
+    assert want or filters.get("status") == "archived" or filters.get("since") == "2025-04-01"
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_search_plans_filters(store, filters):
+    manager, records = store
+    found = {(plan["project"], plan["filename"]) for plan in manager.search_plans("deploy", **filters)}
+    want = expected(records, filters.get("project_name"), filters.get("tags"), filters.get("status"),
+                    filters.get("since"), filters.get("until"))
+    assert found == set(want)
+
+
+def test_until_date_includes_the_whole_day(store):
+    manager, _ = store
+    # The plans of March 2nd were saved at 01:00 and 13:00
+    day = manager.list_plans(since="2025-03-02", until="2025-03-02")
+    assert [plan["date"] for plan in day] == [
+        (START + timedelta(hours=37)).timestamp(), (START + timedelta(hours=25)).timestamp()
+    ]
+    # A time of day is an exclusive upper bound
+    assert len(manager.list_plans(since="2025-03-02", until="2025-03-02T13:00")) == 1
+
+
+def test_filtered_pages(store):
+    manager, records = store
+    pages, cursor = [], None
+    while True:
+        page = manager.list_plans(status="validated", since="2025-03-03", limit=3, cursor=cursor)
+        if not page:
+            break
+        pages.extend((plan["project"], plan["filename"]) for plan in page)
+        cursor = page[-1]["cursor"]
+    assert pages == expected(records, status="validated", since="2025-03-03")
+
+
+def test_parse_time_bound():
+    assert parse_time_bound(None) is None
+    assert parse_time_bound("") is None
+    assert parse_time_bound(1_700_000_000) == 1_700_000_000.0
+    assert parse_time_bound("2025-03-01") == START.timestamp()
+    assert parse_time_bound("2025-03-01", end=True) == (START + timedelta(days=1)).timestamp()
+    # A time of day is taken as is, even as an upper bound
+    assert parse_time_bound("2025-03-01T14:30", end=True) == START.replace(hour=14, minute=30).timestamp()
+    for bad in ("yesterday", "2025-13-01", "03/01/2025", ["2025-03-01"]):
+        with pytest.raises(ValueError):
+            parse_time_bound(bad)
+
+
+def test_invalid_dates_are_rejected(manager):
+    with pytest.raises(ValueError):
+        manager.list_plans(since="last week")
+    with pytest.raises(ValueError):
+        manager.search_plans("deploy", until="soon")
@@ -0,0 +1,71 @@
+"""Tests for the debounced background rewrites of index.md."""
+
+import asyncio
+
+import pytest
+
+from .conftest import make_plan
+
+DEBOUNCE_MS = 100
+
+
+@pytest.fixture
+def writes(server, served, monkeypatch):
+    """Count index.md rewrites, with a fresh writer for this test's event loop."""
+    monkeypatch.setattr(server, "index_writer", server.IndexWriter(DEBOUNCE_MS))
+    count = []
+    write_index = served.write_index
+
+    def counted():
+        count.append(1)
+        write_index()
+
+    monkeypatch.setattr(served, "write_index", counted)
+    return count
+
+
+def _save(server, i: int):
+    return server.handle_call_tool("save_plan", {"plan_content": make_plan("Plan", f"burst {i}"),
+                                                 "project_name": f"proj-{i}"})
+
+
+def test_burst_of_saves_writes_the_index_once(server, served, writes):
+    async def burst():
+        for i in range(5):
+            await _save(server, i)
+        assert writes == [] and served.index_dirty
+        await asyncio.sleep(3 * DEBOUNCE_MS / 1000)
+        return list(writes)
+
+    assert asyncio.run(burst()) == [1]
+    assert not served.index_dirty
+    assert "*Total plans: 5*" in served.index_file.read_text()
+
+
+def test_bursts_in_separate_windows_write_once_each(server, served, writes):
+    async def bursts():
+        for window in range(2):
+            await asyncio.gather(*(_save(server, 10 * window + i) for i in range(3)))
+            await asyncio.sleep(3 * DEBOUNCE_MS / 1000)
+        await server.index_writer.flush()
+
+    asyncio.run(bursts())
+    assert writes == [1, 1]
+    assert "*Total plans: 6*" in served.index_file.read_text()
+
+
+def test_flush_writes_a_pending_index(server, served, writes):
+    async def save_then_shut_down():
+        await _save(server, 1)
+        # Shut down before the debounce window has passed
+        await server.index_writer.flush()
+        return list(writes)
+
+    assert asyncio.run(save_then_shut_down()) == [1]
+    assert not served.index_dirty
+    assert "*Total plans: 1*" in served.index_file.read_text()
+
+
+def test_flush_without_changes_writes_nothing(server, served, writes):
+    asyncio.run(server.index_writer.flush())
+    assert writes == []
@@ -0,0 +1,137 @@
+"""Tests for sharded directory layouts and migrating between them."""
+
+import os
+import re
+
+import pytest
+
+import plans_admin
+from layout import LAYOUTS, PlanLayout
+from plan_manager import PlanManager
+
+from .conftest import make_plan
+
+
+@pytest.mark.parametrize("name", LAYOUTS)
+@pytest.mark.parametrize("filename", ["2024-03-05_101112_plan.md", "notes.md"])
+def test_plan_paths_parse_back(tmp_path, name, filename):
+    layout = PlanLayout(name)
+    path = layout.plan_path(tmp_path, "web-app", filename)
+
+    assert PlanLayout.parse(tmp_path, path) == ("web-app", filename)
+    if layout.shard_dates and filename[0].isdigit():
+        assert path.parent.parts[-2:] == ("2024", "03")
+
+
+def test_unknown_layout_is_rejected():
+    with pytest.raises(ValueError):
+        PlanLayout("by-color")
+
+
+def _store(manager: PlanManager) -> dict:
+    contents = {}
+    for i in range(12):
+        path = manager.save_plan_as_md(make_plan(f"Plan {i}", f"layout body {i}"), f"proj-{i % 5}")
+        contents[(f"proj-{i % 5}", path.name)] = path.read_text(encoding="utf-8")
+    # A hand-written file without a date prefix
+    undated = manager.plan_path("proj-0", "notes.md")
+    undated.write_text("# Notes\n\nlayout body notes\n", encoding="utf-8")
+    manager.apply_file_changes([undated])
+    contents[("proj-0", "notes.md")] = undated.read_text(encoding="utf-8")
+    return contents
+
+
+def _catalog(manager: PlanManager) -> dict:
+    return {(r["project"], r["filename"]): (r["size"], r["tags"], r["status"])
+            for r in manager.catalog.iter_plans()}
+
+
+def _check_store(manager: PlanManager, contents: dict):
+    on_disk = {(project, filename): path
+               for path, project, filename in PlanLayout.iter_plan_files(manager.projects_dir)}
+    assert set(on_disk) == set(contents)
+    for (project, filename), path in on_disk.items():
+        assert path == manager.plan_path(project, filename)
+        assert manager.get_plan_content(project, filename) == contents[(project, filename)]
+    # No empty folders are left behind
+    for directory, subdirs, files in os.walk(manager.projects_dir):
+        assert subdirs or files, directory
+    links = re.findall(r"\]\((projects/[^)]+)\)", (manager.plans_dir / "index.md").read_text())
+    assert links and all((manager.plans_dir / link).exists() for link in links)
+
+
+@pytest.mark.parametrize("path", [["hash-date", "date", "flat"], ["hash", "flat"]])
+def test_migrate_then_rebuild_catalog(plans_dir, path):
+    manager = PlanManager(str(plans_dir))
+    contents = _store(manager)
+    catalog = _catalog(manager)
+
+    for name in path:
+        assert manager.migrate_layout(name) > 0
+        assert manager.migrate_layout(name) == 0
+        assert PlanLayout.load(plans_dir).name == name
+        _check_store(manager, contents)
+
+        manager.rebuild_catalog()
+        assert _catalog(manager) == catalog
+        # A new process picks up the layout and can rebuild from scratch
+        (plans_dir / "catalog.db").unlink()
+        manager = PlanManager(str(plans_dir))
+        assert manager.layout.name == name
+        assert _catalog(manager) == catalog
+        assert len(manager.search_plans("layout body")) == len(contents)
+
+
+def test_interrupted_migration_is_finished_by_rerunning(plans_dir):
+    manager = PlanManager(str(plans_dir))
+    contents = _store(manager)
+    target = PlanLayout("hash-date")
+    # Move half the files by hand, as an interrupted migration would
+    plan_files = sorted(PlanLayout.iter_plan_files(manager.projects_dir))
+    for plan_file, project, filename in plan_files[::2]:
+        destination = target.plan_path(manager.projects_dir, project, filename)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(plan_file, destination)
+        manager.content_cache.invalidate(plan_file)
+
+    manager.rebuild_catalog()
+    assert set(_catalog(manager)) == set(contents)
+    assert manager.migrate_layout("hash-date") == len(plan_files[1::2])
+    _check_store(manager, contents)
+
+
+def test_new_saves_follow_the_layout(plans_dir, capsys):
+    PlanManager(str(plans_dir)).save_plan_as_md(make_plan("First"), "web-app")
+    assert plans_admin.main(["--plans-dir", str(plans_dir), "migrate", "--layout", "hash-date"]) == 0
+    assert "Layout flat -> hash-date: moved 1 plan file(s)" in capsys.readouterr().out
+
+    manager = PlanManager(str(plans_dir))
+    path = manager.save_plan_as_md(make_plan("Second"), "web-app")
+    assert path == PlanLayout("hash-date").plan_path(manager.projects_dir, "web-app", path.name)
+    assert len(manager.list_plans("web-app")) == 2
+
+
+@pytest.mark.parametrize("dedup", [False, True])
+def test_names_that_sanitize_to_nothing_fall_back(plans_dir, dedup):
+    manager = PlanManager(str(plans_dir), dedup=dedup)
+    by_title = manager.save_plan_as_md("# 🚀 Plan\n\nrocket body\n")
+    by_name = manager.save_plan_as_md(make_plan("Plan", "bang body"), "!!!")
+    results = manager.save_plans([(make_plan("Plan", "batch body"), "???")])
+
+    assert results[0]["ok"]
+    for path in (by_title, by_name, results[0]["path"]):
+        project, filename = PlanLayout.parse(manager.projects_dir, path)
+        assert re.fullmatch(r"project_\d{8}_\d{6}", project)
+        assert manager.catalog.get(project, filename) is not None
+    assert list(manager.projects_dir.glob("*.md")) == []
+    assert manager.catalog.count() == 3
+
+
+def test_paths_outside_the_layout_are_rejected(manager):
+    with pytest.raises(ValueError, match="Not a plan file location"):
+        manager._plan_location(manager.projects_dir / "loose.md")
+    with pytest.raises(ValueError):
+        manager._catalog_record(manager.projects_dir / "loose.md", "# Loose\n")
+    # A stray file at the wrong depth is skipped rather than catalogued
+    (manager.projects_dir / "loose.md").write_text("# Loose\n")
+    assert manager.apply_file_changes([manager.projects_dir / "loose.md"]) == 0
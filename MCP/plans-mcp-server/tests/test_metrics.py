@@ -0,0 +1,154 @@
+"""Tests for per-tool call, latency and I/O metrics."""
+
+import asyncio
+import contextvars
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import metrics as metrics_module
+from metrics import LATENCY_BUCKETS, MetricsRegistry, record_read, record_write
+
+from .conftest import make_plan
+
+
+def test_io_is_attributed_to_the_current_call():
+    registry = MetricsRegistry()
+    record_read(999)  # Outside any call: ignored
+
+    call = registry.begin("get_plan")
+    record_read(100)
+    record_write(40, files=2)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # Workers running in a copy of the caller's context report into its call
+        for future in [executor.submit(contextvars.copy_context().run, record_read, 10)
+                       for _ in range(8)]:
+            future.result()
+    # A bare thread has no call in its context
+    thread = threading.Thread(target=record_read, args=(1000,))
+    thread.start()
+    thread.join()
+    registry.end(call)
+    record_write(999)
+
+    tool = registry.snapshot()["get_plan"]
+    assert (tool["calls"], tool["errors"]) == (1, 0)
+    assert (tool["bytes_read"], tool["files_read"]) == (180, 9)
+    assert (tool["bytes_written"], tool["files_written"]) == (40, 2)
+
+
+def test_concurrent_calls_keep_their_own_io():
+    registry = MetricsRegistry()
+
+    async def call(tool: str, nbytes: int):
+        stats = registry.begin(tool)
+        try:
+            for _ in range(5):
+                record_read(nbytes)
+                await asyncio.sleep(0)
+            if tool == "bad":
+                stats.failed = True
+        finally:
+            registry.end(stats)
+
+    async def run():
+        await asyncio.gather(*(asyncio.create_task(call(tool, nbytes))
+                               for tool, nbytes in [("a", 1), ("b", 100), ("a", 1), ("bad", 7)]))
+
+    asyncio.run(run())
+    tools = registry.snapshot()
+    assert (tools["a"]["calls"], tools["a"]["bytes_read"]) == (2, 10)
+    assert (tools["b"]["calls"], tools["b"]["bytes_read"]) == (1, 500)
+    assert (tools["bad"]["errors"], tools["bad"]["bytes_read"]) == (1, 35)
+
+
+def test_latency_histogram_is_cumulative():
+    registry = MetricsRegistry()
+    for seconds in (0.0005, 0.003, 0.003, 0.2, 60):
+        registry.observe("t", seconds)
+
+    latency = registry.snapshot()["t"]["latency_seconds"]
+    buckets = latency["buckets"]
+    assert list(buckets) == [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+    assert (buckets["0.001"], buckets["0.005"], buckets["0.25"], buckets["10.0"], buckets["+Inf"]) == (1, 3, 4, 4, 5)
+    assert latency["count"] == 5 and latency["sum"] == pytest.approx(60.2065)
+
+
+_SAMPLE = re.compile(r'^(plans_[a-z_]+)(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? (\S+)$')
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.observe("save_plan", 0.02)
+    registry.observe("save_plan", 3.0, error=True)
+    text = registry.to_prometheus({"content_cache_entries": ("gauge", "Plans cached.", 7)})
+
+    assert text.endswith("\n")
+    families = {}
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            families[name] = kind
+            continue
+        match = _SAMPLE.match(line)
+        assert match, line
+        name = match.group(1)
+        base = re.sub(r"_(bucket|sum|count)$", "", name) if name not in families else name
+        assert base in families, line
+        float(match.group(4))
+
+    assert families["plans_tool_calls_total"] == "counter"
+    assert families["plans_tool_latency_seconds"] == "histogram"
+    assert families["plans_content_cache_entries"] == "gauge"
+    assert 'plans_tool_calls_total{tool="save_plan"} 2\n' in text
+    assert 'plans_tool_errors_total{tool="save_plan"} 1\n' in text
+    assert 'plans_tool_latency_seconds_bucket{tool="save_plan",le="0.025"} 1\n' in text
+    assert 'plans_tool_latency_seconds_bucket{tool="save_plan",le="+Inf"} 2\n' in text
+    assert 'plans_tool_latency_seconds_count{tool="save_plan"} 2\n' in text
+    assert "plans_content_cache_entries 7\n" in text
+
+
+@pytest.fixture
+def registry(server, monkeypatch) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    monkeypatch.setattr(server, "metrics", registry)
+    return registry
+
+
+def test_server_attributes_tool_io(server, served, registry):
+    async def calls():
+        await server.handle_call_tool("save_plan", {"plan_content": make_plan("Plan", "metrics one"),
+                                                    "project_name": "alpha"})
+        # save_plans writes its files on a thread pool of its own
+        await server.handle_call_tool("save_plans", {"plans": [
+            {"plan_content": make_plan("Plan", f"metrics batch {i}"), "project_name": f"batch-{i}"}
+            for i in range(4)
+        ]})
+        served.content_cache.clear()
+        await server.handle_call_tool("get_plan", {"project_name": "alpha"})
+        await server.handle_call_tool("list_plans", {"format": "xml"})
+        await server.handle_call_tool("no_such_tool", {})
+        return await server.handle_read_resource(server.METRICS_PROMETHEUS_URI)
+
+    text = asyncio.run(calls())
+    tools = registry.snapshot()
+
+    alpha = next(served.projects_dir.glob("alpha/*.md"))
+    batch = list(served.projects_dir.glob("batch-*/*.md"))
+    assert len(batch) == 4
+    assert tools["save_plan"]["bytes_written"] >= alpha.stat().st_size
+    assert tools["save_plan"]["files_written"] >= 1
+    assert tools["save_plans"]["bytes_written"] >= sum(path.stat().st_size for path in batch)
+    assert tools["save_plans"]["files_written"] >= 4
+    assert tools["get_plan"]["bytes_read"] >= alpha.stat().st_size
+    assert tools["get_plan"]["bytes_written"] == 0
+    assert (tools["list_plans"]["calls"], tools["list_plans"]["errors"]) == (1, 1)
+    assert (tools["unknown"]["calls"], tools["unknown"]["errors"]) == (1, 1)
+    assert "no_such_tool" not in text
+    assert 'plans_tool_calls_total{tool="save_plans"} 1\n' in text
+    assert "plans_content_cache_misses_total" in text
+    assert metrics_module._current_call.get() is None
@@ -0,0 +1,120 @@
+"""Tests for cursor-based pagination of list_plans and search_plans."""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from catalog import decode_cursor, encode_cursor
+
+from .conftest import make_plan
+
+
+def _pages(fetch, page_size: int) -> list:
+    """Collect every page of ``fetch(limit, cursor)``; each page is one list."""
+    pages, cursor = [], None
+    while True:
+        page = fetch(page_size, cursor)
+        if not page:
+            return pages
+        pages.append(page)
+        cursor = page[-1]["cursor"]
+
+
+@pytest.fixture
+def tied_manager(manager):
+    """A store whose plans share a handful of mtimes, so ties must be broken."""
+    for i in range(23):
+        path = manager.save_plan_as_md(make_plan("Plan", f"deploy step {i}"), f"proj-{i % 4}")
+        stamp = 1_700_000_000 + i // 5
+        os.utime(path, (stamp, stamp))
+    manager.rebuild_catalog()
+    manager.rebuild_search_index()
+    return manager
+
+
+@pytest.mark.parametrize("page_size", [1, 4, 5, 23, 50])
+def test_list_pages_cover_every_plan_once_in_order(tied_manager, page_size):
+    full = [(plan["project"], plan["filename"]) for plan in tied_manager.list_plans()]
+    pages = _pages(lambda limit, cursor: tied_manager.list_plans(limit=limit, cursor=cursor), page_size)
+
+    assert [(plan["project"], plan["filename"]) for page in pages for plan in page] == full
+    assert all(len(page) <= page_size for page in pages)
+
+
+def test_list_pages_with_filters(tied_manager):
+    full = [plan["filename"] for plan in tied_manager.list_plans("proj-2")]
+    pages = _pages(lambda limit, cursor: tied_manager.list_plans("proj-2", limit=limit, cursor=cursor), 2)
+
+    assert [plan["filename"] for page in pages for plan in page] == full
+
+
+def test_saves_between_pages_do_not_shift_later_pages(tied_manager):
+    full = [(plan["project"], plan["filename"]) for plan in tied_manager.list_plans()]
+    first = tied_manager.list_plans(limit=7)
+    # A newer plan sorts before the cursor, so it never reaches later pages
+    tied_manager.save_plan_as_md(make_plan("Plan", "deploy step late"), "proj-0")
+    rest = tied_manager.list_plans(cursor=first[-1]["cursor"])
+
+    assert [(plan["project"], plan["filename"]) for plan in first + rest] == full
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 10])
+def test_search_pages_follow_the_ranking(tied_manager, page_size):
+    full = [(r["project"], r["filename"]) for r in tied_manager.search_plans("deploy step")]
+    pages = _pages(lambda limit, cursor: tied_manager.search_plans("deploy step", limit=limit, cursor=cursor),
+                   page_size)
+
+    assert len(full) == 23
+    assert [(r["project"], r["filename"]) for page in pages for r in page] == full
+
+
+def test_cursors_round_trip_and_reject_garbage(tied_manager):
+    key = (1700000000.5, "proj", "2024-01-01_000000_plan.md")
+    assert decode_cursor(encode_cursor(key), ((int, float), str, str)) == key
+
+    for cursor in ("not a cursor", encode_cursor(["x", "y"]), encode_cursor([1, 2, 3])):
+        with pytest.raises(ValueError):
+            tied_manager.list_plans(cursor=cursor)
+    with pytest.raises(ValueError):
+        tied_manager.search_plans("deploy", cursor="bm90IGpzb24=")
+
+
+def test_server_pages_are_compact_json(server):
+    items = [{"filename": f"{i}.md", "cursor": str(i)} for i in range(3)]
+
+    page, next_cursor = server._paginate(items, 2)
+    assert page == items[:2] and next_cursor == "1"
+    assert server._paginate(items, 3) == (items, None)
+    assert server._json_page("plans", page, next_cursor) == (
+        '{"plans":[{"filename":"0.md","cursor":"0"},{"filename":"1.md","cursor":"1"}],'
+        '"next_cursor":"1"}'
+    )
+
+
+@pytest.mark.parametrize("tool, arguments, maximum", [
+    ("list_plans", {}, 1000),
+    ("search_plans", {"query": "deploy"}, 200),
+])
+@pytest.mark.parametrize("limit", ["abc", 0, -3, 2.5, True, [2], 5000])
+def test_server_rejects_bad_limits(server, served, tool, arguments, maximum, limit):
+    result = asyncio.run(server.handle_call_tool(tool, {**arguments, "limit": limit}))
+
+    assert result[0].text == f"Error: limit must be an integer from 1 to {maximum}"
+
+
+@pytest.mark.parametrize("tool, arguments", [
+    ("list_plans", {}),
+    ("search_plans", {"query": "deploy"}),
+])
+def test_server_accepts_limits_in_range(server, served, tool, arguments):
+    for i in range(3):
+        served.save_plan_as_md(make_plan("Plan", f"deploy step {i}"), "alpha")
+
+    for limit, count in ((None, 3), (2, 2), ("1", 1)):
+        call = {**arguments, "format": "json"}
+        if limit is not None:
+            call["limit"] = limit
+        page = json.loads(asyncio.run(server.handle_call_tool(tool, call))[0].text)
+        assert len(next(iter(page.values()))) == count
@@ -0,0 +1,111 @@
+"""Tests for opt-in cProfile capture of tool calls."""
+
+import asyncio
+import pstats
+
+import pytest
+
+import profiling
+from profiling import PROFILE_DIR, CallProfiler, profiled
+
+from .conftest import make_plan
+
+
+def _run_profiled(profiler: CallProfiler, func):
+    profile = profiler.start(requested=True)
+    token = profiler.activate(profile)
+    try:
+        profiled(func)()
+    finally:
+        profiler.deactivate(token)
+    return profile
+
+
+def test_sampling_gates_unrequested_calls(monkeypatch):
+    assert CallProfiler().start() is None
+    assert CallProfiler(enabled=True, sample_rate=0.0).start() is None
+
+    sampled = CallProfiler(enabled=True, sample_rate=0.5)
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.7)
+    assert sampled.start() is None
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.3)
+    profile = sampled.start()
+    assert profile is not None
+    # Overlapping calls are not profiled, even on request
+    assert sampled.start(requested=True) is None
+    sampled.deactivate(sampled.activate(profile))
+    assert sampled.start(requested=True) is not None
+
+    # A request is honoured whether or not profiling is enabled
+    assert CallProfiler(sample_rate=0.0).start(requested=True) is not None
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("PLANS_PROFILE", "yes")
+    monkeypatch.setenv("PLANS_PROFILE_SAMPLE_RATE", "2.5")
+    monkeypatch.setenv("PLANS_PROFILE_KEEP", "0")
+    profiler = CallProfiler.from_env()
+    assert (profiler.enabled, profiler.sample_rate, profiler.keep) == (True, 1.0, 1)
+
+
+def test_profiled_only_wraps_inside_an_active_profile():
+    def work():
+        return sum(range(1000))
+
+    assert profiled(work) is work
+    profile = _run_profiled(CallProfiler(), work)
+    assert any(func[2] == "work" for func in pstats.Stats(profile).stats)
+
+
+def test_save_keeps_the_newest_dumps(tmp_path):
+    profiler = CallProfiler(keep=3)
+    paths = []
+    for i in range(5):
+        path, summary = profiler.save(_run_profiled(profiler, lambda: sorted(range(100))), tmp_path, "list/plans")
+        paths.append(path)
+        assert "function calls" in summary
+
+    remaining = sorted((tmp_path / PROFILE_DIR).glob("*.prof"))
+    assert remaining == paths[-3:]
+    assert all("_list_plans_" in path.name for path in remaining)
+    pstats.Stats(str(remaining[-1]))
+
+
+@pytest.fixture
+def call_profiler(server, monkeypatch):
+    def install(profiler: CallProfiler) -> CallProfiler:
+        monkeypatch.setattr(server, "profiler", profiler)
+        return profiler
+    return install
+
+
+def test_debug_profile_returns_a_summary(server, served, call_profiler):
+    call_profiler(CallProfiler())
+    served.save_plan_as_md(make_plan("Plan", "profiled listing"), "alpha")
+
+    result = asyncio.run(server.handle_call_tool("list_plans", {"debug_profile": True}))
+    assert "alpha" in result[0].text
+    assert len(result) == 2 and result[1].text.startswith(f"🔬 Profile saved to {PROFILE_DIR}/")
+    assert "list_plans" in result[1].text
+
+    dumps = list((served.plans_dir / PROFILE_DIR).glob("*_list_plans_*.prof"))
+    assert len(dumps) == 1
+    assert any(func[2] == "list_plans" for func in pstats.Stats(str(dumps[0])).stats)
+
+
+def test_sampled_calls_are_saved_without_a_summary(server, served, call_profiler):
+    call_profiler(CallProfiler(enabled=True, sample_rate=1.0, keep=2))
+
+    async def calls():
+        return [await server.handle_call_tool("list_plans", {}) for _ in range(4)]
+
+    results = asyncio.run(calls())
+    assert all(len(result) == 1 for result in results)
+    assert len(list((served.plans_dir / PROFILE_DIR).glob("*.prof"))) == 2
+
+
+def test_unprofiled_calls_leave_no_dumps(server, served, call_profiler):
+    call_profiler(CallProfiler())
+    result = asyncio.run(server.handle_call_tool("list_plans", {}))
+    assert len(result) == 1
+    assert not (served.plans_dir / PROFILE_DIR).exists()
@@ -0,0 +1,52 @@
+"""Tests for per-project head pointers and version histories in the catalog."""
+
+from .conftest import make_plan
+
+
+def test_get_plan_content_follows_the_head(manager):
+    for i in range(3):
+        manager.save_plan_as_md(make_plan("Roadmap", f"revision {i}"), "roadmap")
+    manager.save_plan_as_md(make_plan("Other"), "other")
+
+    assert "revision 2" in manager.get_plan_content("roadmap")
+    assert manager.get_plan_content("missing") is None
+
+
+def test_history_is_newest_first(manager):
+    paths = [manager.save_plan_as_md(make_plan("Roadmap", f"revision {i}"), "roadmap")
+             for i in range(5)]
+
+    history = manager.get_plan_history("roadmap")
+    assert [entry["version"] for entry in history] == [5, 4, 3, 2, 1]
+    assert [entry["filename"] for entry in history] == [path.name for path in reversed(paths)]
+    assert [entry["version"] for entry in manager.get_plan_history("roadmap", 2)] == [5, 4]
+    assert manager.get_plan_history("missing") == []
+
+
+def test_head_falls_back_when_latest_plan_is_removed(manager):
+    first = manager.save_plan_as_md(make_plan("Roadmap", "first"), "roadmap")
+    second = manager.save_plan_as_md(make_plan("Roadmap", "second"), "roadmap")
+
+    manager.catalog.remove_many([("roadmap", second.name)])
+    assert manager.catalog.latest("roadmap")["filename"] == first.name
+
+    # A later save still gets a fresh version number
+    third = manager.save_plan_as_md(make_plan("Roadmap", "third"), "roadmap")
+    latest = manager.get_plan_history("roadmap", 1)[0]
+    assert (latest["version"], latest["filename"]) == (3, third.name)
+    assert manager.catalog.latest("roadmap")["filename"] == third.name
+
+    manager.catalog.remove_many([("roadmap", first.name), ("roadmap", third.name)])
+    assert manager.catalog.latest("roadmap") is None
+
+
+def test_rebuild_keeps_histories(manager):
+    for i in range(4):
+        manager.save_plan_as_md(make_plan("Roadmap", f"revision {i}"), "roadmap")
+    before = [(entry["version"], entry["filename"]) for entry in manager.get_plan_history("roadmap")]
+
+    manager.rebuild_catalog()
+
+    after = [(entry["version"], entry["filename"]) for entry in manager.get_plan_history("roadmap")]
+    assert after == before
+    assert "revision 3" in manager.get_plan_content("roadmap")
@@ -0,0 +1,113 @@
+"""Tests for BM25 ranking, match modes, top-k and snippets in search_plans."""
+
+import threading
+
+import pytest
+
+from search_index import SearchCancelled, SearchIndex, make_snippet, parse_query
+
+from .conftest import make_plan
+
+
+@pytest.fixture
+def index(tmp_path) -> SearchIndex:
+    return SearchIndex(tmp_path / "search_index.json")
+
+
+def _ranked(index: SearchIndex, query: str, **options) -> list:
+    return [doc["filename"] for doc in index.search(query, **options)]
+
+
+def test_title_and_heading_hits_rank_higher(index):
+    filler = "some unrelated words about the project " * 3
+    index.add_document("p", "body.md", f"# Plan\n\n{filler} kafka\n", 1.0)
+    index.add_document("p", "heading.md", f"# Plan\n\n## kafka\n\n{filler}\n", 1.0)
+    index.add_document("p", "title.md", f"# kafka\n\n{filler}\n", 1.0)
+
+    assert _ranked(index, "kafka") == ["title.md", "heading.md", "body.md"]
+
+
+def test_term_frequency_and_rarity(index):
+    index.add_document("p", "once.md", "redis cache layer", 1.0)
+    index.add_document("p", "thrice.md", "redis redis redis cache layer", 1.0)
+    for i in range(5):
+        index.add_document("p", f"common{i}.md", "cache layer notes", 1.0)
+    index.add_document("p", "only-redis.md", "redis layer notes", 1.0)
+
+    assert _ranked(index, "redis")[0] == "thrice.md"
+    scores = {doc["filename"]: doc["score"] for doc in index.search("cache redis", mode="any")}
+    # Same length and one hit each, but redis is the rarer word
+    assert scores["only-redis.md"] > scores["common0.md"]
+
+
+def test_ties_are_broken_by_recency(index):
+    index.add_document("p", "old.md", "same words here", 1.0)
+    index.add_document("p", "new.md", "same words here", 2.0)
+
+    assert _ranked(index, "words") == ["new.md", "old.md"]
+
+
+def test_top_k_is_a_prefix_of_the_full_ranking(index):
+    for i in range(40):
+        index.add_document("p", f"{i}.md", "deploy " * (i % 7 + 1) + "x " * i, float(i))
+
+    full = _ranked(index, "deploy")
+    for limit in (1, 5, 17, 40, 100):
+        assert _ranked(index, "deploy", limit=limit) == full[:limit]
+
+
+def test_match_modes(index):
+    index.add_document("p", "both.md", "rest api with postgres", 1.0)
+    index.add_document("p", "api.md", "graphql api", 1.0)
+    index.add_document("p", "db.md", "postgres tuning", 1.0)
+    index.add_document("p", "split.md", "rest of the api", 1.0)
+
+    assert set(_ranked(index, "rest api")) == {"both.md"}
+    assert set(_ranked(index, "api postgres", mode="all")) == {"both.md"}
+    assert set(_ranked(index, "api postgres", mode="any")) == {"both.md", "api.md", "db.md", "split.md"}
+    assert set(_ranked(index, '"rest api" postgres', mode="all")) == {"both.md"}
+    assert set(_ranked(index, '"rest api" graphql', mode="any")) == {"both.md", "api.md"}
+    with pytest.raises(ValueError):
+        index.search("api", mode="fuzzy")
+
+
+def test_parse_query_keeps_phrases():
+    assert parse_query('deploy "rest api" db') == ["deploy", "rest api", "db"]
+    # Unbalanced quotes fall back to whitespace splitting
+    assert parse_query('deploy "rest api') == ["deploy", '"rest', "api"]
+
+
+def test_cancelled_search_stops(index):
+    for i in range(10):
+        index.add_document("p", f"{i}.md", "alpha beta gamma", float(i))
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(SearchCancelled):
+        index.search("alpha beta", cancel_event=cancel)
+
+
+def test_snippet_highlights_the_first_hit_in_the_body():
+    content = '---\ntags: ["kafka"]\n---\n\n# Plan\n\n' + "lead in " * 20 + "Kafka consumers\nmore"
+    snippet = make_snippet(content, "kafka", radius=10)
+
+    assert "**Kafka**" in snippet
+    assert snippet.startswith("…")
+    assert "tags" not in snippet
+    assert "\n" not in snippet
+
+
+def test_snippet_without_body_hit_shows_the_start():
+    content = '---\ntags: ["kafka"]\n---\n\n# Plan\n\nnothing here'
+    assert make_snippet(content, "kafka").startswith("# Plan nothing here")
+
+
+def test_search_plans_returns_snippets_and_scores(manager):
+    manager.save_plan_as_md(make_plan("Kafka migration", "Move consumers to kafka"), "streams")
+    manager.save_plan_as_md(make_plan("Notes", "mentions kafka once"), "notes")
+
+    results = manager.search_plans("kafka", snippets=True)
+    assert [r["project"] for r in results] == ["streams", "notes"]
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert all("**kafka**" in r["snippet"].lower() for r in results)
+    assert [r["project"] for r in manager.search_plans("kafka", limit=1)] == ["streams"]
@@ -0,0 +1,158 @@
+"""Tests for TF-IDF related-plan recommendations."""
+
+import json
+import math
+import random
+
+import pytest
+
+import related_index
+from plan_manager import PlanManager
+from related_index import RelatedIndex, np, term_counts
+
+from .conftest import make_plan
+
+TOPICS = {
+    "infra": "kubernetes cluster helm deployment ingress pods nodes autoscaling terraform",
+    "cooking": "recipe flour oven dough butter sugar bake knead yeast",
+    "frontend": "react component props hooks render state css layout browser",
+}
+COMMON = "plan step goal task notes review update change".split()
+
+
+def topic_body(topic: str, seed: int, words: int = 60) -> str:
+    rng = random.Random(seed)
+    vocabulary = TOPICS[topic].split()
+    return " ".join(rng.choice(vocabulary if rng.random() < 0.7 else COMMON) for _ in range(words))
+
+
+def brute_force(docs: dict, query: dict, exclude=None) -> dict:
+    """Cosine of TF-IDF vectors weighted as in related_index, for every document."""
+    df = {}
+    for counts in docs.values():
+        for word in counts:
+            df[word] = df.get(word, 0) + 1
+
+    def vector(counts):
+        weights = {word: (1 + math.log(count)) * (math.log((len(docs) + 1) / (df[word] + 1)) + 1)
+                   for word, count in counts.items() if word in df}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {word: w / norm for word, w in weights.items()} if norm else {}
+
+    q = vector(query)
+    scores = {}
+    for key, counts in docs.items():
+        d = vector(counts)
+        score = sum(value * d.get(word, 0.0) for word, value in q.items())
+        if key != exclude and score > 0:
+            scores[key] = score
+    return scores
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_scores_equal_brute_force(tmp_path, monkeypatch, use_numpy):
+    if use_numpy and np is None:
+        pytest.skip("NumPy and SciPy are not installed")
+    # Rebuild the matrix on every change, so its IDF weights are current
+    monkeypatch.setattr(related_index, "CONSOLIDATE_THRESHOLD", 0)
+    rng = random.Random(7)
+    index = RelatedIndex(tmp_path / "related.log", use_numpy=use_numpy)
+    index.load_or_build(lambda: [])
+    docs = {}
+    for step in range(60):
+        name = f"{rng.randrange(20)}.md"
+        if rng.random() < 0.8:
+            text = topic_body(rng.choice(list(TOPICS)), step)
+            docs[f"p/{name}"] = term_counts(text)
+            index.add_documents([("p", name, text, 0.0)])
+        elif f"p/{name}" in docs:
+            del docs[f"p/{name}"]
+            index.remove_documents([("p", name)])
+        if step % 5 == 0 and docs:
+            key = rng.choice(list(docs))
+            expected = brute_force(docs, docs[key], exclude=key)
+            found = index.related(project="p", filename=key[2:], limit=100)
+            assert {f"p/{r['filename']}": pytest.approx(r["score"]) for r in found} == {
+                k: pytest.approx(min(v, 1.0)) for k, v in expected.items()
+            }
+
+
+def test_backends_agree_with_pending_changes(tmp_path, monkeypatch):
+    if np is None:
+        pytest.skip("NumPy and SciPy are not installed")
+    monkeypatch.setattr(related_index, "CONSOLIDATE_THRESHOLD", 8)
+    indexes = [RelatedIndex(tmp_path / f"{i}.log", use_numpy=bool(i)) for i in range(2)]
+    for index in indexes:
+        index.load_or_build(lambda: [])
+    for step in range(40):
+        topic = list(TOPICS)[step % 3]
+        for index in indexes:
+            index.add_documents([(topic, f"{step % 25}.md", topic_body(topic, step), 0.0)])
+        if step % 4 == 0:
+            text = topic_body("infra", 1000 + step)
+            python, numpy = (index.related(text, limit=5) for index in indexes)
+            assert [(r["project"], r["filename"]) for r in python] == [
+                (r["project"], r["filename"]) for r in numpy]
+            assert [r["score"] for r in python] == pytest.approx([r["score"] for r in numpy])
+
+
+def test_related_plans_ranks_by_topic(manager):
+    for topic in TOPICS:
+        for i in range(3):
+            manager.save_plan_as_md(make_plan("Plan", topic_body(topic, i)), f"{topic}-{i}")
+
+    results = manager.related_plans(project_name="infra-0", limit=2)
+    assert {r["project"] for r in results} == {"infra-1", "infra-2"}
+    assert all(0 < r["score"] <= 1 for r in results)
+    assert results == sorted(results, key=lambda r: -r["score"])
+
+    by_text = manager.related_plans(topic_body("cooking", 99), limit=3)
+    assert {r["project"] for r in by_text} == {"cooking-0", "cooking-1", "cooking-2"}
+    assert manager.related_plans("words nobody ever wrote") == []
+
+
+def test_same_project_is_excluded_unless_asked(manager):
+    older = manager.save_plan_as_md(make_plan("Plan", topic_body("infra", 1)), "alpha")
+    latest = manager.save_plan_as_md(make_plan("Plan", topic_body("infra", 2)), "alpha")
+    other = manager.save_plan_as_md(make_plan("Plan", topic_body("infra", 3)), "beta")
+
+    names = lambda results: [(r["project"], r["filename"]) for r in results]
+    assert names(manager.related_plans(project_name="alpha")) == [("beta", other.name)]
+    with_own = manager.related_plans(project_name="alpha", include_same_project=True)
+    assert set(names(with_own)) == {("alpha", older.name), ("beta", other.name)}
+    assert ("alpha", latest.name) not in names(with_own)
+
+    assert manager.related_plans(project_name="missing") is None
+    assert manager.related_plans(project_name="alpha", filename="missing.md") is None
+
+
+def test_saves_before_first_query_are_counted_on_load(plans_dir):
+    first = PlanManager(str(plans_dir))
+    first.save_plan_as_md(make_plan("Plan", topic_body("cooking", 1)), "alpha")
+    assert first.related_plans(project_name="alpha") == []
+
+    # A second process saves without loading the index: the log names the plan only
+    second = PlanManager(str(plans_dir))
+    path = second.save_plan_as_md(make_plan("Plan", topic_body("cooking", 2)), "beta")
+    last = json.loads((plans_dir / "related.log").read_text().splitlines()[-1])
+    assert last == {"op": "add", "project": "beta", "filename": path.name}
+
+    assert [r["project"] for r in first.related_plans(project_name="alpha")] == ["beta"]
+    assert [r["project"] for r in PlanManager(str(plans_dir)).related_plans(project_name="alpha")] == ["beta"]
+
+
+def test_index_follows_deletes_and_rebuilds(plans_dir, manager):
+    manager.save_plan_as_md(make_plan("Plan", topic_body("frontend", 1)), "alpha")
+    doomed = manager.save_plan_as_md(make_plan("Plan", topic_body("frontend", 2)), "beta")
+    assert manager.related_plans(project_name="alpha")
+
+    doomed.unlink()
+    manager.apply_file_changes([doomed])
+    assert manager.related_plans(project_name="alpha") == []
+
+    kept = manager.save_plan_as_md(make_plan("Plan", topic_body("frontend", 3)), "gamma")
+    # A missing log is rebuilt from the stored plans
+    (plans_dir / "related.log").unlink()
+    rebuilt = PlanManager(str(plans_dir))
+    assert [(r["project"], r["filename"]) for r in rebuilt.related_plans(project_name="alpha")] == [
+        ("gamma", kept.name)]
@@ -0,0 +1,128 @@
+"""Tests for the persistent inverted index behind search_plans."""
+
+import random
+
+import pytest
+
+import search_index
+from search_index import SearchIndex
+
+WORDS = ["react", "reactor", "unreactive", "api", "rest-api", "db", "a", "x",
+         "foo_bar", "2024", "naïve", "ÉTÉ", "go"]
+SEPARATORS = [" ", "  ", "\n", "\n\n", ", ", ". ", "-", "## ", "`"]
+
+
+def random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(WORDS) + rng.choice(SEPARATORS)
+                   for _ in range(rng.randint(1, 25)))
+
+
+def random_query(rng: random.Random, docs: dict) -> str:
+    source = rng.choice(list(docs.values())) if docs and rng.random() < 0.8 else random_text(rng)
+    start = rng.randrange(len(source))
+    return source[start:start + rng.randint(1, 15)]
+
+
+def expected(index: SearchIndex, docs: dict, query: str) -> set:
+    """Ids of the documents whose lowercased text contains ``query``."""
+    return index.doc_ids(("p", name) for name, content in docs.items()
+                         if query.lower() in content.lower())
+
+
+@pytest.fixture
+def small_thresholds(monkeypatch):
+    """Compact and merge often, so the tests cross those paths."""
+    monkeypatch.setattr(search_index, "COMPACT_THRESHOLD", 20)
+    monkeypatch.setattr(search_index, "VOCABULARY_MERGE_THRESHOLD", 4)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_substring_match_equals_brute_force(tmp_path, small_thresholds, seed):
+    rng = random.Random(seed)
+    index = SearchIndex(tmp_path / "search_index.json")
+    docs = {}
+    for step in range(300):
+        name = f"{rng.randrange(30)}.md"
+        if rng.random() < 0.75:
+            docs[name] = random_text(rng)
+            index.add_document("p", name, docs[name], float(step))
+        elif name in docs:
+            del docs[name]
+            index.remove_document("p", name)
+        if step % 97 == 0:
+            # Reload from the snapshot and journal on disk
+            index = SearchIndex(tmp_path / "search_index.json")
+            index.load()
+        if step % 10 == 0:
+            for _ in range(20):
+                query = random_query(rng, docs)
+                if query.strip():
+                    assert index.match_substring(query) == expected(index, docs, query), query
+
+
+def test_whitespace_and_punctuation_only_queries(tmp_path):
+    index = SearchIndex(tmp_path / "search_index.json")
+    index.add_document("p", "a.md", "one, two\n\nthree", 1.0)
+    index.add_document("p", "b.md", "one two three", 2.0)
+    a, b = index.doc_ids([("p", "a.md")]).pop(), index.doc_ids([("p", "b.md")]).pop()
+
+    assert index.match_substring(",") == {a}
+    assert index.match_substring("\n") == {a}
+    assert index.match_substring(" ") == {a, b}
+    assert index.match_substring("o t") == {b}
+    assert index.match_substring("e, t") == {a}
+
+
+def test_index_survives_reload_and_compaction(tmp_path, small_thresholds):
+    path = tmp_path / "search_index.json"
+    index = SearchIndex(path)
+    for i in range(50):
+        index.add_document("p", f"{i}.md", f"plan {i} mentions kubernetes-{i % 7}", float(i))
+    for i in range(0, 50, 5):
+        index.remove_document("p", f"{i}.md")
+    assert index.snapshot_path.exists()
+
+    reloaded = SearchIndex(path)
+    reloaded.load()
+    assert len(reloaded) == 40
+    for query in ("kubernetes-3", "plan 1", "mentions", "netes-6"):
+        assert ({doc["key"] for doc in reloaded.search(query)}
+                == {doc["key"] for doc in index.search(query)})
+    assert reloaded.get_document("p", "5.md") is None
+
+    reloaded.compact()
+    again = SearchIndex(path)
+    again.load()
+    assert {doc["key"] for doc in again.search("kubernetes")} == {
+        f"p/{i}.md" for i in range(50) if i % 5
+    }
+
+
+def test_other_instance_sees_appended_entries(tmp_path):
+    path = tmp_path / "search_index.json"
+    writer = SearchIndex(path)
+    writer.add_document("p", "a.md", "first terraform plan", 1.0)
+    reader = SearchIndex(path)
+    reader.load()
+    assert [doc["filename"] for doc in reader.search("terraform")] == ["a.md"]
+
+    writer.add_document("p", "b.md", "second terraform plan", 2.0)
+    writer.remove_document("p", "a.md")
+    assert [doc["filename"] for doc in reader.search("terraform")] == ["b.md"]
+
+
+def test_manager_search_matches_substring_of_content(manager):
+    rng = random.Random(11)
+    contents = {}
+    for i in range(30):
+        path = manager.save_plan_as_md(f"# Plan {i}\n\n{random_text(rng)}", f"proj-{i % 4}")
+        contents[(path.parent.name, path.name)] = path.read_text(encoding="utf-8")
+
+    for _ in range(50):
+        content = rng.choice(list(contents.values()))
+        start = rng.randrange(len(content))
+        query = content[start:start + rng.randint(2, 12)]
+        if not query.strip():
+            continue
+        found = {(r["project"], r["filename"]) for r in manager.search_plans(query)}
+        assert found == {key for key, text in contents.items() if query.lower() in text.lower()}, query
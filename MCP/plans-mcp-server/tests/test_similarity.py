@@ -0,0 +1,144 @@
+"""Tests for near-duplicate detection across projects."""
+
+import random
+
+import pytest
+
+import similarity_index
+from plan_manager import PlanManager
+from similarity_index import SimilarityIndex, shingles, signature, similarity
+
+from .conftest import make_plan
+
+VOCABULARY = [f"word{i}" for i in range(500)]
+
+
+def random_body(seed: int, words: int = 200) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def edit(text: str, changes: int, seed: int = 0) -> str:
+    """Replace ``changes`` words of a text."""
+    rng = random.Random(seed)
+    words = text.split()
+    for i in rng.sample(range(len(words)), changes):
+        words[i] = "changed"
+    return " ".join(words)
+
+
+def jaccard(a: str, b: str) -> float:
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb)
+
+
+def _names(results) -> list:
+    return [(r["project"], r["filename"]) for r in results]
+
+
+@pytest.mark.parametrize("changes", [0, 2, 10, 40])
+def test_signature_estimates_jaccard(changes):
+    a = random_body(1)
+    b = edit(a, changes)
+    assert abs(similarity(signature(a), signature(b)) - jaccard(a, b)) < 0.15
+    assert signature("") is None
+    assert similarity(signature(a), signature(random_body(2))) < 0.2
+
+
+def test_save_reports_near_duplicates_of_other_projects(manager):
+    body = random_body(1)
+    first = manager.save_plan(make_plan("Plan", body), "alpha")
+    assert first["similar"] == [] and first["merged_into"] is None
+
+    # Earlier versions of the same project are not reported
+    again = manager.save_plan(make_plan("Plan", edit(body, 1)), "alpha")
+    assert again["similar"] == []
+
+    copy = manager.save_plan(make_plan("Plan", edit(body, 2, seed=1)), "beta")
+    assert {(m["project"], m["filename"]) for m in copy["similar"]} == {
+        ("alpha", first["path"].name), ("alpha", again["path"].name)
+    }
+    assert all(m["similarity"] >= manager.similarity_threshold for m in copy["similar"])
+    assert copy["path"].parent.name == "beta"
+
+    unrelated = manager.save_plan(make_plan("Plan", random_body(2)), "gamma")
+    assert unrelated["similar"] == []
+
+
+def test_merge_similar_saves_into_the_other_project(plans_dir):
+    manager = PlanManager(str(plans_dir), merge_similar=True)
+    body = random_body(3)
+    original = manager.save_plan(make_plan("Plan", body), "alpha")
+
+    merged = manager.save_plan(make_plan("Plan", edit(body, 2)), "beta")
+    assert merged["merged_into"]["project"] == "alpha"
+    assert merged["merged_into"]["filename"] == original["path"].name
+    assert merged["path"].parent.name == "alpha"
+    assert manager.list_plans("beta") == []
+
+    # The per-call override wins over the manager's setting
+    kept = manager.save_plan(make_plan("Plan", edit(body, 3, seed=2)), "gamma", merge_similar=False)
+    assert kept["merged_into"] is None and kept["path"].parent.name == "gamma"
+
+
+def test_find_similar_plans(manager):
+    body = random_body(4)
+    a = manager.save_plan_as_md(make_plan("Plan", body), "alpha")
+    b = manager.save_plan_as_md(make_plan("Plan", edit(body, 3)), "beta")
+    c = manager.save_plan_as_md(make_plan("Plan", edit(body, 15, seed=5)), "gamma")
+    manager.save_plan_as_md(make_plan("Plan", random_body(5)), "delta")
+
+    by_text = manager.find_similar_plans(body)
+    assert _names(by_text)[:1] == [("alpha", a.name)]
+    assert set(_names(by_text)) == {("alpha", a.name), ("beta", b.name)}
+    assert by_text == sorted(by_text, key=lambda r: -r["similarity"])
+
+    # A stored plan is compared against the others, not itself
+    assert _names(manager.find_similar_plans(project_name="beta")) == [("alpha", a.name)]
+    assert _names(manager.find_similar_plans(project_name="alpha", filename=a.name)) == [("beta", b.name)]
+
+    # A lower threshold reaches the heavier edit too
+    loose = manager.find_similar_plans(project_name="alpha", threshold=0.5)
+    assert ("gamma", c.name) in _names(loose)
+    assert _names(manager.find_similar_plans(project_name="alpha", threshold=0.5, limit=1)) == [("beta", b.name)]
+
+    assert manager.find_similar_plans(project_name="missing") is None
+    assert manager.find_similar_plans(project_name="alpha", filename="missing.md") is None
+
+
+def test_index_follows_deletes_and_survives_reload(plans_dir, manager):
+    body = random_body(6)
+    a = manager.save_plan_as_md(make_plan("Plan", body), "alpha")
+    b = manager.save_plan_as_md(make_plan("Plan", edit(body, 2)), "beta")
+
+    b.unlink()
+    manager.apply_file_changes([b])
+    assert _names(manager.find_similar_plans(body)) == [("alpha", a.name)]
+
+    reloaded = PlanManager(str(plans_dir))
+    assert _names(reloaded.find_similar_plans(body)) == [("alpha", a.name)]
+
+    # Saves by one manager are seen by the other
+    c = reloaded.save_plan_as_md(make_plan("Plan", edit(body, 1)), "gamma")
+    assert ("gamma", c.name) in _names(manager.find_similar_plans(body))
+
+    # A missing log is rebuilt from the stored plans
+    (plans_dir / "similarity.log").unlink()
+    rebuilt = PlanManager(str(plans_dir))
+    assert set(_names(rebuilt.find_similar_plans(body))) == {("alpha", a.name), ("gamma", c.name)}
+
+
+def test_log_compaction_keeps_live_signatures(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity_index, "COMPACT_THRESHOLD", 10)
+    path = tmp_path / "similarity.log"
+    index = SimilarityIndex(path)
+    for round_ in range(5):
+        index.add_documents([("p", f"{i}.md", random_body(100 * round_ + i), 0.0) for i in range(8)])
+    index.remove_documents([("p", "0.md"), ("p", "1.md")])
+    assert len(path.read_text().splitlines()) < 40
+
+    reloaded = SimilarityIndex(path)
+    reloaded.load_or_build(lambda: [])
+    assert len(reloaded) == 6
+    assert _names(reloaded.query(random_body(402), threshold=0.9)) == [("p", "2.md")]
+    assert reloaded.similar_to("p", "0.md") is None
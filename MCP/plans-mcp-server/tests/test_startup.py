@@ -0,0 +1,40 @@
+"""Tests for keeping the server's import cheap."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from .conftest import SRC_DIR
+
+_PROBE = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import server
+print(json.dumps(sorted(sys.modules)))
+"""
+
+# Loaded on demand: the MCP SDK by main(), the store by the first tool call,
+# the profiler only for profiled calls
+DEFERRED = ("mcp", "plan_manager", "search_index", "catalog", "cProfile", "pstats")
+
+
+def test_importing_the_server_defers_heavy_modules():
+    pytest.importorskip("mcp")
+    output = subprocess.run([sys.executable, "-c", _PROBE, str(SRC_DIR)],
+                            check=True, capture_output=True, text=True).stdout
+    loaded = set(json.loads(output))
+
+    for name in DEFERRED:
+        assert not {module for module in loaded if module == name or module.startswith(name + ".")}, name
+
+
+def test_created_server_handles_every_request(server):
+    import mcp.types
+
+    assert server.types.TextContent is mcp.types.TextContent
+    handlers = server._create_server().request_handlers
+    for request in (mcp.types.ListToolsRequest, mcp.types.CallToolRequest,
+                    mcp.types.ListResourcesRequest, mcp.types.ReadResourceRequest):
+        assert request in handlers
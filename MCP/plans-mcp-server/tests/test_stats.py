@@ -0,0 +1,103 @@
+"""Tests for the aggregate plan statistics kept by the catalog."""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from plan_manager import PlanManager
+
+from .conftest import make_plan
+
+DAY = 86400
+
+
+def recount(manager: PlanManager) -> dict:
+    """Aggregate the catalog's plan records directly."""
+    result = {'plans': 0, 'bytes': 0, 'projects': {}, 'statuses': {}, 'months': {}, 'tags': {}}
+    for record in manager.catalog.list():
+        month = datetime.fromtimestamp(record['mtime'], timezone.utc).strftime("%Y-%m")
+        result['plans'] += 1
+        result['bytes'] += record['size']
+        for group, key in (('projects', record['project']), ('statuses', record['status'] or ""),
+                           ('months', month)):
+            counts = result[group].setdefault(key, {'plans': 0, 'bytes': 0})
+            counts['plans'] += 1
+            counts['bytes'] += record['size']
+        for tag in record['tags']:
+            result['tags'][tag] = result['tags'].get(tag, 0) + 1
+    return result
+
+
+def assert_consistent(manager: PlanManager):
+    stats = manager.plan_stats()
+    stats.pop('growth')
+    assert stats == recount(manager)
+
+
+def _save_aged(manager: PlanManager, project: str, body: str, age_days: float):
+    path = manager.save_plan_as_md(make_plan(project.title(), body), project)
+    stamp = time.time() - age_days * DAY
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_counters_follow_every_change(plans_dir, manager):
+    assert_consistent(manager)
+    paths = [_save_aged(manager, f"proj-{i % 3}", f"python api plan {i}" if i % 2 else f"plan {i}", 40 * i)
+             for i in range(9)]
+    manager.save_plan_as_md(make_plan("Fresh", "database migration with python"), "proj-0")
+    # The aged mtimes reach the catalog
+    manager.rebuild_catalog()
+    stats = manager.plan_stats()
+    assert stats['plans'] == 10
+    assert stats['bytes'] == sum(path.stat().st_size for path in manager.projects_dir.rglob("*.md"))
+    assert len(stats['months']) > 3
+    assert_consistent(manager)
+
+    # An outside edit changes the size, status and tags of a plan
+    paths[1].write_text('---\nstatus: "draft"\ntags: ["frontend"]\n---\n\nrewritten by hand\n')
+    manager.apply_file_changes([paths[1]])
+    assert manager.plan_stats()['statuses']['draft'] == {'plans': 1, 'bytes': paths[1].stat().st_size}
+    assert_consistent(manager)
+
+    paths[2].unlink()
+    manager.apply_file_changes([paths[2]])
+    assert manager.plan_stats()['plans'] == 9
+    assert_consistent(manager)
+
+    assert manager.archive_plans(older_than_days=100)['archived'] > 0
+    assert_consistent(manager)
+
+    manager.rebuild_catalog()
+    assert_consistent(manager)
+    assert_consistent(PlanManager(str(plans_dir)))
+
+
+def test_growth_counts_recent_months(manager):
+    _save_aged(manager, "old", "old plan", 2000)
+    manager.save_plan_as_md(make_plan("New", "new plan"), "new")
+    manager.save_plan_as_md(make_plan("New", "another new plan"), "new")
+    manager.rebuild_catalog()
+
+    stats = manager.plan_stats()
+    growth = stats['growth']
+    since = datetime.strptime(growth['since'], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    days = (datetime.now(timezone.utc) - since).total_seconds() / DAY
+    recent_bytes = stats['projects']['new']['bytes']
+    assert growth['plans_per_day'] * days == pytest.approx(2)
+    assert growth['bytes_per_day'] * days == pytest.approx(recent_bytes)
+
+
+def test_server_renders_stats(server, manager):
+    manager.save_plan_as_md(make_plan("Plan", "python api"), "alpha")
+    manager.save_plan_as_md(make_plan("Plan", "notes"), "beta")
+    stats = manager.plan_stats()
+
+    assert json.loads(server._json_stats(stats)) == stats
+    text = server._render_stats(stats)
+    assert text.startswith(f"📊 2 plan(s), {stats['bytes']} bytes\n")
+    assert "• alpha: 1\n" in text and "• validated: 2\n" in text
+    assert "**Months (UTC)**" in text
@@ -0,0 +1,81 @@
+"""Tests for the keyword tag classifier."""
+
+import json
+import random
+import re
+
+import pytest
+
+from tag_classifier import DEFAULT_RULES, TagClassifier
+
+from .conftest import make_plan
+
+
+def _reference(rules: dict, text: str) -> list:
+    """Classify with one word-bounded regex per keyword."""
+    return [
+        tag for tag, keywords in rules.items()
+        if any(re.search(rf"(?<!\w){re.escape(keyword.lower())}(?!\w)", text.lower())
+               for keyword in keywords)
+    ]
+
+
+@pytest.mark.parametrize("text, tags", [
+    ("We must maintain the rapid capital plan", []),
+    ("Add an AI assistant", ["ai"]),
+    ("Train a Machine  Learning model", []),
+    ("machine learning pipeline", ["ai"]),
+    ("Expose a REST API (api/v2) for the website", ["web", "api"]),
+    ("web_api and reactive streams", []),
+    ("React + TypeScript front end, Python back end", ["react", "python", "javascript"]),
+    ("database-backed api", ["api", "database"]),
+])
+def test_default_rules_match_whole_words(text, tags):
+    assert TagClassifier(DEFAULT_RULES).classify(text) == tags
+
+
+def test_overlapping_keywords_match_like_word_bounded_regexes():
+    rules = {
+        "api": ["api", "rest api"],
+        "pi": ["pi", "api gateway"],
+        "rest": ["rest", "st"],
+        "gate": ["gateway", "way"],
+        "long": ["a b c d"],
+    }
+    classifier = TagClassifier(rules)
+    words = ["api", "rest", "st", "pi", "gateway", "way", "a", "b", "c", "d", "rapid", "_", "x"]
+    rng = random.Random(3)
+    for _ in range(500):
+        text = "".join(rng.choice(words) + rng.choice([" ", "", "-", "\n"])
+                       for _ in range(rng.randint(1, 8)))
+        assert classifier.classify(text) == _reference(rules, text), text
+
+
+def test_from_file_writes_and_reads_rules(tmp_path):
+    rules_path = tmp_path / "tag_rules.json"
+    assert TagClassifier.from_file(rules_path).rules == DEFAULT_RULES
+    assert json.loads(rules_path.read_text()) == DEFAULT_RULES
+
+    rules_path.write_text(json.dumps({"infra": ["kubernetes", "Terraform"]}))
+    assert TagClassifier.from_file(rules_path).classify("terraform module") == ["infra"]
+
+    rules_path.write_text(json.dumps(["not", "a", "mapping"]))
+    with pytest.raises(ValueError):
+        TagClassifier.from_file(rules_path)
+
+
+@pytest.mark.parametrize("keywords", ["py", ["py", 3], {"py": 1}])
+def test_rule_values_must_be_keyword_lists(tmp_path, keywords):
+    rules_path = tmp_path / "tag_rules.json"
+    rules_path.write_text(json.dumps({"web": ["react"], "python": keywords}))
+
+    with pytest.raises(ValueError, match="'python'"):
+        TagClassifier.from_file(rules_path)
+
+
+def test_saved_plans_are_tagged_from_the_rules_file(manager):
+    path = manager.save_plan_as_md(make_plan("Website revamp", "Use react; maintain the api"), "site")
+
+    assert manager.catalog.get("site", path.name)["tags"] == ["web", "api", "react"]
+    assert [plan["filename"] for plan in manager.list_plans(tags=["react"])] == [path.name]
+    assert manager.list_plans(tags=["ai"]) == []
@@ -0,0 +1,115 @@
+"""Tests for the delta-compressed version history, diff_plans and pruning."""
+
+import json
+import random
+
+import pytest
+
+import version_history
+from plan_manager import PlanManager
+from version_history import VersionHistory, apply_delta, make_delta
+
+from .conftest import make_plan
+
+
+def _revisions(count: int, seed: int = 0) -> list:
+    """Plan texts where each one edits a few lines of the one before."""
+    rng = random.Random(seed)
+    lines = [f"- step {i}: {rng.random()}\n" for i in range(60)]
+    texts = []
+    for _ in range(count):
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(lines))
+            action = rng.random()
+            if action < 0.4:
+                lines[position] = f"- changed {rng.random()}\n"
+            elif action < 0.7:
+                lines.insert(position, f"- added {rng.random()}\n")
+            elif len(lines) > 1:
+                del lines[position]
+        texts.append("# Roadmap\n\n" + "".join(lines))
+    return texts
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_delta_round_trip(seed):
+    texts = _revisions(20, seed) + ["", "no trailing newline", "\n\n"]
+    for base, text in zip(texts, texts[1:]):
+        assert apply_delta(base, make_delta(base, text)) == text
+
+
+def test_every_version_is_reconstructed(tmp_path, monkeypatch):
+    monkeypatch.setattr(version_history, "SNAPSHOT_INTERVAL", 5)
+    texts = _revisions(23)
+    history = VersionHistory(tmp_path / "history")
+    history.append(("roadmap", f"{i}.md", float(i), text) for i, text in enumerate(texts[:10]))
+    for i, text in enumerate(texts[10:], start=10):
+        history.append([("roadmap", f"{i}.md", float(i), text)])
+
+    # A fresh reader has nothing cached and walks the delta chains
+    fresh = VersionHistory(tmp_path / "history", cache_entries=2)
+    for i in reversed(range(len(texts))):
+        assert fresh.get("roadmap", f"{i}.md") == texts[i]
+    assert [filename for filename, _ in fresh.entries("roadmap")] == [f"{i}.md" for i in range(23)]
+    assert fresh.get("roadmap", "missing.md") is None
+
+    entries = [json.loads(line) for line in (tmp_path / "history" / "roadmap.log").read_text().splitlines()]
+    assert max(entry.get("d", 0) for entry in entries) == 4
+    # Small edits are stored as deltas, far smaller than the texts
+    assert sum(len(json.dumps(entry)) for entry in entries) < sum(map(len, texts)) / 3
+
+
+def test_versions_and_diffs_after_pruning(plans_dir):
+    manager = PlanManager(str(plans_dir))
+    texts = _revisions(6, seed=5)
+    contents = [manager.save_plan_as_md(text, "roadmap").read_text(encoding="utf-8") for text in texts]
+    diff = manager.diff_plans("roadmap")
+
+    assert manager.prune_plan_files("roadmap", keep=1) == 5
+    assert len(list((plans_dir / "projects" / "roadmap").glob("*.md"))) == 1
+
+    reopened = PlanManager(str(plans_dir))
+    for version, content in enumerate(contents, start=1):
+        assert reopened.get_plan_version("roadmap", version) == content
+    assert reopened.get_plan_version("roadmap", 7) is None
+    assert reopened.diff_plans("roadmap") == diff
+    assert diff.startswith("--- roadmap@v5 (")
+    assert "+++ roadmap@v6 (" in diff
+    assert reopened.diff_plans("roadmap", 3, 3) == ""
+    assert reopened.diff_plans("roadmap", 0) is None
+    assert reopened.diff_plans("missing") is None
+
+    first = reopened.get_plan_history("roadmap")[-1]["filename"]
+    path = reopened.materialize_plan("roadmap", first)
+    assert path.read_text(encoding="utf-8") == contents[0]
+
+
+def test_keep_files_prunes_on_save(plans_dir):
+    manager = PlanManager(str(plans_dir), keep_files=2)
+    texts = _revisions(8, seed=9)
+    contents = [manager.save_plan_as_md(text, "roadmap").read_text(encoding="utf-8") for text in texts[:5]]
+    # The oldest plan of a batch larger than keep_files loses its file at once
+    results = manager.save_plans([(text, "roadmap") for text in texts[5:]])
+    assert all(result["ok"] for result in results)
+    assert not results[0]["path"].exists()
+
+    files = list((plans_dir / "projects" / "roadmap").glob("*.md"))
+    assert sorted(path.name for path in files) == sorted(
+        entry["filename"] for entry in manager.get_plan_history("roadmap", 2)
+    )
+    # Saves in the same second after a prune never reuse a pruned version's name
+    for version, content in enumerate(contents, start=1):
+        assert manager.get_plan_version("roadmap", version) == content
+    for version, text in enumerate(texts[5:], start=6):
+        assert manager.get_plan_version("roadmap", version).endswith(text)
+    assert len(manager.list_plans("roadmap")) == 8
+
+    with pytest.raises(ValueError):
+        PlanManager(str(plans_dir), keep_files=0)
+
+
+def test_default_keeps_every_file(manager):
+    for text in _revisions(4):
+        manager.save_plan_as_md(text, "roadmap")
+    assert len(list((manager.projects_dir / "roadmap").glob("*.md"))) == 4
+    assert manager.history.get("roadmap", manager.get_plan_history("roadmap")[-1]["filename"])
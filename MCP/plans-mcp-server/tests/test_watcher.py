@@ -0,0 +1,155 @@
+"""Tests for applying outside edits to plan files, and the watcher that finds them."""
+
+import os
+import time
+
+import pytest
+
+from watcher import WATCH_MODES, PlanWatcher
+
+from .conftest import make_plan
+
+
+def wait_for(predicate, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+def _names(results) -> set:
+    return {(r["project"], r["filename"]) for r in results}
+
+
+def test_apply_file_changes_edit_create_delete(manager):
+    edited = manager.save_plan_as_md(make_plan("Plan", "original text"), "alpha")
+    deleted = manager.save_plan_as_md(make_plan("Plan", "doomed text"), "beta")
+
+    edited.write_text(edited.read_text() + "\nhand edited giraffe\n")
+    created = manager.projects_dir / "gamma" / "notes.md"
+    created.parent.mkdir()
+    created.write_text('---\nstatus: "draft"\n---\n\ngamma zebra notes\n')
+    deleted.unlink()
+    ignored = [manager.projects_dir / "alpha" / ".tmp.md", manager.plans_dir / "index.md",
+               manager.projects_dir / "alpha" / "notes.txt"]
+    ignored[0].write_text("temporary")
+
+    assert manager.apply_file_changes([edited, created, deleted] + ignored) == 3
+
+    assert "giraffe" in manager.get_plan_content("alpha", edited.name)
+    assert _names(manager.search_plans("giraffe")) == {("alpha", edited.name)}
+    assert manager.catalog.get("gamma", "notes.md")["status"] == "draft"
+    assert _names(manager.search_plans("zebra")) == {("gamma", "notes.md")}
+    assert manager.catalog.get("beta", deleted.name) is None
+    assert manager.search_plans("doomed") == []
+    # Applying the same state again changes nothing
+    assert manager.apply_file_changes([edited, created, deleted]) == 0
+
+
+def test_own_saves_are_not_recorded_twice(manager):
+    path = manager.save_plan_as_md(make_plan("Plan", "saved once"), "alpha")
+
+    assert manager.apply_file_changes([path]) == 0
+    assert len(manager.get_plan_history("alpha")) == 1
+
+
+def test_deleting_a_pruned_version_keeps_it(manager):
+    old = manager.save_plan_as_md(make_plan("Plan", "version one"), "alpha")
+    manager.save_plan_as_md(make_plan("Plan", "version two"), "alpha")
+
+    old.unlink()
+    manager.apply_file_changes([old])
+
+    assert "version one" in manager.get_plan_content("alpha", old.name)
+    assert len(manager.list_plans("alpha")) == 2
+
+
+def test_find_file_changes(manager):
+    kept = manager.save_plan_as_md(make_plan("Plan", "kept"), "alpha")
+    modified = manager.save_plan_as_md(make_plan("Plan", "modified"), "alpha")
+    missing = manager.save_plan_as_md(make_plan("Plan", "missing"), "beta")
+    assert manager.find_file_changes() == []
+
+    modified.write_text("changed\n")
+    missing.unlink()
+    new = manager.projects_dir / "beta" / "new.md"
+    new.write_text("new\n")
+
+    assert set(manager.find_file_changes()) == {modified, missing, new}
+    assert kept not in manager.find_file_changes()
+
+
+def _watcher(manager, mode, **options) -> PlanWatcher:
+    try:
+        return PlanWatcher(manager, mode, interval=0.1, settle=0.1, **options)
+    except ValueError:
+        pytest.skip(f"{mode} is not available here")
+
+
+@pytest.mark.parametrize("mode", ["poll", "inotify"])
+def test_watcher_applies_outside_changes(manager, mode):
+    existing = manager.save_plan_as_md(make_plan("Plan", "before watching"), "alpha")
+    offline = manager.projects_dir / "alpha" / "offline.md"
+    offline.write_text("written while nobody watched\n")
+    # Load the search index now, so later hits come from the watcher and not a fresh build
+    assert manager.search_plans("before watching")
+    changes = []
+    watcher = _watcher(manager, mode, on_change=lambda: changes.append(1))
+    watcher.start()
+    try:
+        # Caught up by the initial scan
+        assert wait_for(lambda: manager.catalog.get("alpha", "offline.md") is not None)
+
+        existing.write_text(existing.read_text() + "\nedited kangaroo\n")
+        assert wait_for(lambda: _names(manager.search_plans("kangaroo")) == {("alpha", existing.name)})
+
+        folder = manager.projects_dir / "beta"
+        folder.mkdir()
+        (folder / "x.md").write_text("beta wombat\n")
+        assert wait_for(lambda: manager.search_plans("wombat"))
+
+        os.rename(folder / "x.md", folder / "y.md")
+        assert wait_for(lambda: manager.catalog.get("beta", "x.md") is None
+                        and manager.catalog.get("beta", "y.md") is not None)
+        (folder / "y.md").unlink()
+        assert wait_for(lambda: not manager.search_plans("wombat"))
+
+        # A whole project folder moving is picked up too
+        os.rename(manager.projects_dir / "alpha", manager.projects_dir / "gamma")
+        assert wait_for(lambda: len(manager.list_plans("gamma")) == 2 and not manager.list_plans("alpha"))
+    finally:
+        watcher.stop()
+    assert changes
+
+
+def test_scan_errors_do_not_stop_the_watcher(manager, monkeypatch):
+    calls = []
+    find_file_changes = manager.find_file_changes
+
+    def flaky():
+        calls.append(1)
+        if len(calls) <= 2:
+            raise OSError("catalog is locked")
+        return find_file_changes()
+
+    monkeypatch.setattr(manager, "find_file_changes", flaky)
+    watcher = _watcher(manager, "poll")
+    assert watcher._changed_files() == set()
+
+    path = manager.projects_dir / "alpha" / "late.md"
+    path.parent.mkdir()
+    path.write_text("late ostrich\n")
+    watcher.start()
+    try:
+        assert wait_for(lambda: manager.catalog.get("alpha", "late.md") is not None)
+    finally:
+        watcher.stop()
+    assert len(calls) > 2
+
+
+def test_unknown_mode_is_rejected(manager):
+    assert "poll" in WATCH_MODES
+    with pytest.raises(ValueError):
+        PlanWatcher(manager, "fanotify")